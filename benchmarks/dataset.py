@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+"""Generator for synthetic populations of users and events.
+
+The populations are shaped like real usage: most users have few events while some have many, most events start
+at full or half hours during the day and regular events outnumber single ones.
+
+    python -m benchmarks.dataset --users 100000 --userdata-path /tmp/userdata
+"""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+
+from models.event import DEFAULT_PING_STATES, EventType
+from utils.path_utils import USERDATA_PATH
+
+FIRST_USER_ID = 100000
+MAX_EVENTS_PER_USER = 200
+SINGLE_EVENT_SHARE = 0.2
+# Weights of the hours events start at, most events take place during the day
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 10, 10, 10, 10, 10, 10, 10, 10, 10, 10, 10, 8, 6, 4, 2, 1]
+LANGUAGES = ["DE", "EN"]
+
+
+def generate_event_count(rng, mean):
+    """Draws the amount of events of a user from a skewed distribution with the given mean.
+    Args:
+        rng (random.Random): Source of randomness.
+        mean (float): Average amount of events per user.
+    Returns:
+        int: Amount of events.
+    """
+    if mean <= 0:
+        return 0
+    # Pareto with shape 2 has a mean of twice its scale, the cap keeps single users from dominating
+    return min(MAX_EVENTS_PER_USER, int(rng.paretovariate(2) * mean / 2))
+
+
+def generate_event_time(rng):
+    """Draws a start time clustered at full and half hours.
+    Args:
+        rng (random.Random): Source of randomness.
+    Returns:
+        str: Start time formatted as HH:MM.
+    """
+    hour = rng.choices(range(24), HOUR_WEIGHTS)[0]
+    cluster = rng.random()
+    if cluster < 0.5:
+        minute = 0
+    elif cluster < 0.8:
+        minute = 30
+    else:
+        minute = rng.randrange(60)
+    return "{:02d}:{:02d}".format(hour, minute)
+
+
+def generate_event(rng, name):
+    """Creates the stored representation of a random event.
+    Args:
+        rng (random.Random): Source of randomness.
+        name (str): Name of the event.
+    Returns:
+        dict: Event data as it is saved by the DatabaseController.
+    """
+    ping_times = DEFAULT_PING_STATES.copy()
+    for ping_time in rng.sample(list(ping_times), rng.randint(0, 3)):
+        ping_times[ping_time] = True
+    event_type = EventType.SINGLE if rng.random() < SINGLE_EVENT_SHARE else EventType.REGULARLY
+    return {"title": name, "day": rng.randrange(7), "content": "Content of {}".format(name),
+            "event_type": event_type.value, "event_time": generate_event_time(rng), "ping_times": ping_times,
+            "in_daily_ping": True, "start_ping_done": False, "ping_times_to_refresh": {}}
+
+
+def write_population(userdata_path, users, events_per_user, seed=0):
+    """Writes users with random events into the given directory.
+    Args:
+        userdata_path (str): Directory the user files are written to.
+        users (int): Amount of users.
+        events_per_user (float): Average amount of events per user.
+        seed (int, optional): Seed of the random generator, the same seed creates the same population.
+    Returns:
+        list of 'int': IDs of the created users.
+    """
+    rng = random.Random(seed)
+    os.makedirs(userdata_path, exist_ok=True)
+    user_ids = []
+    for index in range(users):
+        user_id = FIRST_USER_ID + index
+        events = {uuid.UUID(int=rng.getrandbits(128)).hex: generate_event(rng, "e{}x{}".format(user_id, number))
+                  for number in range(generate_event_count(rng, events_per_user))}
+        with open(os.path.join(userdata_path, "{}_config.json".format(user_id)), "w") as config_file:
+            json.dump({"user_id": user_id, "language": rng.choice(LANGUAGES), "daily_ping": rng.random() < 0.8},
+                      config_file)
+        with open(os.path.join(userdata_path, "{}_events.json".format(user_id)), "w") as events_file:
+            json.dump(events, events_file)
+        user_ids.append(user_id)
+    return user_ids
+
+
+def main():
+    """Writes a population into the given directory."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000, help="Amount of users")
+    parser.add_argument("--events", type=float, default=5, help="Average amount of events per user")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator")
+    parser.add_argument("--userdata-path", default=USERDATA_PATH, help="Directory the user files are written to")
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    write_population(arguments.userdata_path, arguments.users, arguments.events, arguments.seed)
+    print("Wrote {} users into {} in {:.1f}s".format(arguments.users, arguments.userdata_path,
+                                                     time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
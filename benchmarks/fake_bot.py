@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+"""Stand-in for the bot that records messages instead of sending them to Telegram."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import threading
+from collections import namedtuple
+
+from telegram.error import Unauthorized
+
+from utils import clock
+
+SentMessage = namedtuple("SentMessage", ["time", "chat_id", "text", "reply_markup"])
+
+
+class FakeBot:
+    """Records every sent message together with the time of the active clock. Sending takes ``latency`` seconds
+    on the active clock, so with a simulated clock the sends delay the following pings like real requests would.
+    Chats inside ``blocked`` fail like chats of users who blocked the bot.
+    """
+
+    def __init__(self, latency=0.0):
+        """Constructor.
+        Args:
+            latency (float, optional): Seconds every request takes.
+        """
+        self.latency = latency
+        self.messages = []
+        self.blocked = set()
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id, text, parse_mode=None, reply_markup=None, **kwargs):
+        """Records the message."""
+        if self.latency:
+            clock.sleep(self.latency)
+        if str(chat_id) in self.blocked:
+            raise Unauthorized("Forbidden: bot was blocked by the user")
+        with self.lock:
+            self.messages.append(SentMessage(clock.now(), chat_id, text, reply_markup))
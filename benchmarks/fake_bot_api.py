@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+
+"""Local stand-in for the Telegram Bot API to load test the bot end to end.
+
+The server answers the methods the bot uses over HTTP like the Bot API does, so the real bot, its HTTP connection
+pool and its error handling are exercised. Updates are pushed into the server and fetched by the bot via
+``getUpdates``. Every request takes a configurable latency and a share of the requests can be answered with
+``429 Too Many Requests``. Sent messages are recorded and optionally written to a file, one JSON object per line.
+
+    python -m benchmarks.fake_bot_api --port 8081 --latency 0.05 --retry-after-rate 0.01
+
+Point the bot at it by setting ``bot_api.base_url`` in the configuration to ``http://127.0.0.1:8081/bot``.
+"""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger(__name__)
+
+RecordedMessage = namedtuple("RecordedMessage", ["time", "method", "chat_id", "message_id", "text"])
+
+# Methods that may be answered with 429, Telegram limits the messages a bot sends
+LIMITED_METHODS = {"sendMessage", "editMessageText"}
+
+
+class FakeBotApiRequestHandler(BaseHTTPRequestHandler):
+    """Handles the requests of the bot to ``/bot<token>/<method>``."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, with Nagle every response would wait for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """Answers requests without body, the Bot API accepts them as well."""
+        self._handle(b"")
+
+    def do_POST(self):
+        """Answers requests with a JSON or form encoded body."""
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        self._handle(self.rfile.read(length))
+
+    def _handle(self, body):
+        """Calls the requested method of the server and sends its result.
+        Args:
+            body (bytes): Body of the request.
+        """
+        api = self.server.api
+        path = self.path.split("?", 1)[0]
+        prefix, _, method = path.rpartition("/")
+        if not prefix.startswith("/bot") or prefix[len("/bot"):] != api.token:
+            self._respond(401, {"ok": False, "error_code": 401, "description": "Unauthorized"})
+            return
+
+        try:
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                parameters = json.loads(body or b"{}")
+            else:
+                parameters = dict(parse_qsl(body.decode()))
+        except ValueError:
+            self._respond(400, {"ok": False, "error_code": 400, "description": "Bad Request: invalid body"})
+            return
+
+        status, payload = api.call(method, parameters)
+        self._respond(status, payload)
+
+    def _respond(self, status, payload):
+        """Sends the JSON encoded payload.
+        Args:
+            status (int): HTTP status code.
+            payload (dict): Body of the response.
+        """
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Logs the requests with the logger of the module instead of stderr."""
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class FakeBotApi:
+    """Serves the subset of the Bot API the bot uses and records what the bot sends.
+
+    Requests take ``latency`` seconds plus up to ``jitter`` seconds. Requests of the methods sending messages are
+    answered with 429 and a ``retry_after`` of ``retry_after`` seconds with the probability ``retry_after_rate``.
+    """
+
+    def __init__(self, token, listen="127.0.0.1", port=0, latency=0.0, jitter=0.0, retry_after_rate=0.0,
+                 retry_after=1, record_path=None, seed=None):
+        """Constructor.
+        Args:
+            token (str): Token the bot uses.
+            listen (str, optional): Address the server listens on.
+            port (int, optional): Port the server listens on. 0 selects a free port.
+            latency (float, optional): Seconds every request takes.
+            jitter (float, optional): Maximum amount of seconds that are randomly added to the latency.
+            retry_after_rate (float, optional): Share of the sent messages that are answered with 429.
+            retry_after (int, optional): Seconds the bot is told to wait after a 429.
+            record_path (str, optional): File the sent messages are appended to, one JSON object per line.
+            seed (int, optional): Seed of the random latencies and errors.
+        """
+        self.token = token
+        self.latency = latency
+        self.jitter = jitter
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.updates_available = threading.Condition(self.lock)
+        self.updates = []
+        self.next_update_id = 1
+        self.next_message_id = 1
+        self.messages = []
+        self.counters = {}
+        self.record_file = open(record_path, "a") if record_path else None
+
+        self.httpd = ThreadingHTTPServer((listen, port), FakeBotApiRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.api = self
+        self.thread = None
+
+    @property
+    def port(self):
+        """Returns the port the server is bound to."""
+        return self.httpd.server_address[1]
+
+    @property
+    def base_url(self):
+        """Returns the base URL the bot has to use, the token is appended by the bot."""
+        return "http://{}:{}/bot".format(self.httpd.server_address[0], self.port)
+
+    def start(self):
+        """Starts serving requests in a background thread."""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake_bot_api", daemon=True)
+        self.thread.start()
+        logger.info("Fake Bot API listening on %s:%s", *self.httpd.server_address[:2])
+
+    def stop(self):
+        """Stops the server and wakes up all waiting ``getUpdates`` requests."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        with self.lock:
+            self.updates_available.notify_all()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        if self.record_file:
+            self.record_file.close()
+            self.record_file = None
+
+    def push_update(self, update):
+        """Queues an update for the bot. The ``update_id`` is assigned if it is missing.
+        Args:
+            update (dict): Update as it is sent by Telegram.
+        Returns:
+            int: ID of the update.
+        """
+        with self.lock:
+            if "update_id" not in update:
+                update = dict(update, update_id=self.next_update_id)
+            self.next_update_id = max(self.next_update_id, update["update_id"]) + 1
+            self.updates.append(update)
+            self.updates_available.notify_all()
+            return update["update_id"]
+
+    def stats(self):
+        """Returns the request counters and the amount of recorded and pending items.
+        Returns:
+            dict: Requests by method and result, the amount of sent messages and of pending updates.
+        """
+        with self.lock:
+            stats = dict(self.counters)
+            stats["messages"] = len(self.messages)
+            stats["pending_updates"] = len(self.updates)
+        return stats
+
+    def call(self, method, parameters):
+        """Executes a method of the Bot API.
+        Args:
+            method (str): Name of the method.
+            parameters (dict): Parameters of the request.
+        Returns:
+            tuple: HTTP status code and body of the response.
+        """
+        if method != "getUpdates":
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+            if delay:
+                time.sleep(delay)
+
+        handler = getattr(self, "_method_{}".format(method), None)
+        if handler is None:
+            self._count(method, "unknown")
+            return 404, {"ok": False, "error_code": 404, "description": "Not Found: method not found"}
+
+        if method in LIMITED_METHODS and self.retry_after_rate and self.random.random() < self.retry_after_rate:
+            self._count(method, "retry_after")
+            return 429, {"ok": False, "error_code": 429,
+                         "description": "Too Many Requests: retry after {}".format(self.retry_after),
+                         "parameters": {"retry_after": self.retry_after}}
+
+        self._count(method, "ok")
+        return 200, {"ok": True, "result": handler(parameters)}
+
+    def _count(self, method, result):
+        """Increments the counter of the method and result."""
+        with self.lock:
+            key = "{}_{}".format(method, result)
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def _record(self, method, chat_id, message_id, text):
+        """Records a sent or edited message.
+        Returns:
+            dict: The message as the Bot API returns it.
+        """
+        now = time.time()
+        with self.lock:
+            self.messages.append(RecordedMessage(now, method, chat_id, message_id, text))
+            if self.record_file:
+                self.record_file.write(json.dumps({"time": now, "method": method, "chat_id": chat_id,
+                                                   "message_id": message_id, "text": text}) + "\n")
+        return {"message_id": message_id, "date": int(now), "text": text,
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": 1, "is_bot": True, "first_name": "FakeBot"}}
+
+    def _method_getMe(self, parameters):
+        """Returns the bot user."""
+        return {"id": int(self.token.split(":", 1)[0]), "is_bot": True, "first_name": "FakeBot",
+                "username": "fake_bot"}
+
+    def _method_getUpdates(self, parameters):
+        """Confirms the updates before the offset and waits up to ``timeout`` seconds for new ones."""
+        offset = int(parameters.get("offset") or 0)
+        limit = int(parameters.get("limit") or 100)
+        deadline = time.monotonic() + float(parameters.get("timeout") or 0)
+        with self.lock:
+            self.updates = [update for update in self.updates if update["update_id"] >= offset]
+            while not self.updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.updates_available.wait(remaining)
+            return self.updates[:limit]
+
+    def _method_sendMessage(self, parameters):
+        """Records the message and returns it with a new message ID."""
+        with self.lock:
+            message_id = self.next_message_id
+            self.next_message_id += 1
+        return self._record("sendMessage", int(parameters["chat_id"]), message_id, parameters.get("text"))
+
+    def _method_editMessageText(self, parameters):
+        """Records the new text of the message."""
+        if "inline_message_id" in parameters:
+            self._record("editMessageText", None, parameters["inline_message_id"], parameters.get("text"))
+            return True
+        return self._record("editMessageText", int(parameters["chat_id"]), int(parameters["message_id"]),
+                            parameters.get("text"))
+
+    def _method_deleteMessage(self, parameters):
+        """Accepts the deletion."""
+        return True
+
+    def _method_answerCallbackQuery(self, parameters):
+        """Accepts the answer."""
+        return True
+
+    def _method_setWebhook(self, parameters):
+        """Accepts the webhook, it is not used."""
+        return True
+
+    def _method_deleteWebhook(self, parameters):
+        """Accepts the deletion of the webhook."""
+        return True
+
+
+def main():
+    """Runs the server until it is interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--token", default="123456:fake", help="Token the bot uses")
+    parser.add_argument("--listen", default="127.0.0.1", help="Address the server listens on")
+    parser.add_argument("--port", type=int, default=8081, help="Port the server listens on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds every request takes")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum seconds randomly added to the latency")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="Share of messages answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Seconds the bot has to wait after a 429")
+    parser.add_argument("--record", help="File the sent messages are appended to")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    api = FakeBotApi(arguments.token, arguments.listen, arguments.port, arguments.latency, arguments.jitter,
+                     arguments.retry_after_rate, arguments.retry_after, arguments.record)
+    api.start()
+    try:
+        while True:
+            time.sleep(10)
+            logger.info("%s", api.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+"""End to end load test of the bot against the local fake Bot API.
+
+The complete bot with its handlers, dispatcher and HTTP connection pool is started with long polling against
+``fake_bot_api``. Synthetic users send commands and messages that are answered with exactly one message each, the
+test reports the throughput and the latency from pushing an update until its answer arrived. Afterwards a pass of
+the reminder pings over a synthetic population is sent through the same API.
+
+    python -m benchmarks.load_test --users 200 --updates 5000 --latency 0.02 --retry-after-rate 0.01
+"""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import argparse
+import logging
+import shutil
+import tempfile
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+from benchmarks.dataset import write_population
+from benchmarks.fake_bot_api import FakeBotApi
+from benchmarks.webhook_harness import percentile
+from control.bot_control import BotControl
+from control.database_controller import DatabaseController
+from control.event_checker import EventChecker
+from utils import clock
+from utils.clock import SimulatedClock
+
+TOKEN = "123456:fake"
+# Commands and messages that are answered with a single message
+MESSAGES = ["/start", "/list_events", "hello"]
+# A wednesday noon, many events of the population are due around that time
+SIMULATED_TIME = datetime(2020, 10, 21, 12, 0)
+
+
+def create_update(chat_id, text):
+    """Creates a text message update of a private chat.
+    Args:
+        chat_id (int): ID of the chat and its user.
+        text (str): Text of the message.
+    Returns:
+        dict: Update as it is sent by Telegram.
+    """
+    user = {"id": chat_id, "is_bot": False, "first_name": "Load", "language_code": "en"}
+    message = {"message_id": 1, "date": int(time.time()), "text": text, "from": user,
+               "chat": {"id": chat_id, "type": "private"}}
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return {"message": message}
+
+
+def run_updates(api, user_ids, amount, rate, timeout):
+    """Pushes the updates and waits for their answers.
+    Args:
+        api (FakeBotApi): Running fake API the bot polls.
+        user_ids (list of 'int'): Chats the updates are spread over.
+        amount (int): Amount of updates.
+        rate (float): Updates pushed per second, as fast as possible if 0.
+        timeout (float): Seconds to wait for the answers after the last update was pushed.
+    Returns:
+        tuple: Duration in seconds and the sorted latencies of the answered updates.
+    """
+    pushed = defaultdict(deque)
+    answered = len(api.messages)
+    start = time.monotonic()
+    for index in range(amount):
+        chat_id = user_ids[index % len(user_ids)]
+        if rate:
+            delay = start + index / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        pushed[chat_id].append(time.time())
+        api.push_update(create_update(chat_id, MESSAGES[index // len(user_ids) % len(MESSAGES)]))
+
+    deadline = time.monotonic() + timeout
+    while len(api.messages) - answered < amount and time.monotonic() < deadline:
+        time.sleep(0.05)
+    duration = time.monotonic() - start
+
+    # Updates of a chat are answered in order, so the answers are matched to the updates per chat
+    latencies = []
+    for message in api.messages[answered:]:
+        if pushed[message.chat_id]:
+            latencies.append(message.time - pushed[message.chat_id].popleft())
+    return duration, sorted(latencies)
+
+
+def run_ping_pass(api, userdata_path, users, events):
+    """Sends one pass of the reminder pings over a synthetic population through the fake API.
+    Args:
+        api (FakeBotApi): Running fake API.
+        userdata_path (str): Directory the population is written to.
+        users (int): Amount of synthetic users.
+        events (float): Average amount of events per user.
+    Returns:
+        tuple: Duration in seconds and amount of sent pings.
+    """
+    user_ids = write_population(userdata_path, users, events)
+    sent = len(api.messages)
+    previous_clock = clock.use_clock(SimulatedClock(SIMULATED_TIME))
+    try:
+        start = time.perf_counter()
+        checker = EventChecker()
+        # The pings are sent as one burst to measure the throughput
+        checker.delivery.window = 0
+        checker._ping_users(user_ids, SIMULATED_TIME.weekday())
+        checker._deliver_pings()
+        duration = time.perf_counter() - start
+    finally:
+        clock.use_clock(previous_clock)
+    return duration, len(api.messages) - sent
+
+
+def main():
+    """Runs the load test and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100, help="Amount of chats sending updates")
+    parser.add_argument("--updates", type=int, default=2000, help="Amount of updates")
+    parser.add_argument("--rate", type=float, default=0, help="Updates per second, as fast as possible if 0")
+    parser.add_argument("--workers", type=int, default=4, help="Amount of threads processing updates")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds every Bot API request takes")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum seconds randomly added to the latency")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="Share of messages answered with 429")
+    parser.add_argument("--ping-users", type=int, default=1000, help="Synthetic users of the ping pass, 0 skips it")
+    parser.add_argument("--events", type=float, default=5, help="Average amount of events per synthetic user")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for outstanding answers")
+    parser.add_argument("--record", help="File the sent messages are appended to")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING)
+    # Registers the handlers of the bot, importing it configures the DatabaseController with the real paths
+    from control.main import register_handlers
+
+    userdata_path = tempfile.mkdtemp(prefix="remindeasy_load_test_")
+    api = FakeBotApi(TOKEN, latency=arguments.latency, jitter=arguments.jitter,
+                     retry_after_rate=arguments.retry_after_rate, record_path=arguments.record, seed=0)
+    api.start()
+    previous_token = BotControl.token
+    BotControl.token = TOKEN
+    try:
+        DatabaseController(userdata_path=userdata_path)
+        updater = BotControl.setup_bot(update_workers=arguments.workers, base_url=api.base_url)
+        register_handlers(updater.dispatcher)
+        updater.start_polling(poll_interval=0, timeout=1)
+        try:
+            user_ids = list(range(1, arguments.users + 1))
+            duration, latencies = run_updates(api, user_ids, arguments.updates, arguments.rate, arguments.timeout)
+        finally:
+            updater.stop()
+
+        print("updates:    {} answered of {} in {:.2f}s ({:.0f}/s)".format(
+            len(latencies), arguments.updates, duration, len(latencies) / duration))
+        print("latency:    p50 {:.1f}ms | p95 {:.1f}ms | p99 {:.1f}ms | max {:.1f}ms".format(
+            *(percentile(latencies, fraction) * 1000 for fraction in (0.5, 0.95, 0.99, 1.0))))
+
+        if arguments.ping_users:
+            ping_duration, pings = run_ping_pass(api, userdata_path, arguments.ping_users, arguments.events)
+            print("ping pass:  {} pings to {} users in {:.2f}s ({:.0f}/s)".format(
+                pings, arguments.ping_users, ping_duration, pings / ping_duration if ping_duration else 0))
+        print("api:        {}".format(api.stats()))
+    finally:
+        BotControl.token = previous_token
+        api.stop()
+        shutil.rmtree(userdata_path)
+
+
+if __name__ == '__main__':
+    main()
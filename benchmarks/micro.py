@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+
+"""Microbenchmarks of the helper functions on the request paths with baselines stored in the repository.
+
+Every benchmark is calibrated to run for a fixed time, the fastest of several repeats counts. The timings are divided
+by the timing of a fixed pure Python workload measured in the same run, so baselines recorded on one machine stay
+comparable on another one. A benchmark that got slower than its tolerance compared with the baseline fails the run.
+
+    python -m benchmarks.micro                    # compare with benchmarks/baselines/micro.json
+    python -m benchmarks.micro --update-baseline  # store the current timings as new baseline
+"""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from benchmarks.dataset import generate_event
+from benchmarks.suite import current_commit
+from control.database_controller import DatabaseController
+from control.event_checker import EventChecker
+from models.day import DayEnum
+from models.event import DEFAULT_PING_STATES, Event, EventType
+from utils import clock
+from utils.clock import SimulatedClock
+from utils.localization_manager import receive_translation
+from utils.parsing_utils import replace_reserved_characters
+from utils.path_utils import PROJECT_ROOT
+
+BASELINE_PATH = os.path.join(PROJECT_ROOT, "benchmarks", "baselines", "micro.json")
+DEFAULT_TOLERANCE = 0.35
+# A monday morning, the benchmarked events take place later that day
+SIMULATED_TIME = datetime(2020, 10, 19, 8, 0)
+EVENT_FILE_SIZES = (1, 10, 100, 1000)
+USER_ID = 4711
+
+MICROBENCHMARKS = []
+
+
+def microbenchmark(tolerance=DEFAULT_TOLERANCE):
+    """Registers a microbenchmark. The function receives the fixture and returns the callable that is timed.
+    Args:
+        tolerance (float, optional): Allowed relative slowdown compared with the baseline, e.g. 0.35 for 35 %.
+    """
+    def register(function):
+        MICROBENCHMARKS.append((function.__name__, function, tolerance))
+        return function
+    return register
+
+
+class Fixture:
+    """User data and events the microbenchmarks run with."""
+
+    def __init__(self, userdata_path):
+        """Constructor.
+        Args:
+            userdata_path (str): Empty directory the user data is written to.
+        """
+        rng = random.Random(0)
+        DatabaseController(userdata_path=userdata_path)
+        DatabaseController.load_user_config(USER_ID)
+
+        # Users that only differ by the amount of their events
+        self.event_file_users = {}
+        for size in EVENT_FILE_SIZES:
+            user_id = USER_ID + size
+            events = {uuid.UUID(int=rng.getrandbits(128)).hex: generate_event(rng, "Event {}".format(number))
+                      for number in range(size)}
+            with open(os.path.join(userdata_path, "{}_events.json".format(user_id)), "w") as events_file:
+                json.dump(events, events_file)
+            self.event_file_users[size] = user_id
+
+        ping_times = dict(DEFAULT_PING_STATES, **{"00:30": True, "01:00": True})
+        self.event = Event("Weekly_training!", DayEnum.MONDAY, "Bring *shoes* and a towel", EventType.REGULARLY,
+                           "18:30", ping_times)
+        self.event.uuid = uuid.UUID(int=rng.getrandbits(128)).hex
+        self.events = DatabaseController.load_user_events(self.event_file_users[10])
+
+
+@microbenchmark()
+def receive_translation_default(fixture):
+    """Translates a keyword into the default language."""
+    return lambda: receive_translation("event_reminder", "DE")
+
+
+@microbenchmark()
+def receive_translation_english(fixture):
+    """Translates a keyword into english."""
+    return lambda: receive_translation("event_reminder", "EN")
+
+
+@microbenchmark()
+def replace_reserved(fixture):
+    """Replaces the reserved characters of an event name."""
+    return lambda: replace_reserved_characters("My_weekly *training*! at the_gym")
+
+
+@microbenchmark()
+def pretty_print(fixture):
+    """Formats an event for the event list."""
+    return lambda: fixture.event.pretty_print_formatting("DE")
+
+
+@microbenchmark()
+def build_ping_message(fixture):
+    """Builds the reminder of an event."""
+    return lambda: EventChecker.build_ping_message(USER_ID, fixture.event)
+
+
+@microbenchmark()
+def check_ping_not_needed(fixture):
+    """Checks an event whose pings are not due yet, so nothing is written."""
+    return lambda: EventChecker.check_ping_needed(USER_ID, fixture.event)
+
+
+@microbenchmark()
+def keyboard_type(fixture):
+    """Builds the keyboard of the event types."""
+    return lambda: Event.event_keyboard_type("DE", "event_creation")
+
+
+@microbenchmark()
+def keyboard_day(fixture):
+    """Builds the keyboard of the weekdays."""
+    return lambda: Event.event_keyboard_day("DE", "event_creation")
+
+
+@microbenchmark()
+def keyboard_hours(fixture):
+    """Builds the keyboard of the hours."""
+    return lambda: Event.event_keyboard_hours("event_creation")
+
+
+@microbenchmark()
+def keyboard_minutes(fixture):
+    """Builds the keyboard of the minutes."""
+    return lambda: Event.event_keyboard_minutes("event_creation")
+
+
+@microbenchmark()
+def keyboard_alteration(fixture):
+    """Builds the keyboard of the event list."""
+    return lambda: Event.event_keyboard_alteration("DE")
+
+
+@microbenchmark()
+def keyboard_alteration_action(fixture):
+    """Builds the keyboard listing ten events."""
+    return lambda: Event.event_keyboard_alteration_action(fixture.events, "DE", "change")
+
+
+@microbenchmark()
+def keyboard_alteration_change_start(fixture):
+    """Builds the keyboard of the properties of an event."""
+    return lambda: Event.event_keyboard_alteration_change_start("DE", "event_change")
+
+
+@microbenchmark()
+def keyboard_ping_times(fixture):
+    """Builds the keyboard of the ping times."""
+    return lambda: Event.event_keyboard_ping_times("DE", "event_creation", fixture.event.ping_times)
+
+
+@microbenchmark()
+def keyboard_confirmation(fixture):
+    """Builds the confirmation keyboard."""
+    return lambda: Event.event_keyboard_confirmation("DE", "event_delete")
+
+
+def _register_load_user_events(size):
+    """Registers the benchmark loading an events file of the given amount of events."""
+    def load_user_events(fixture):
+        user_id = fixture.event_file_users[size]
+        return lambda: DatabaseController.load_user_events(user_id)
+    load_user_events.__name__ = "load_user_events_{}".format(size)
+    # Reading files depends more on the system than the other benchmarks
+    microbenchmark(tolerance=1.0)(load_user_events)
+
+
+for event_file_size in EVENT_FILE_SIZES:
+    _register_load_user_events(event_file_size)
+
+
+def calibration_workload():
+    """Fixed pure Python workload the timings are divided by."""
+    values = {}
+    for number in range(200):
+        values["{}_{}".format(number, number % 7)] = [number] * 3
+    return sorted(values, key=len)
+
+
+def measure(function, target_seconds, repeat):
+    """Measures the seconds a single call of the function takes.
+    Args:
+        function (callable): Function that is timed.
+        target_seconds (float): Duration of a single repeat.
+        repeat (int): Amount of repeats, the fastest one counts.
+    Returns:
+        float: Seconds per call.
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        duration = time.perf_counter() - start
+        if duration >= target_seconds / 10:
+            break
+        loops *= 10
+    loops = max(1, int(loops * target_seconds / duration))
+
+    best = None
+    # Like timeit the garbage collector does not interrupt the measurement
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(loops):
+                function()
+            duration = (time.perf_counter() - start) / loops
+            best = duration if best is None else min(best, duration)
+    finally:
+        gc.enable()
+    return best
+
+
+def run_microbenchmarks(fixture, target_seconds, repeat, rounds, selected=None):
+    """Runs the microbenchmarks.
+    Args:
+        fixture (Fixture): Data of the benchmarks.
+        target_seconds (float): Duration of a single repeat.
+        repeat (int): Amount of repeats, the fastest one counts.
+        rounds (int): Amount of runs over all benchmarks, the median of their results counts.
+        selected (list of 'str', optional): Names of the benchmarks to run, all if not given.
+    Returns:
+        dict: Results of the benchmarks by their names.
+    """
+    benchmarks = [(name, function(fixture), tolerance) for name, function, tolerance in MICROBENCHMARKS
+                  if not selected or name in selected]
+    timings = {name: [] for name, _, _ in benchmarks}
+    # Short load peaks of the machine only spoil single rounds instead of whole benchmarks
+    for _ in range(rounds):
+        for name, function, _ in benchmarks:
+            # Calibrated right before every benchmark so changes of the machine load affect both timings alike
+            calibration = measure(calibration_workload, target_seconds, repeat)
+            seconds = measure(function, target_seconds, repeat)
+            timings[name].append((seconds / calibration, seconds))
+
+    results = {}
+    for name, _, tolerance in benchmarks:
+        relative, seconds = sorted(timings[name])[len(timings[name]) // 2]
+        results[name] = {"seconds_per_call": seconds, "relative": relative, "tolerance": tolerance}
+        print("{:<36} {:>12.2f}us {:>10.3f}x".format(name, seconds * 1e6, relative))
+    return results
+
+
+def find_slowdowns(results, baseline):
+    """Compares the relative timings with the baseline.
+    Args:
+        results (dict): Results of the current run by benchmark name.
+        baseline (dict): Results of the baseline by benchmark name.
+    Returns:
+        list of 'str': Descriptions of all benchmarks that got slower than their tolerance.
+    """
+    slowdowns = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["relative"] / baseline[name]["relative"]
+        if ratio > 1 + result["tolerance"]:
+            slowdowns.append("{} is {:.0%} slower than the baseline, {:.0%} are allowed".format(
+                name, ratio - 1, result["tolerance"]))
+    return slowdowns
+
+
+def main():
+    """Runs the microbenchmarks and compares them with the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("names", nargs="*", help="Benchmarks to run, all by default")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline to compare with")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as new baseline")
+    parser.add_argument("--seconds", type=float, default=0.1, help="Duration of a single repeat")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeats of every benchmark, the fastest one counts")
+    parser.add_argument("--rounds", type=int, default=3, help="Runs over all benchmarks, the median counts")
+    arguments = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    userdata_path = tempfile.mkdtemp(prefix="remindeasy_micro_")
+    previous_clock = clock.use_clock(SimulatedClock(SIMULATED_TIME))
+    try:
+        results = run_microbenchmarks(Fixture(userdata_path), arguments.seconds, arguments.repeat, arguments.rounds,
+                                      arguments.names)
+    finally:
+        clock.use_clock(previous_clock)
+        shutil.rmtree(userdata_path)
+
+    if arguments.update_baseline:
+        baseline = {}
+        if arguments.names and os.path.exists(arguments.baseline):
+            with open(arguments.baseline, "r") as baseline_file:
+                baseline = json.load(baseline_file)["benchmarks"]
+        baseline.update(results)
+        os.makedirs(os.path.dirname(arguments.baseline), exist_ok=True)
+        with open(arguments.baseline, "w") as baseline_file:
+            json.dump({"commit": current_commit(), "created": datetime.now().isoformat(), "benchmarks": baseline},
+                      baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        return
+
+    if not os.path.exists(arguments.baseline):
+        print("No baseline at {}, run with --update-baseline to create it".format(arguments.baseline))
+        return
+    with open(arguments.baseline, "r") as baseline_file:
+        baseline = json.load(baseline_file)
+    slowdowns = find_slowdowns(results, baseline["benchmarks"])
+    for slowdown in slowdowns:
+        print("SLOWER: {}".format(slowdown))
+    if slowdowns:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+"""Replays a recording of the UpdateRecorder through the handlers of the bot and reports their latency.
+
+The updates are processed by the dispatcher and the handlers of the bot like in production, the requests of the
+handlers are answered by the local fake Bot API. The updates are fed as fast as possible or at their recorded pace,
+scaled by ``--speed``. Every replay starts with empty user data, so the recorded dialogs run the same way every time.
+
+    python -m benchmarks.replay .data/recordings/updates.jsonl.gz --workers 4 --speed 0
+
+Callback queries refer to the events of the recorded users. Their IDs are random and differ in the replay, so
+queries for events that were created during the recording are processed as stale queries.
+"""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import argparse
+import logging
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from telegram import Update
+
+from benchmarks.fake_bot_api import FakeBotApi
+from benchmarks.webhook_harness import percentile
+from control.bot_control import BotControl
+from control.database_controller import DatabaseController
+from control.keyed_dispatcher import KeyedDispatcher
+from control.update_recorder import read_recording
+
+TOKEN = "123456:replay"
+
+
+class HandlerTimer:
+    """Wraps the callbacks of all handlers of a dispatcher and collects their durations."""
+
+    def __init__(self, dispatcher):
+        """Constructor.
+        Args:
+            dispatcher (telegram.ext.Dispatcher): Dispatcher whose handlers are timed.
+        """
+        self.durations = defaultdict(list)
+        self.lock = threading.Lock()
+        for handlers in dispatcher.handlers.values():
+            for handler in handlers:
+                handler.callback = self.wrap(KeyedDispatcher.handler_name(handler), handler.callback)
+
+    def wrap(self, name, callback):
+        """Returns the callback that records its duration under the given name."""
+        def timed(update, context):
+            start = time.perf_counter()
+            try:
+                return callback(update, context)
+            finally:
+                duration = time.perf_counter() - start
+                with self.lock:
+                    self.durations[name].append(duration)
+        return timed
+
+
+def replay(dispatcher, records, speed):
+    """Feeds the updates into the dispatcher and waits until all of them are processed.
+    Args:
+        dispatcher (control.keyed_dispatcher.KeyedDispatcher): Dispatcher with the handlers of the bot.
+        records (list of 'tuple'): Recorded time and update.
+        speed (float): Factor of the recorded pace, as fast as possible if 0.
+    Returns:
+        float: Seconds until the last update was processed.
+    """
+    thread = threading.Thread(target=dispatcher.start, name="dispatcher", daemon=True)
+    thread.start()
+    while not dispatcher.running:
+        time.sleep(0.01)
+
+    first = records[0][0] if records else 0
+    start = time.monotonic()
+    for recorded_time, data in records:
+        if speed:
+            delay = start + (recorded_time - first) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        dispatcher.update_queue.put(Update.de_json(data, dispatcher.bot))
+
+    # The dispatcher only stops once its queue is empty and waits for its workers
+    dispatcher.stop()
+    thread.join()
+    return time.monotonic() - start
+
+
+def main():
+    """Replays the recording and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help="Recording of the UpdateRecorder")
+    parser.add_argument("--speed", type=float, default=0, help="Factor of the recorded pace, as fast as possible if 0")
+    parser.add_argument("--workers", type=int, default=4, help="Amount of threads processing updates")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds every Bot API request takes")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING)
+    # Importing the bot configures the DatabaseController with the real paths
+    from control.main import callback_router, register_handlers
+
+    records = read_recording(arguments.recording)
+    userdata_path = tempfile.mkdtemp(prefix="remindeasy_replay_")
+    api = FakeBotApi(TOKEN, latency=arguments.latency)
+    api.start()
+    previous_token = BotControl.token
+    BotControl.token = TOKEN
+    try:
+        DatabaseController(userdata_path=userdata_path)
+        dispatcher = BotControl.setup_bot(update_workers=arguments.workers, base_url=api.base_url).dispatcher
+        register_handlers(dispatcher)
+        timer = HandlerTimer(dispatcher)
+        duration = replay(dispatcher, records, arguments.speed)
+    finally:
+        BotControl.token = previous_token
+        api.stop()
+        shutil.rmtree(userdata_path)
+
+    print("updates:    {} in {:.2f}s ({:.0f}/s)".format(len(records), duration,
+                                                        len(records) / duration if duration else 0))
+    print("{:<36} {:>8} {:>10} {:>10} {:>10} {:>10}".format("handler", "calls", "p50 ms", "p95 ms", "p99 ms",
+                                                            "max ms"))
+    for name, durations in sorted(timer.durations.items()):
+        durations.sort()
+        print("{:<36} {:>8} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+            name, len(durations), *(percentile(durations, fraction) * 1000 for fraction in (0.5, 0.95, 0.99, 1.0))))
+    for name, route in sorted(callback_router.stats()["routes"].items()):
+        if route["calls"] or route["rejected"]:
+            print("route {:<30} {:>8} calls {:>8} rejected {:>10.2f} ms mean".format(
+                name, route["calls"], route["rejected"], route["total_seconds"] / max(route["calls"], 1) * 1000))
+    print("api:        {}".format(api.stats()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+"""Benchmark suite for the storage, the event checker and the rendering of events.
+
+Every benchmark runs against a synthetic population and reports the seconds per operation. The results are written
+to a JSON file. Given the results of an earlier commit as baseline, every benchmark that got slower than the
+threshold allows is reported as regression and the suite exits with status 1.
+
+    python -m benchmarks.suite --users 10000 --output results.json --baseline baseline.json
+"""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import argparse
+import json
+import logging
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from benchmarks.dataset import write_population
+from benchmarks.fake_bot import FakeBot
+from control.bot_control import BotControl
+from control.database_controller import DatabaseController
+from control.event_checker import EventChecker
+from control.event_handler import EventHandler
+from models.event import Event
+from models.user import User
+from utils import clock
+from utils.clock import SimulatedClock
+from utils.path_utils import PROJECT_ROOT
+
+# A wednesday noon, many events of the population are due around that time
+SIMULATED_TIME = datetime(2020, 10, 21, 12, 0)
+DEFAULT_THRESHOLD = 0.2
+
+BENCHMARKS = []
+
+
+def benchmark(repeatable=True):
+    """Registers a benchmark. The function receives the suite and returns the amount of operations it performed.
+    Args:
+        repeatable (bool, optional): False for benchmarks that change the data, they are run only once.
+    """
+    def register(function):
+        BENCHMARKS.append((function.__name__, function, repeatable))
+        return function
+    return register
+
+
+class Suite:
+    """Population and settings the benchmarks run with."""
+
+    def __init__(self, userdata_path, user_ids, sample_size, seed):
+        """Constructor.
+        Args:
+            userdata_path (str): Directory containing the population.
+            user_ids (list of 'str'): IDs of all users of the population.
+            sample_size (int): Amount of users the per user benchmarks use.
+            seed (int): Seed of the sample.
+        """
+        self.userdata_path = userdata_path
+        self.user_ids = user_ids
+        self.sample = random.Random(seed).sample(user_ids, min(sample_size, len(user_ids)))
+        self.checker = EventChecker()
+        # Only the decisions and the sending are measured, not the smoothing of the pings
+        self.checker.delivery.window = 0
+        self.day = SIMULATED_TIME.weekday()
+
+
+@benchmark()
+def database_load_all_user_ids(suite):
+    """Lists the IDs of all users."""
+    DatabaseController.load_all_user_ids()
+    return 1
+
+
+@benchmark()
+def database_load_user_config(suite):
+    """Loads the config of every sampled user."""
+    for user_id in suite.sample:
+        DatabaseController.load_user_config(user_id)
+    return len(suite.sample)
+
+
+@benchmark()
+def database_load_user_events(suite):
+    """Loads and parses the events of every sampled user."""
+    for user_id in suite.sample:
+        DatabaseController.load_user_events(user_id)
+    return len(suite.sample)
+
+
+@benchmark()
+def database_read_event(suite):
+    """Reads a single event of every sampled user."""
+    for user_id in suite.sample:
+        DatabaseController.read_event_of_user(user_id, "missing")
+    return len(suite.sample)
+
+
+@benchmark()
+def database_save_event(suite):
+    """Saves an event of every sampled user that has events."""
+    saved = 0
+    for user_id in suite.sample:
+        events = DatabaseController.load_user_events(user_id)
+        if events:
+            DatabaseController.save_event_data_user(user_id, events[0])
+            saved += 1
+    return max(saved, 1)
+
+
+@benchmark(repeatable=False)
+def checker_ping_pass(suite):
+    """Runs one pass of the reminder pings over all users."""
+    suite.checker._ping_users(suite.user_ids, suite.day)
+    suite.checker._deliver_pings()
+    return len(suite.user_ids)
+
+
+@benchmark(repeatable=False)
+def checker_daily_ping_pass(suite):
+    """Runs the daily ping over all users."""
+    suite.checker._daily_ping_users(suite.user_ids, suite.day)
+    return len(suite.user_ids)
+
+
+@benchmark(repeatable=False)
+def checker_refresh_pass(suite):
+    """Refreshes the pings of all users."""
+    suite.checker._refresh_start_pings(suite.user_ids, suite.day)
+    return len(suite.user_ids)
+
+
+@benchmark()
+def list_events(suite):
+    """Lists the events of every sampled user."""
+    for user_id in suite.sample:
+        context = SimpleNamespace(request_context=SimpleNamespace(user=User(user_id)))
+        EventHandler.list_all_events_of_user(None, context)
+    return len(suite.sample)
+
+
+@benchmark()
+def render_keyboards(suite):
+    """Renders the alteration keyboards of every sampled user."""
+    for user_id in suite.sample:
+        user = User(user_id)
+        Event.event_keyboard_alteration_action(user.events, user.language, "change")
+        for event in user.events:
+            Event.event_keyboard_alteration(user.language, "event", "_{}".format(event.uuid))
+    return len(suite.sample)
+
+
+def run_suite(suite, repeat):
+    """Runs all benchmarks.
+    Args:
+        suite (Suite): Population and settings of the benchmarks.
+        repeat (int): Amount of runs of repeatable benchmarks, the fastest run counts.
+    Returns:
+        dict: Results of all benchmarks by their names.
+    """
+    results = {}
+    for name, function, repeatable in BENCHMARKS:
+        best = None
+        for _ in range(repeat if repeatable else 1):
+            start = time.perf_counter()
+            operations = function(suite)
+            duration = time.perf_counter() - start
+            if best is None or duration < best[1]:
+                best = (operations, duration)
+        operations, duration = best
+        results[name] = {"operations": operations, "seconds": duration,
+                         "seconds_per_operation": duration / operations}
+        print("{:<28} {:>10} ops {:>10.3f}s {:>12.1f}us/op".format(
+            name, operations, duration, duration / operations * 1e6))
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """Compares the results with the baseline.
+    Args:
+        results (dict): Results of the current run by benchmark name.
+        baseline (dict): Results of an earlier run by benchmark name.
+        threshold (float): Allowed relative slowdown, e.g. 0.2 for 20 %.
+    Returns:
+        list of 'str': Descriptions of all regressions.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["seconds_per_operation"] / baseline[name]["seconds_per_operation"]
+        if ratio > 1 + threshold:
+            regressions.append("{} is {:.0%} slower than the baseline".format(name, ratio - 1))
+    return regressions
+
+
+def current_commit():
+    """Returns the current git commit or None if it is unknown."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """Runs the suite and compares it with the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000, help="Amount of synthetic users")
+    parser.add_argument("--events", type=float, default=5, help="Average amount of events per user")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the population")
+    parser.add_argument("--sample", type=int, default=1000, help="Amount of users of the per user benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of every repeatable benchmark")
+    parser.add_argument("--userdata-path", help="Existing population to use instead of a temporary one")
+    parser.add_argument("--output", help="File the results are written to")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed relative slowdown")
+    arguments = parser.parse_args()
+
+    # The checker logs every pass, that would only measure the logging
+    logging.disable(logging.WARNING)
+
+    userdata_path = arguments.userdata_path or tempfile.mkdtemp(prefix="remindeasy_benchmark_")
+    try:
+        DatabaseController(userdata_path=userdata_path)
+        if not arguments.userdata_path:
+            start = time.perf_counter()
+            write_population(userdata_path, arguments.users, arguments.events, arguments.seed)
+            print("Generated {} users in {:.1f}s".format(arguments.users, time.perf_counter() - start))
+
+        previous_clock = clock.use_clock(SimulatedClock(SIMULATED_TIME))
+        BotControl.bot = FakeBot()
+        try:
+            suite = Suite(userdata_path, DatabaseController.load_all_user_ids(), arguments.sample, arguments.seed)
+            results = run_suite(suite, arguments.repeat)
+        finally:
+            clock.use_clock(previous_clock)
+    finally:
+        if not arguments.userdata_path:
+            shutil.rmtree(userdata_path)
+
+    report = {"commit": current_commit(), "created": datetime.now().isoformat(), "users": len(suite.user_ids),
+              "sample": len(suite.sample), "benchmarks": results}
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = find_regressions(results, baseline["benchmarks"], arguments.threshold)
+        for regression in regressions:
+            print("REGRESSION: {}".format(regression))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""Harness that runs the event checker through simulated days against a fake bot."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from benchmarks.dataset import write_population
+from benchmarks.fake_bot import FakeBot
+from control.bot_control import BotControl
+from control.database_controller import DatabaseController
+from control.event_checker import EventChecker, PING_LAG, LAG_QUANTILES
+from utils import clock
+from utils.clock import SimulatedClock
+
+# A monday, so a week of simulated days contains every weekday once
+DEFAULT_START = "2020-10-19T00:00"
+
+
+def count_missed_events(userdata_path, messages, start, end):
+    """Counts the events that were pinged less often than they took place.
+    Args:
+        userdata_path (str): Directory containing the user files.
+        messages (list of 'SentMessage'): Messages sent by the fake bot.
+        start (datetime): Begin of the simulation.
+        end (datetime): End of the simulation.
+    Returns:
+        tuple: Amount of events and amount of events that were missed.
+    """
+    mentions = Counter()
+    for message in messages:
+        for line in message.text.splitlines():
+            mentions[(str(message.chat_id), line.rsplit(" ", 1)[-1])] += 1
+
+    events = 0
+    missed = 0
+    for user_id in DatabaseController.load_all_user_ids():
+        with open(os.path.join(userdata_path, "{}_events.json".format(user_id))) as events_file:
+            user_events = json.load(events_file)
+        for event in user_events.values():
+            hours, minutes = (int(part) for part in event["event_time"].split(":"))
+            occurrences = 0
+            day = start.replace(hour=hours, minute=minutes)
+            while day < end:
+                if day >= start and day.weekday() == event["day"]:
+                    occurrences += 1
+                day += timedelta(days=1)
+            events += 1
+            if mentions[(str(user_id), event["title"])] < occurrences:
+                missed += 1
+    return events, missed
+
+
+def main():
+    """Runs the simulation and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=float, default=7, help="Amount of simulated days")
+    parser.add_argument("--users", type=int, default=50, help="Amount of synthetic users")
+    parser.add_argument("--events", type=int, default=5, help="Amount of events per user")
+    parser.add_argument("--interval", type=int, help="Interval of the checker, the configured one by default")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds every sent message takes")
+    parser.add_argument("--start", default=DEFAULT_START, help="Simulated start time as ISO timestamp")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic users")
+    arguments = parser.parse_args()
+
+    userdata_path = tempfile.mkdtemp(prefix="remindeasy_time_travel_")
+    try:
+        DatabaseController(userdata_path=userdata_path)
+        write_population(userdata_path, arguments.users, arguments.events, arguments.seed)
+
+        start = datetime.fromisoformat(arguments.start)
+        end = start + timedelta(days=arguments.days)
+        previous_clock = clock.use_clock(SimulatedClock(start))
+        bot = FakeBot(latency=arguments.latency)
+        BotControl.bot = bot
+
+        checker = EventChecker()
+        if arguments.interval:
+            checker.interval = arguments.interval
+
+        wall_start = time.perf_counter()
+        try:
+            checker.check_events(until=end)
+        finally:
+            clock.use_clock(previous_clock)
+        wall_duration = time.perf_counter() - wall_start
+
+        events, missed = count_missed_events(userdata_path, bot.messages, start, end)
+    finally:
+        shutil.rmtree(userdata_path)
+
+    print("simulated:  {} -> {}".format(start.isoformat(), end.isoformat()))
+    print("duration:   {:.2f}s ({:.0f}x real time)".format(wall_duration,
+                                                           (end - start).total_seconds() / wall_duration))
+    print("messages:   {}".format(len(bot.messages)))
+    per_day = Counter(message.time.date() for message in bot.messages)
+    for day in sorted(per_day):
+        print("  {} {:>8}".format(day.isoformat(), per_day[day]))
+    for (kind,), lag_histogram in sorted(PING_LAG.children.items()):
+        print("lag {:<8} p50 {:.0f}s | p95 {:.0f}s | p99 {:.0f}s".format(
+            kind, *(lag_histogram.quantile(fraction) for fraction in LAG_QUANTILES)))
+    print("missed:     {} of {} events".format(missed, events))
+
+
+if __name__ == '__main__':
+    main()
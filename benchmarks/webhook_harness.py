@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+"""Harness that POSTs recorded or synthetic updates to the webhook server and measures latency and throughput."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import argparse
+import http.client
+import json
+import threading
+import time
+from queue import Empty, Queue
+from urllib.parse import urlsplit
+
+from telegram import Update, User
+from telegram.ext import TypeHandler
+from telegram.ext.extbot import ExtBot
+
+from control.keyed_dispatcher import KeyedDispatcher
+from control.update_recorder import read_recording
+from control.webhook_server import WebhookServer
+
+
+def load_updates(recording_path, amount, chats):
+    """Loads the recorded updates or creates synthetic text messages.
+    Args:
+        recording_path (str): Path of a recording of the UpdateRecorder. May be None.
+        amount (int): Amount of synthetic updates.
+        chats (int): Amount of chats the synthetic updates are spread over.
+    Returns:
+        list of 'dict': Updates as they are sent by Telegram.
+    """
+    if recording_path:
+        return [update for _, update in read_recording(recording_path)]
+
+    updates = []
+    for update_id in range(amount):
+        chat_id = 1000 + update_id % chats
+        user = {"id": chat_id, "is_bot": False, "first_name": "Harness"}
+        updates.append({"update_id": update_id,
+                        "message": {"message_id": update_id, "date": int(time.time()), "text": "ping",
+                                    "from": user, "chat": {"id": chat_id, "type": "private"}}})
+    return updates
+
+
+def percentile(values, fraction):
+    """Returns the given percentile of the values.
+    Args:
+        values (list of 'float'): Sorted values.
+        fraction (float): Percentile between 0 and 1.
+    Returns:
+        float: Value at the percentile.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def send_updates(url, updates, connections, sent_times, answer_times):
+    """POSTs the updates with the given amount of parallel keep-alive connections. Updates answered with 503 are
+    retried like Telegram does.
+    Args:
+        url (str): URL of the webhook including the secret path.
+        updates (list of 'dict'): Updates that are sent.
+        connections (int): Amount of parallel connections.
+        sent_times (dict): Receives the time every update was sent first.
+        answer_times (list): Receives the time until the webhook accepted an update.
+    Returns:
+        int: Amount of 503 responses.
+    """
+    target = urlsplit(url)
+    pending = Queue()
+    for update in updates:
+        pending.put(update)
+    retries = [0]
+    lock = threading.Lock()
+
+    def sender():
+        connection = http.client.HTTPConnection(target.hostname, target.port)
+        while True:
+            try:
+                update = pending.get_nowait()
+            except Empty:
+                break
+            body = json.dumps(update).encode()
+            while True:
+                start = time.perf_counter()
+                sent_times.setdefault(update["update_id"], start)
+                connection.request("POST", target.path, body, {"Content-Type": "application/json"})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 503:
+                    break
+                with lock:
+                    retries[0] += 1
+                time.sleep(0.01)
+            with lock:
+                answer_times.append(time.perf_counter() - start)
+        connection.close()
+
+    threads = [threading.Thread(target=sender) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return retries[0]
+
+
+def run_local(arguments, updates):
+    """Starts a webhook server with a dispatcher that simulates work and sends the updates to it.
+    Returns:
+        tuple: Sent times, handled times, answer times, amount of retries and the stats of the server.
+    """
+    bot = ExtBot("123456:harness")
+    # Skip the getMe request of the dispatcher, the harness never talks to Telegram
+    bot._bot = User(0, "harness", True)
+    dispatcher = KeyedDispatcher(bot, Queue(maxsize=arguments.queue_size), use_context=True,
+                                 update_workers=arguments.workers, max_pending_updates=arguments.queue_size)
+
+    handled_times = {}
+
+    def handle(update, context):
+        time.sleep(arguments.work_ms / 1000)
+        handled_times[update.update_id] = time.perf_counter()
+
+    dispatcher.add_handler(TypeHandler(Update, handle))
+
+    server = WebhookServer(dispatcher, port=0)
+    server.start()
+    sent_times = {}
+    answer_times = []
+    url = "http://127.0.0.1:{}{}".format(server.port, server.path)
+    retries = send_updates(url, updates, arguments.connections, sent_times, answer_times)
+    server.stop()
+    return sent_times, handled_times, answer_times, retries, server.stats()
+
+
+def main():
+    """Runs the harness and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="Webhook URL of a running bot including the secret path")
+    parser.add_argument("--recording", help="File containing one JSON encoded update per line")
+    parser.add_argument("--updates", type=int, default=2000, help="Amount of synthetic updates")
+    parser.add_argument("--chats", type=int, default=50, help="Amount of chats of the synthetic updates")
+    parser.add_argument("--connections", type=int, default=8, help="Amount of parallel connections")
+    parser.add_argument("--workers", type=int, default=4, help="Amount of update workers of the local dispatcher")
+    parser.add_argument("--queue-size", type=int, default=256, help="Size of the update queue of the local server")
+    parser.add_argument("--work-ms", type=float, default=1.0, help="Simulated handler duration in milliseconds")
+    arguments = parser.parse_args()
+
+    updates = load_updates(arguments.recording, arguments.updates, arguments.chats)
+    start = time.perf_counter()
+    if arguments.url:
+        sent_times, handled_times, answer_times = {}, {}, []
+        retries = send_updates(arguments.url, updates, arguments.connections, sent_times, answer_times)
+        stats = None
+    else:
+        sent_times, handled_times, answer_times, retries, stats = run_local(arguments, updates)
+    duration = time.perf_counter() - start
+
+    print("updates:    {}".format(len(updates)))
+    print("duration:   {:.3f}s".format(duration))
+    print("throughput: {:.1f} updates/s".format(len(updates) / duration))
+    print("retries:    {}".format(retries))
+    answer_times.sort()
+    print("answer ms:  p50 {:.2f} | p95 {:.2f} | p99 {:.2f}".format(
+        *(percentile(answer_times, fraction) * 1000 for fraction in (0.5, 0.95, 0.99))))
+    if handled_times:
+        latencies = sorted(handled_times[update_id] - sent_times[update_id] for update_id in handled_times)
+        print("handled ms: p50 {:.2f} | p95 {:.2f} | p99 {:.2f}".format(
+            *(percentile(latencies, fraction) * 1000 for fraction in (0.5, 0.95, 0.99))))
+    if stats:
+        print("server:     {}".format(stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,43 +7,68 @@
 # Author: Daniel Bebber <daniel.bebber@gmx.de>
 # ----------------------------------------------
 import os
+from queue import Queue
 
 import telegram
-from telegram.ext import Updater
+from telegram.ext import JobQueue, Updater
+from telegram.ext.extbot import ExtBot
+from telegram.utils.request import Request
 
+from control.keyed_dispatcher import KeyedDispatcher
 from utils.path_utils import DATA_PATH
 
 
 class BotControl:
     """Holds shortcuts and controlling options for the bot."""
     token = None
+    bot = None
+    base_url = None
 
     @classmethod
-    def setup_bot(cls):
-        """
+    def setup_bot(cls, update_workers=1, update_queue_size=0, base_url=None):
+        """Creates the updater. Its dispatcher processes the updates of different chats in parallel with the given
+        amount of workers while the updates of one chat keep their order.
+        Args:
+            update_workers (int, optional): Amount of threads processing updates.
+            update_queue_size (int, optional): Maximum amount of updates waiting inside the update queue and the
+                workers each. Unbounded if 0.
+            base_url (str, optional): URL of the Bot API the token is appended to, e.g. of a local Bot API server.
+                The official one is used if not given.
         Returns:
-
+            telegram.ext.Updater: Updater of the bot.
         """
-        token_file_path = os.path.join(DATA_PATH, ".token")
-        if not token_file_path:
-            raise RuntimeError("Token file {} was not found!".format(token_file_path))
+        # A token that was already set, e.g. by a load test, is kept
+        if not cls.token:
+            token_file_path = os.path.join(DATA_PATH, ".token")
+            if not token_file_path:
+                raise RuntimeError("Token file {} was not found!".format(token_file_path))
 
-        with open(token_file_path) as token_file:
-            cls.token = token_file.read()
+            with open(token_file_path) as token_file:
+                cls.token = token_file.read()
 
-        if not cls.token:
-            raise RuntimeError("Token in {} was empty".format(token_file_path))
+            if not cls.token:
+                raise RuntimeError("Token in {} was empty".format(token_file_path))
 
-        # Create the Updater and pass it your bots token.
-        # Make sure to set use_context=True to use the new context based callbacks
-        # Post version 12 this will no longer be necessary
-        updater = Updater(cls.token, use_context=True)
+        cls.base_url = base_url or None
+
+        # Every worker may send requests at the same time, keep some connections for the updater and the job queue
+        cls.bot = ExtBot(cls.token, base_url=cls.base_url, request=Request(con_pool_size=update_workers + 4))
+        job_queue = JobQueue()
+        dispatcher = KeyedDispatcher(cls.bot, Queue(maxsize=update_queue_size), job_queue=job_queue, use_context=True,
+                                     update_workers=update_workers, max_pending_updates=update_queue_size or None)
+        job_queue.set_dispatcher(dispatcher)
+
+        # The workers belong to the passed dispatcher, the updater must not create its own ones
+        updater = Updater(dispatcher=dispatcher, workers=None)
         return updater
 
     @classmethod
     def get_bot(cls):
-        """
+        """Returns the bot of the updater so all messages share its connection pool. Harnesses may replace it by
+        setting ``BotControl.bot``.
         Returns:
-
+            telegram.Bot: Bot that sends the messages.
         """
-        return telegram.Bot(token=cls.token)
+        if cls.bot is None:
+            cls.bot = telegram.Bot(token=cls.token, base_url=cls.base_url)
+        return cls.bot
@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+
+"""Embedded HTTP server that serves the events of the users as iCalendar feeds."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import hashlib
+import hmac
+import logging
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from control.database_controller import DatabaseController
+from models.event import Event, EventType
+from models.recurrence import MONTHLY, WEEKLY, Recurrence
+from models.user import CACHE_REQUESTS
+from utils.icalendar_utils import WEEKDAYS, escape_text, fold_line, format_date_time
+from utils.localization_manager import receive_translation
+from utils.metrics import registry
+from utils.time_zones import to_timestamp
+
+logger = logging.getLogger(__name__)
+
+FEED_RESPONSES = registry.counter("calendar_feed_responses", "Responses of the calendar feed by status.", ("status",))
+
+PRODUCT_ID = "-//RemindEasy//RemindEasy Bot//EN"
+# Feeds that are cached at most, the feeds that were requested least recently are dropped first.
+DEFAULT_MAX_SIZE = 10000
+# Time stamp of events that were saved before the time of their last modification was stored.
+LEGACY_STAMP = datetime(2020, 1, 1)
+# Monday of the week the weekly rules of events without a date start in.
+UNDATED_WEEK = date(2020, 1, 6)
+
+_FEED_PATH = re.compile(r"^/calendar/(-?\d+)/([0-9a-f]+)\.ics$")
+
+
+class CalendarFeed:
+    """Renders the events of users as iCalendar files.
+
+    Calendar apps poll their subscriptions every few minutes while the events rarely change. The rendered file of
+    every user is cached together with the version of the events it was rendered from, so a request only renders
+    the file again after the events were written. The ETag is the hash of the file, requests that already know it
+    are answered without a body.
+    """
+
+    def __init__(self, secret, max_size=DEFAULT_MAX_SIZE):
+        """Constructor.
+        Args:
+            secret (str): Secret the paths of the feeds are signed with.
+            max_size (int, optional): Feeds that are cached at most.
+        """
+        self.secret = secret.encode()
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def path(self, user_id):
+        """Returns the path of the feed of the user. It can not be guessed without the secret.
+        Args:
+            user_id (int): ID of the user.
+        Returns:
+            str: Path of the feed.
+        """
+        return "/calendar/{}/{}.ics".format(user_id, self._token(user_id))
+
+    def user_of_path(self, path):
+        """Returns the user the given path belongs to.
+        Args:
+            path (str): Requested path without query.
+        Returns:
+            str: ID of the user or None if the path is no valid path of a feed.
+        """
+        match = _FEED_PATH.match(path)
+        if not match or not hmac.compare_digest(match.group(2), self._token(match.group(1))):
+            return None
+        return match.group(1)
+
+    def _token(self, user_id):
+        """Returns the signature of the ID of the user."""
+        return hmac.new(self.secret, str(user_id).encode(), hashlib.sha256).hexdigest()[:32]
+
+    def load(self, user_id):
+        """Returns the feed of the user, it is only rendered again if the events of the user changed.
+        Args:
+            user_id (str): ID of the user.
+        Returns:
+            tuple: ETag and content of the feed.
+        """
+        user_id = str(user_id)
+        # Read before the events, a write during the rendering leads to another rendering on the next request
+        version = DatabaseController.load_event_version(user_id)
+        with self.lock:
+            cached = self.cache.get(user_id)
+            if cached is not None and cached[0] == version:
+                self.cache.move_to_end(user_id)
+                CACHE_REQUESTS.labels("calendar_feed", "hit").inc()
+                return cached[1], cached[2]
+        CACHE_REQUESTS.labels("calendar_feed", "miss").inc()
+
+        body = CalendarFeed.render(DatabaseController.load_user_events(user_id)).encode()
+        etag = '"{}"'.format(hashlib.sha256(body).hexdigest()[:32])
+        with self.lock:
+            self.cache[user_id] = (version, etag, body)
+            self.cache.move_to_end(user_id)
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+        return etag, body
+
+    @staticmethod
+    def render(events):
+        """Renders the events as iCalendar file.
+        Args:
+            events (list of 'Event'): Events of a user.
+        Returns:
+            str: Content of the file.
+        """
+        lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:{}".format(PRODUCT_ID), "CALSCALE:GREGORIAN",
+                 "X-WR-CALNAME:RemindEasy"]
+        for event in events:
+            lines.extend(CalendarFeed._event_lines(event))
+        lines.append("END:VCALENDAR")
+        return "".join("{}\r\n".format(fold_line(line)) for line in lines)
+
+    @staticmethod
+    def _event_lines(event):
+        """Renders a single event. Single events start at a UTC time, recurring events at a time of their time zone,
+        so their occurrences keep their time across changes of the daylight saving time.
+
+        Events without a date happen on the next occurrence of their weekday, which depends on the current day. They
+        are rendered as weekly rules from a fixed week instead, so the feed only changes when the events are written.
+        A single event without a date is removed from the feed when it is deleted after its start.
+        Args:
+            event (Event): Event that should be rendered.
+        Returns:
+            list of 'str': Unfolded content lines of the event.
+        """
+        event_date = event.date or (UNDATED_WEEK + timedelta(days=event.day.value)).isoformat()
+        start = Event.start_of(event_date, event.event_time)
+        recurrence = event.recurrence
+        if recurrence is None and (event.event_type == EventType.REGULARLY or not event.date):
+            # Not moved to a rule yet, the event happens every week on its day
+            recurrence = Recurrence(WEEKLY, weekdays=[event.day.value], start=start.date())
+        utc_start = format_date_time(CalendarFeed._utc(to_timestamp(start, event.timezone)), utc=True)
+
+        # The last change instead of the time of the rendering, the same events always give the same file
+        stamp = CalendarFeed._utc(event.modified) if event.modified is not None else LEGACY_STAMP
+        lines = ["BEGIN:VEVENT", "UID:{}".format(event.calendar_uid or "{}@remindeasy".format(event.uuid)),
+                 "DTSTAMP:{}".format(format_date_time(stamp, utc=True))]
+        if recurrence is None:
+            lines.append("DTSTART:{}".format(utc_start))
+        else:
+            lines.append("DTSTART{}:{}".format(CalendarFeed._timezone_parameter(event), format_date_time(start)))
+            lines.append("RRULE:{}".format(CalendarFeed._rule(recurrence, event)))
+            exceptions = [Event.start_of(exception, event.event_time) for exception in sorted(recurrence.exceptions)
+                          if exception >= event_date]
+            if exceptions:
+                lines.append("EXDATE{}:{}".format(CalendarFeed._timezone_parameter(event),
+                                                  ",".join(format_date_time(exception) for exception in exceptions)))
+
+        lines.append("SUMMARY:{}".format(escape_text(event.name)))
+        if event.content.strip("-"):
+            lines.append("DESCRIPTION:{}".format(escape_text(event.content)))
+
+        ping_times = {ping_time for ping_time, enabled in event.ping_times.items() if enabled}
+        for ping_time in sorted(ping_times | set(event.ping_times_to_refresh)):
+            hours, minutes = ping_time.split(":")
+            lines.extend(["BEGIN:VALARM", "ACTION:DISPLAY",
+                          "DESCRIPTION:{}".format(escape_text(event.name)),
+                          "TRIGGER:-PT{}H{}M".format(int(hours), int(minutes)), "END:VALARM"])
+        lines.append("END:VEVENT")
+        return lines
+
+    @staticmethod
+    def _rule(recurrence, event):
+        """Renders the rule of a recurring event.
+        Args:
+            recurrence (Recurrence): Rule of the event.
+            event (Event): Event the rule belongs to.
+        Returns:
+            str: Value of the RRULE property.
+        """
+        parts = ["FREQ={}".format(recurrence.frequency.upper())]
+        if recurrence.interval > 1:
+            parts.append("INTERVAL={}".format(recurrence.interval))
+        if recurrence.frequency == WEEKLY:
+            parts.append("BYDAY={}".format(",".join(WEEKDAYS[weekday] for weekday in recurrence.weekdays)))
+        elif recurrence.frequency == MONTHLY and recurrence.month_week is not None:
+            parts.append("BYDAY={}{}".format(recurrence.month_week, WEEKDAYS[recurrence.weekdays[0]]))
+        elif recurrence.frequency == MONTHLY:
+            parts.append("BYMONTHDAY={}".format(recurrence.month_day))
+        if recurrence.until:
+            # The end has to be a UTC time if the start has a time zone
+            last = datetime.combine(recurrence.until, time(23, 59, 59))
+            if event.timezone:
+                parts.append("UNTIL={}".format(format_date_time(
+                    CalendarFeed._utc(to_timestamp(last, event.timezone)), utc=True)))
+            else:
+                parts.append("UNTIL={}".format(format_date_time(last)))
+        return ";".join(parts)
+
+    @staticmethod
+    def _timezone_parameter(event):
+        """Returns the time zone parameter of the times of an event, the time zone of the server has no name and its
+        times are written as floating times."""
+        return ";TZID={}".format(event.timezone) if event.timezone else ""
+
+    @staticmethod
+    def _utc(timestamp):
+        """Returns the UTC time of the timestamp without time zone."""
+        return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+class CalendarFeedRequestHandler(BaseHTTPRequestHandler):
+    """Answers the requests of calendar apps for the feeds."""
+
+    # Calendar apps reuse their connections when they poll several feeds
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        """Sends the feed of the requested user."""
+        self._serve(True)
+
+    def do_HEAD(self):
+        """Sends the headers of the feed of the requested user."""
+        self._serve(False)
+
+    def _serve(self, send_body):
+        """Sends the feed of the requested user or only its headers if the client knows it already.
+        Args:
+            send_body (bool): False for a HEAD request.
+        """
+        feed = self.server.feed
+        user_id = feed.user_of_path(self.path.split("?")[0])
+        # Users the bot can not reach are archived after a while, their feeds are not served to keep the archive
+        if user_id is None or DatabaseController.is_user_inactive(user_id):
+            self._respond(404, {"Content-Length": "0"})
+            return
+
+        etag, body = feed.load(user_id)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if self._etag_matches(etag):
+            self._respond(304, headers)
+            return
+
+        headers.update({"Content-Type": "text/calendar; charset=utf-8", "Content-Length": str(len(body))})
+        self._respond(200, headers, body if send_body else None)
+
+    def _etag_matches(self, etag):
+        """Checks whether the client already has the version of the feed with the given ETag.
+        Args:
+            etag (str): ETag of the current feed.
+        Returns:
+            bool: True if the ETag is one of the ones the client sent.
+        """
+        for known_etag in self.headers.get("If-None-Match", "").split(","):
+            known_etag = known_etag.strip()
+            # The comparison is weak for If-None-Match
+            if known_etag.startswith("W/"):
+                known_etag = known_etag[2:]
+            if known_etag in ("*", etag):
+                return True
+        return False
+
+    def _respond(self, status, headers, body=None):
+        """Sends a response.
+        Args:
+            status (int): HTTP status code.
+            headers (dict): Headers of the response.
+            body (bytes, optional): Body of the response.
+        """
+        FEED_RESPONSES.labels(str(status)).inc()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Logs the requests with the logger of the module instead of stderr."""
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class CalendarFeedServer:
+    """Serves the events of every user as iCalendar feed that calendar apps can subscribe to.
+
+    The path of a feed contains the ID of the user signed with the secret, so only the user who got it from the bot
+    can read the feed. The secret is generated on every start unless it is configured, the feeds get new paths then.
+    """
+
+    def __init__(self, listen="127.0.0.1", port=8444, url="", secret="", max_size=DEFAULT_MAX_SIZE):
+        """Constructor.
+        Args:
+            listen (str, optional): Address the server listens on.
+            port (int, optional): Port the server listens on. 0 selects a free port.
+            url (str, optional): Public base URL of the server, e.g. of a reverse proxy. The address the server
+                listens on if not given.
+            secret (str, optional): Secret the paths of the feeds are signed with. Generated if empty.
+            max_size (int, optional): Feeds that are cached at most.
+        """
+        if not secret:
+            logger.warning("No secret for the calendar feeds is configured, the feeds only work until the next start")
+        self.feed = CalendarFeed(secret or secrets.token_hex(32), max_size)
+        self.httpd = ThreadingHTTPServer((listen, port), CalendarFeedRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.feed = self.feed
+        self.url = url.rstrip("/") or "http://{}:{}".format(*self.httpd.server_address[:2])
+        self.thread = None
+
+    @property
+    def port(self):
+        """Returns the port the server is bound to."""
+        return self.httpd.server_address[1]
+
+    def feed_url(self, user_id):
+        """Returns the URL of the feed of the user.
+        Args:
+            user_id (int): ID of the user.
+        Returns:
+            str: URL calendar apps can subscribe to.
+        """
+        return "{}{}".format(self.url, self.feed.path(user_id))
+
+    def handle_command(self, update, context):
+        """Sends the URL of the feed when the command /calendar_feed is issued."""
+        user = context.request_context.user
+        update.message.reply_text(receive_translation("calendar_feed_url", user.language).format(
+            URL=self.feed_url(user.user_id)))
+
+    def start(self):
+        """Starts serving in a background thread."""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="calendar_feed", daemon=True)
+        self.thread.start()
+        logger.info("Calendar feeds served on %s:%s", *self.httpd.server_address[:2])
+
+    def stop(self):
+        """Stops the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
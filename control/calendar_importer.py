@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+
+"""Import of the events of iCalendar files."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import io
+import logging
+import tempfile
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from telegram.error import TelegramError
+
+from control.database_controller import DatabaseController
+from models.day import DayEnum
+from models.event import Event, EventType, DEFAULT_PING_STATES
+from models.recurrence import DAILY, WEEKLY, MONTHLY, Recurrence
+from utils import clock
+from utils.icalendar_utils import WEEKDAYS, parse_date_time, parse_duration, parse_rule, property_value, \
+    read_events, unescape_text
+from utils.localization_manager import receive_translation
+from utils.parsing_utils import replace_reserved_characters
+from utils.time_zones import find_timezone, to_timestamp, to_wall_time
+
+logger = logging.getLogger(__name__)
+
+# Largest file a bot may download from Telegram.
+MAX_FILE_SIZE = 20 * 1024 * 1024
+# Time between two updates of the progress message, Telegram limits how often a message may be edited.
+PROGRESS_INTERVAL = timedelta(seconds=2)
+# Parts of a rule that can be mapped onto a Recurrence, any other part makes the event unsupported.
+SUPPORTED_RULE_PARTS = {"FREQ", "INTERVAL", "BYDAY", "BYMONTHDAY", "BYMONTH", "BYSETPOS", "UNTIL", "COUNT", "WKST"}
+# Occurrences that are counted at most to find the end of a rule with COUNT.
+MAX_COUNT = 10000
+
+ImportResult = namedtuple("ImportResult", ["created", "updated", "skipped"])
+
+
+class CalendarImporter:
+    """Imports the events of iCalendar files that users send to the bot.
+
+    The file is read line by line and only one entry of the calendar is parsed at a time, so large files do not have
+    to fit into memory as text. All imported events are saved with a single write of the events of the user.
+    Entries are identified by their UID, importing a calendar again updates the events that were imported before.
+    """
+
+    @staticmethod
+    def handle_document(update, context):
+        """Imports the calendar file the user sent and shows the progress in a single message."""
+        user = context.request_context.user
+        document = update.message.document
+        if document.file_size and document.file_size > MAX_FILE_SIZE:
+            update.message.reply_text(receive_translation("import_too_large", user.language)
+                                      .format(SIZE=MAX_FILE_SIZE // (1024 * 1024)))
+            return
+
+        progress_message = update.message.reply_text(receive_translation("import_started", user.language))
+
+        def show_progress(count):
+            try:
+                progress_message.edit_text(receive_translation("import_progress", user.language).format(COUNT=count))
+            except TelegramError as error:
+                # The import goes on, only the progress is not shown
+                logger.debug("Progress of the import could not be shown: %s", error)
+
+        with tempfile.TemporaryFile() as calendar_file:
+            document.get_file().download(out=calendar_file)
+            calendar_file.seek(0)
+            lines = io.TextIOWrapper(calendar_file, encoding="utf-8-sig", errors="replace", newline="")
+            try:
+                result = CalendarImporter.import_calendar(user, lines, show_progress)
+            except ValueError as error:
+                logger.info("Calendar of user %s could not be imported: %s", user.user_id, error)
+                progress_message.edit_text(receive_translation("import_invalid", user.language))
+                return
+
+        progress_message.edit_text(receive_translation("import_done", user.language).format(
+            CREATED=result.created, UPDATED=result.updated, SKIPPED=result.skipped))
+
+    @staticmethod
+    def import_calendar(user, lines, progress=None):
+        """Imports the events of a calendar into the events of the user.
+        Args:
+            user (User): User the events are imported for.
+            lines (iterable of 'str'): Lines of the calendar, e.g. the opened file.
+            progress (callable, optional): Called with the amount of entries read so far from time to time.
+        Returns:
+            ImportResult: Amount of created, updated and skipped events.
+        Raises:
+            ValueError: If the lines are no valid calendar.
+        """
+        events = {}
+        skipped = 0
+        count = 0
+        last_progress = clock.now()
+        for entry in read_events(lines):
+            count += 1
+            event = CalendarImporter.event_from_entry(entry, user.timezone)
+            if event is None:
+                skipped += 1
+            else:
+                # The last entry with the same UID wins, like an update sent later
+                if event.calendar_uid in events:
+                    skipped += 1
+                events[event.calendar_uid] = event
+            if progress and clock.now() - last_progress >= PROGRESS_INTERVAL:
+                last_progress = clock.now()
+                progress(count)
+
+        with DatabaseController.user_lock(user.user_id):
+            imported_ids = {entry.get("calendar_uid"): event_id for event_id, entry in user.event_entries.items()
+                            if entry.get("calendar_uid")}
+            for event in events.values():
+                event.uuid = imported_ids.get(event.calendar_uid)
+            user.save_events(list(events.values()))
+
+        updated = sum(1 for calendar_uid in events if calendar_uid in imported_ids)
+        logger.info("Imported %s events for user %s", len(events), user.user_id)
+        return ImportResult(len(events) - updated, updated, skipped)
+
+    @staticmethod
+    def event_from_entry(entry, timezone):
+        """Maps an entry of a calendar onto an event. Single entries are moved into the time zone of the user,
+        recurring entries keep their time zone so their rule stays on the same weekdays.
+        Args:
+            entry (dict): Properties of the entry as returned by read_events.
+            timezone (str): Time zone of the user. None for the time zone of the server.
+        Returns:
+            Event: Imported event or None if the entry is cancelled, over, an exception of a recurring entry or not
+                supported.
+        """
+        if "DTSTART" not in entry or "RECURRENCE-ID" in entry or \
+                property_value(entry, "STATUS", "").upper() == "CANCELLED":
+            return None
+        try:
+            parameters, value = entry["DTSTART"][0]
+            start, start_timezone, _ = parse_date_time(value, parameters)
+        except ValueError:
+            return None
+        start_timezone = CalendarImporter._find_timezone(start_timezone) or timezone
+
+        rule = property_value(entry, "RRULE")
+        if rule is None:
+            start = to_wall_time(datetime.fromtimestamp(to_timestamp(start, start_timezone)), timezone)
+            start_timezone = timezone
+
+        name = CalendarImporter._text(entry, "SUMMARY")
+        content = CalendarImporter._text(entry, "DESCRIPTION")
+        event = Event(name or "-", DayEnum(start.weekday()), content or "-",
+                      EventType.SINGLE if rule is None else EventType.REGULARLY, start.strftime("%H:%M"),
+                      CalendarImporter._ping_times(entry), date=start.date().isoformat(), timezone=start_timezone)
+        event.calendar_uid = property_value(entry, "UID") or "{}@{}".format(name, value)
+
+        if rule is None:
+            return event if event.start_timestamp > clock.now().timestamp() else None
+        return CalendarImporter._recurring_event(event, rule, start, entry)
+
+    @staticmethod
+    def _recurring_event(event, rule, start, entry):
+        """Adds the rule of a recurring entry to its event and moves the event to its next occurrence.
+        Args:
+            event (Event): Event of the first occurrence of the entry.
+            rule (str): Rule of the entry as it is written in the file.
+            start (datetime): Start of the first occurrence in the time zone of the event.
+            entry (dict): Properties of the entry.
+        Returns:
+            Event: Imported event or None if the rule is not supported or has no further occurrence.
+        """
+        current_time = clock.now()
+        try:
+            event.recurrence = CalendarImporter._recurrence(parse_rule(rule), start, event.timezone, entry)
+        except ValueError:
+            return None
+        if event.recurrence is None:
+            return None
+        if not event.recurrence.occurs_on(start.date()) or event.start_timestamp <= current_time.timestamp():
+            if not event.advance(current_time):
+                return None
+        return event
+
+    @staticmethod
+    def _text(entry, name):
+        """Returns a text property of an entry stored like the texts the users type.
+        Args:
+            entry (dict): Properties of the entry.
+            name (str): Name of the property.
+        Returns:
+            str: Text without reserved characters.
+        """
+        return replace_reserved_characters(unescape_text(property_value(entry, name, ""))).strip()
+
+    @staticmethod
+    def _find_timezone(name):
+        """Looks up the time zone of an entry. Some calendars prefix the names with the source of their database,
+        e.g. "/freeassociation.sourceforge.net/Europe/Berlin".
+        Args:
+            name (str): Name of the time zone inside the calendar, None for a floating time.
+        Returns:
+            str: Name of the time zone or None if it is unknown.
+        """
+        if not name:
+            return None
+        return find_timezone(name) or find_timezone("/".join(name.split("/")[-2:]))
+
+    @staticmethod
+    def _ping_times(entry):
+        """Enables the ping times of the alarms of an entry that ping before the start like one of the ping times of
+        the bot.
+        Args:
+            entry (dict): Properties of the entry.
+        Returns:
+            dict: States of the ping times.
+        """
+        ping_times = DEFAULT_PING_STATES.copy()
+        for parameters, value in entry.get("VALARM.TRIGGER", ()):
+            if parameters.get("VALUE", "DURATION").upper() != "DURATION" or parameters.get("RELATED") == "END":
+                continue
+            try:
+                minutes = int(-parse_duration(value).total_seconds()) // 60
+            except ValueError:
+                continue
+            ping_time = "{:02d}:{:02d}".format(minutes // 60, minutes % 60)
+            if ping_time in ping_times:
+                ping_times[ping_time] = True
+        return ping_times
+
+    @staticmethod
+    def _recurrence(rule, start, timezone, entry):
+        """Maps the rule of an entry onto a Recurrence.
+        Args:
+            rule (dict): Parts of the rule as returned by parse_rule.
+            start (datetime): Start of the first occurrence in the time zone of the entry.
+            timezone (str): Time zone of the entry.
+            entry (dict): Properties of the entry, for the excluded dates.
+        Returns:
+            Recurrence: Rule of the event or None if the rule is not supported.
+        Raises:
+            ValueError: If the rule is invalid.
+        """
+        if set(rule) - SUPPORTED_RULE_PARTS:
+            return None
+        arguments = CalendarImporter._rule_arguments(rule, start)
+        if not arguments:
+            return None
+
+        recurrence = Recurrence(start=start.date(), **arguments)
+        recurrence.until = CalendarImporter._end(rule, recurrence, start, timezone)
+        for parameters, value in entry.get("EXDATE", ()):
+            for excluded in value.split(","):
+                recurrence.exceptions.add(CalendarImporter._wall_time(excluded, parameters, timezone).date()
+                                          .isoformat())
+        return recurrence
+
+    @staticmethod
+    def _rule_arguments(rule, start):
+        """Maps the frequency and the BY* parts of a rule onto the arguments of a Recurrence.
+        Args:
+            rule (dict): Parts of the rule.
+            start (datetime): Start of the first occurrence.
+        Returns:
+            dict: Arguments of the Recurrence or None if the rule is not supported.
+        Raises:
+            ValueError: If the rule is invalid.
+        """
+        frequency = rule.get("FREQ")
+        interval = int(rule.get("INTERVAL", 1))
+        by_day = [day for day in rule.get("BYDAY", "").split(",") if day]
+        month_days = [int(day) for day in rule.get("BYMONTHDAY", "").split(",") if day]
+        if rule.get("BYMONTH") and (frequency != "YEARLY" or rule["BYMONTH"] != str(start.month)) or \
+                rule.get("BYSETPOS") and frequency != "MONTHLY":
+            return None
+        # Yearly rules of a single month are monthly rules every twelve months
+        months = interval * (12 if frequency == "YEARLY" else 1)
+
+        if frequency == "DAILY" and not by_day:
+            return {"frequency": DAILY, "interval": interval}
+        if frequency == "WEEKLY" or frequency == "DAILY" and interval == 1:
+            return CalendarImporter._weekly_arguments(by_day, interval)
+        if (frequency == "MONTHLY" or frequency == "YEARLY" and rule.get("BYMONTH")) and by_day and not month_days:
+            return CalendarImporter._month_week_arguments(by_day, rule.get("BYSETPOS"), months)
+        if frequency in ("MONTHLY", "YEARLY") and not by_day and len(month_days) <= 1:
+            return CalendarImporter._month_day_arguments(month_days, start, months)
+        return None
+
+    @staticmethod
+    def _weekly_arguments(by_day, interval):
+        """Maps a weekly rule onto the arguments of a Recurrence.
+        Args:
+            by_day (list of 'str'): Weekdays of the BYDAY part. The weekday of the start if empty.
+            interval (int): Weeks between the occurrences.
+        Returns:
+            dict: Arguments of the Recurrence or None if a weekday has an ordinal.
+        """
+        if any(day not in WEEKDAYS for day in by_day):
+            return None
+        return {"frequency": WEEKLY, "interval": interval,
+                "weekdays": [WEEKDAYS.index(day) for day in by_day] or None}
+
+    @staticmethod
+    def _month_week_arguments(by_day, position, months):
+        """Maps a monthly rule on a weekday of a week of the month onto the arguments of a Recurrence, e.g.
+        "BYDAY=-1FR" or "BYDAY=FR;BYSETPOS=-1" for the last friday.
+        Args:
+            by_day (list of 'str'): Weekdays of the BYDAY part.
+            position (str): Value of the BYSETPOS part, None if the rule does not have one.
+            months (int): Months between the occurrences.
+        Returns:
+            dict: Arguments of the Recurrence or None if the rule is not supported.
+        Raises:
+            ValueError: If the ordinal is invalid.
+        """
+        if len(by_day) > 1 or by_day[0][-2:] not in WEEKDAYS:
+            return None
+        month_week = int(by_day[0][:-2] or position or 0)
+        if month_week not in (-1, 1, 2, 3, 4, 5):
+            return None
+        return {"frequency": MONTHLY, "interval": months, "weekdays": [WEEKDAYS.index(by_day[0][-2:])],
+                "month_week": month_week}
+
+    @staticmethod
+    def _month_day_arguments(month_days, start, months):
+        """Maps a monthly rule on a day of the month onto the arguments of a Recurrence.
+        Args:
+            month_days (list of 'int'): Days of the BYMONTHDAY part. The day of the start if empty.
+            start (datetime): Start of the first occurrence.
+            months (int): Months between the occurrences.
+        Returns:
+            dict: Arguments of the Recurrence or None if the day counts from the end of the month.
+        """
+        if month_days and month_days[0] < 1:
+            return None
+        return {"frequency": MONTHLY, "interval": months, "month_day": month_days[0] if month_days else start.day}
+
+    @staticmethod
+    def _end(rule, recurrence, start, timezone):
+        """Returns the last date of a rule, given by the UNTIL or the COUNT part.
+        Args:
+            rule (dict): Parts of the rule.
+            recurrence (Recurrence): Rule of the event without end.
+            start (datetime): Start of the first occurrence in the time zone of the entry.
+            timezone (str): Time zone of the entry.
+        Returns:
+            datetime.date: Last date an occurrence starts on. None if the rule does not end.
+        Raises:
+            ValueError: If the end is invalid.
+        """
+        if "UNTIL" in rule:
+            return CalendarImporter._last_date(rule["UNTIL"], start, timezone)
+        if "COUNT" not in rule:
+            return None
+        occurrence = None
+        day = start.date()
+        for _ in range(min(int(rule["COUNT"]), MAX_COUNT)):
+            occurrence = recurrence.next_occurrence(day)
+            if occurrence is None:
+                break
+            day = occurrence + timedelta(days=1)
+        return occurrence or start.date()
+
+    @staticmethod
+    def _last_date(until, start, timezone):
+        """Returns the last date of a rule that ends at the given time.
+        Args:
+            until (str): End of the rule as it is written in the file.
+            start (datetime): Start of the first occurrence in the time zone of the entry.
+            timezone (str): Time zone of the entry.
+        Returns:
+            datetime.date: Last date an occurrence starts on.
+        """
+        until_time = CalendarImporter._wall_time(until, {}, timezone)
+        if len(until.strip()) == 8:
+            return until_time.date()
+        last_date = until_time.date()
+        if datetime.combine(last_date, start.time()) > until_time:
+            last_date -= timedelta(days=1)
+        return last_date
+
+    @staticmethod
+    def _wall_time(value, parameters, timezone):
+        """Parses a date or date with time of an entry and converts it into the time zone of the entry.
+        Args:
+            value (str): Value as it is written in the file.
+            parameters (dict): Parameters of the property.
+            timezone (str): Time zone of the entry.
+        Returns:
+            datetime: Time without time zone.
+        """
+        wall_time, value_timezone, _ = parse_date_time(value, parameters)
+        value_timezone = CalendarImporter._find_timezone(value_timezone)
+        if value_timezone is None or value_timezone == timezone:
+            return wall_time
+        return to_wall_time(datetime.fromtimestamp(to_timestamp(wall_time, value_timezone)), timezone)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+"""Router that dispatches callback queries to their handlers."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import logging
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Telegram limits callback data to 64 bytes, everything longer was not created by the bot.
+MAX_CALLBACK_DATA_LENGTH = 64
+
+# Keyboards of the event creation send the bare value without any prefix (e.g. "1", "d3" or "h12").
+CREATION_SHORT_PREFIXES = ("d", "h", "m")
+
+# Actions of the event namespace that refer to a single event by its ID.
+EVENT_ID_ACTIONS = ("change", "delete", "silence")
+
+
+class CallbackData(namedtuple("CallbackData", ["namespace", "action", "event_id", "argument"])):
+    """Structured representation of the callback data of an inline keyboard button."""
+
+    __slots__ = ()
+
+    @staticmethod
+    def parse(data):
+        """Parses the callback data.
+        Args:
+            data (str): Callback data of the query.
+        Returns:
+            CallbackData: Parsed callback data or None if the data is malformed.
+        """
+        if not data or len(data) > MAX_CALLBACK_DATA_LENGTH:
+            return None
+
+        if "_" not in data:
+            if data.isdigit() or (data[0] in CREATION_SHORT_PREFIXES and data[1:].isdigit()):
+                return CallbackData("event", "creation", None, data)
+            return None
+
+        parts = data.split("_", 3)
+        namespace, action = parts[0], parts[1]
+        if not action:
+            return None
+
+        if namespace == "event" and action in EVENT_ID_ACTIONS:
+            if len(parts) < 3 or not parts[2].isalnum():
+                return None
+            return CallbackData(namespace, action, parts[2], parts[3] if len(parts) > 3 else None)
+
+        return CallbackData(namespace, action, None, "_".join(parts[2:]) or None)
+
+    @property
+    def arguments(self):
+        """Returns the argument split into its single parts."""
+        if not self.argument:
+            return []
+        return self.argument.split("_")
+
+
+class RouteNode:
+    """Node of the prefix trie of the router."""
+
+    __slots__ = ("children", "route")
+
+    def __init__(self):
+        """Constructor."""
+        self.children = {}
+        self.route = None
+
+
+class Route:
+    """Handler of a route together with its latency counters."""
+
+    __slots__ = ("name", "handler", "guard", "calls", "rejected", "total_seconds", "max_seconds")
+
+    def __init__(self, name, handler, guard=None):
+        """Constructor.
+        Args:
+            name (str): Prefix of the route.
+            handler (callable): Receives the update, the context and the parsed callback data.
+            guard (callable, optional): Receives the update, the context and the parsed callback data and returns
+                False if the callback is stale and should be dropped without calling the handler.
+        """
+        self.name = name
+        self.handler = handler
+        self.guard = guard
+        self.calls = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class CallbackRouter:
+    """Parses the data of every callback query exactly once and dispatches it via a prefix trie over the namespace
+    and the action of the data.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self.root = RouteNode()
+        self.routes = []
+        self.malformed = 0
+        self.unrouted = 0
+        # Queries are dispatched by several update workers at once
+        self.lock = threading.Lock()
+
+    def add_route(self, prefix, handler, guard=None):
+        """Registers a handler for all callback data starting with the given prefix.
+        Args:
+            prefix (str): Namespace and optionally action separated by an underscore, e.g. "event_change".
+            handler (callable): Receives the update, the context and the parsed callback data.
+            guard (callable, optional): Returns False for stale callbacks that should be dropped or the text the query
+                of a stale callback is answered with.
+        """
+        node = self.root
+        for segment in prefix.split("_"):
+            node = node.children.setdefault(segment, RouteNode())
+        node.route = Route(prefix, handler, guard)
+        self.routes.append(node.route)
+
+    def resolve(self, callback):
+        """Returns the route with the longest prefix matching the parsed callback data.
+        Args:
+            callback (CallbackData): Parsed callback data.
+        Returns:
+            Route: Matching route or None.
+        """
+        route = None
+        node = self.root
+        for segment in (callback.namespace, callback.action):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.route:
+                route = node.route
+        return route
+
+    def dispatch_query(self, update, context):
+        """Handles a callback query. Every query is answered here once so the handlers do not have to."""
+        query = update.callback_query
+        callback = CallbackData.parse(query.data)
+        route = self.resolve(callback) if callback else None
+
+        if route is None:
+            with self.lock:
+                if callback:
+                    self.unrouted += 1
+                else:
+                    self.malformed += 1
+            logger.debug("Dropped callback data %s", query.data)
+            query.answer()
+            return
+
+        rejection = route.guard(update, context, callback) if route.guard else True
+        if not rejection or isinstance(rejection, str):
+            with self.lock:
+                route.rejected += 1
+            query.answer(text=rejection or None)
+            return
+
+        query.answer()
+        start = time.perf_counter()
+        try:
+            route.handler(update, context, callback)
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                route.calls += 1
+                route.total_seconds += duration
+                route.max_seconds = max(route.max_seconds, duration)
+
+    def stats(self):
+        """Returns the counters of all routes.
+        Returns:
+            dict: Contains the call and latency counters of every route and the amount of dropped callbacks.
+        """
+        with self.lock:
+            return {
+                "routes": {route.name: {"calls": route.calls, "rejected": route.rejected,
+                                        "total_seconds": route.total_seconds, "max_seconds": route.max_seconds}
+                           for route in self.routes},
+                "malformed": self.malformed,
+                "unrouted": self.unrouted
+            }
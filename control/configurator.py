@@ -6,16 +6,17 @@
 # Copyright: Daniel Bebber, 2020
 # Author: Daniel Bebber <daniel.bebber@gmx.de>
 # ----------------------------------------------
-import logging
-
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
-from control.bot_control import BotControl
-from control.database_controller import DatabaseController
 from utils.localization_manager import receive_translation, receive_languages
+from utils.time_zones import find_timezone
 
 CONFIG_LANGUAGE = "config_start_language"
 CONFIG_DAILY_PING = "config_start_daily_ping"
+CONFIG_DIGEST_TIME = "config_start_digest_time"
+CONFIG_TIMEZONE = "config_start_timezone"
+
+DIGEST_TIME_MINUTES = range(0, 60, 5)
 
 
 class Configurator:
@@ -24,65 +25,62 @@ class Configurator:
     @staticmethod
     def start_configuration_dialog(update, context):
         """Starts the configuration dialog."""
-        user_id = update.message.from_user.id
-        user_language = DatabaseController.load_selected_language(user_id)
-        Configurator.config_options_keyboard(user_language)
+        user_language = context.request_context.sender.language
 
         update.message.reply_text(receive_translation("config_dialog_started", user_language),
                                   reply_markup=Configurator.config_options_keyboard(user_language))
 
     @staticmethod
-    def handle_configuration_dialog(update, context):
+    def handle_configuration_dialog(update, context, callback):
         """Handles the configuration dialog."""
         query = update.callback_query
-        query.answer()
-
-        user_id = query.from_user['id']
-        user_language = DatabaseController.load_selected_language(user_id)
-
-        bot = BotControl.get_bot()
+        user_language = context.request_context.sender.language
 
         if query.data == CONFIG_LANGUAGE:
             query.edit_message_text(text=receive_translation("config_language_which", user_language),
                                     reply_markup=Configurator.config_language_keyboard())
         elif query.data == CONFIG_DAILY_PING:
-            query.edit_message_text(text=receive_translation("config_daily_ping_decide", user_language),
+            query.edit_message_text(text=receive_translation("config_daily_ping_decide", user_language)
+                                    .format(TIME=context.request_context.sender.digest_time),
                                     reply_markup=Configurator.config_daily_ping_keyboard(user_language))
+        elif query.data == CONFIG_DIGEST_TIME:
+            query.edit_message_text(text=receive_translation("config_digest_time_hours", user_language)
+                                    .format(TIME=context.request_context.sender.digest_time),
+                                    reply_markup=Configurator.config_digest_hours_keyboard())
+        elif query.data == CONFIG_TIMEZONE:
+            # The time zone belongs to the chat like its events
+            user = context.request_context.user
+            query.edit_message_text(text=receive_translation("config_timezone_which", user_language)
+                                    .format(TIMEZONE=Configurator.timezone_description(user.timezone, user_language)))
 
     @staticmethod
-    def handle_configuration_change(update, context):
+    def handle_configuration_change(update, context, callback):
         """Handles changes inside the configuration."""
-        query = update.callback_query
-        query.answer()
-
-        if "language" in query.data:
-            Configurator.handle_configuration_language_change(update, context)
-        elif "daily_ping" in query.data:
-            Configurator.handle_configuration_daily_ping_change(update, context)
+        if callback.argument.startswith("language"):
+            Configurator.handle_configuration_language_change(update, context, callback)
+        elif callback.argument.startswith("daily_ping"):
+            Configurator.handle_configuration_daily_ping_change(update, context, callback)
+        elif callback.argument.startswith("digest_time"):
+            Configurator.handle_configuration_digest_time_change(update, context, callback)
 
     @staticmethod
-    def handle_configuration_language_change(update, context):
+    def handle_configuration_language_change(update, context, callback):
         """Handles the change of language."""
         query = update.callback_query
-        query.answer()
-
-        user_id = query.from_user['id']
 
-        selected_language = query.data.split("_")[-1:][0]
-        DatabaseController.save_user_language(user_id, selected_language)
+        selected_language = callback.arguments[-1]
+        context.request_context.sender.save_config_value("language", selected_language)
 
         query.edit_message_text(receive_translation("config_language_changed", selected_language))
 
     @staticmethod
-    def handle_configuration_daily_ping_change(update, context):
+    def handle_configuration_daily_ping_change(update, context, callback):
         """Handles the change of daily ping."""
         query = update.callback_query
-        query.answer()
+        user = context.request_context.sender
+        user_language = user.language
 
-        user_id = query.from_user['id']
-        user_language = DatabaseController.load_selected_language(user_id)
-
-        selected_daily_ping = query.data.split("_")[-1:][0]
+        selected_daily_ping = callback.arguments[-1]
 
         if selected_daily_ping == "yes":
             config_value = True
@@ -90,8 +88,63 @@ class Configurator:
         else:
             config_value = False
             answer = receive_translation("config_daily_ping_disable", user_language)
-        DatabaseController.save_daily_ping(user_id, config_value)
-        query.edit_message_text(answer)
+        user.save_config_value("daily_ping", config_value)
+        query.edit_message_text(answer.format(TIME=user.digest_time))
+
+    @staticmethod
+    def handle_configuration_digest_time_change(update, context, callback):
+        """Handles the change of the time of the daily ping. The hours are selected first, then the minutes."""
+        query = update.callback_query
+        user = context.request_context.sender
+
+        selection = callback.arguments[2:]
+        if not selection or len(selection) > 2 or not all(value.isdigit() for value in selection):
+            return
+        hours = int(selection[0])
+        if hours > 23:
+            return
+
+        if len(selection) == 1:
+            query.edit_message_text(text=receive_translation("config_digest_time_minutes", user.language),
+                                    reply_markup=Configurator.config_digest_minutes_keyboard(hours))
+            return
+
+        minutes = int(selection[1])
+        if minutes > 59:
+            return
+        digest_time = "{:02d}:{:02d}".format(hours, minutes)
+        user.save_config_value("digest_time", digest_time)
+        query.edit_message_text(receive_translation("config_digest_time_changed", user.language)
+                                .format(TIME=digest_time))
+
+    @staticmethod
+    def handle_timezone_command(update, context):
+        """Handles /timezone <name>, the time zone is entered as text because there are too many for a keyboard."""
+        user = context.request_context.user
+        if not context.args:
+            update.message.reply_text(receive_translation("config_timezone_which", user.language).format(
+                TIMEZONE=Configurator.timezone_description(user.timezone, user.language)))
+            return
+
+        timezone = find_timezone(context.args[0])
+        if timezone is None:
+            update.message.reply_text(receive_translation("config_timezone_invalid", user.language)
+                                      .format(TIMEZONE=context.args[0]))
+            return
+        user.save_timezone(timezone)
+        update.message.reply_text(receive_translation("config_timezone_changed", user.language)
+                                  .format(TIMEZONE=timezone))
+
+    @staticmethod
+    def timezone_description(timezone, user_language):
+        """Returns the name of the time zone to show to the user.
+        Args:
+            timezone (str): Name of the time zone, None for the time zone of the server.
+            user_language (str): Language that is used to communicate with the user.
+        Returns:
+            str: Description of the time zone.
+        """
+        return timezone or receive_translation("config_timezone_server", user_language)
 
     @staticmethod
     def config_options_keyboard(user_language):
@@ -107,6 +160,12 @@ class Configurator:
                                      callback_data=CONFIG_LANGUAGE),
                 InlineKeyboardButton(receive_translation(CONFIG_DAILY_PING, user_language),
                                      callback_data=CONFIG_DAILY_PING)
+            ],
+            [
+                InlineKeyboardButton(receive_translation(CONFIG_DIGEST_TIME, user_language),
+                                     callback_data=CONFIG_DIGEST_TIME),
+                InlineKeyboardButton(receive_translation(CONFIG_TIMEZONE, user_language),
+                                     callback_data=CONFIG_TIMEZONE)
             ]
         ]
         return InlineKeyboardMarkup(keyboard)
@@ -144,3 +203,29 @@ class Configurator:
             ]
         ]
         return InlineKeyboardMarkup(keyboard)
+
+    @staticmethod
+    def config_digest_hours_keyboard():
+        """Generates the keyboard to select the hours of the daily ping time.
+        Returns:
+            InlineKeyboardMarkup: Generated keyboard.
+        """
+        keyboard = []
+        for first_hours in range(0, 24, 6):
+            keyboard.append([InlineKeyboardButton("{:02d}".format(hours),
+                                                  callback_data="config_select_digest_time_{}".format(hours))
+                             for hours in range(first_hours, first_hours + 6)])
+        return InlineKeyboardMarkup(keyboard)
+
+    @staticmethod
+    def config_digest_minutes_keyboard(hours):
+        """Generates the keyboard to select the minutes of the daily ping time.
+        Args:
+            hours (int): Already selected hours.
+        Returns:
+            InlineKeyboardMarkup: Generated keyboard.
+        """
+        buttons = [InlineKeyboardButton("{:02d}:{:02d}".format(hours, minutes),
+                                        callback_data="config_select_digest_time_{}_{}".format(hours, minutes))
+                   for minutes in DIGEST_TIME_MINUTES]
+        return InlineKeyboardMarkup([buttons[index:index + 4] for index in range(0, len(buttons), 4)])
@@ -6,33 +6,82 @@
 # Copyright: Daniel Bebber, 2020
 # Author: Daniel Bebber <daniel.bebber@gmx.de>
 # ----------------------------------------------
+import bisect
 import glob
+import gzip
 import json
 import logging
 import os
+import threading
 import uuid
+from datetime import datetime
 
 from models.day import DayEnum
 from models.event import Event, EventType
+from models.recurrence import Recurrence
+from utils import clock
 from utils.localization_manager import DEFAULT_LANGUAGE
+from utils.metrics import registry
 from utils.path_utils import USERDATA_PATH, CONFIG_PATH
 
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    level=logging.INFO)
-
 logger = logging.getLogger(__name__)
 
+# Time of the daily ping of users that did not choose one.
+DEFAULT_DIGEST_TIME = "00:00"
+
+DATABASE_SECONDS = registry.histogram("database_operation_seconds", "Duration of the accesses to the user files.",
+                                      ("operation", "file"))
+
 
 class DatabaseController:
+    """Provides access to the configuration and the files of the users.
+
+    The update workers and the event checker access the files concurrently. Every read-modify-write of the files of
+    a user is done while holding the lock returned by ``user_lock``. The lock is reentrant, so callers that have to
+    keep data of a user consistent across several calls take it themselves around all of them. Code holding the lock
+    of a user never waits for the lock of another user, the indexes are built without taking the locks of the users.
+    """
     configuration = {}
     config_file = CONFIG_PATH
     userdata_path = USERDATA_PATH
 
+    _user_locks = {}
+    _user_locks_lock = threading.Lock()
+
+    # Index of the configs of all users: the time zone and the minute of the day of the daily ping of every user,
+    # the users grouped by them, the amount of users per time zone and the users that are inactive or archived
+    _digest_minutes = {}
+    _digest_buckets = {}
+    _digest_timezones = {}
+    _inactive_users = set()
+    _archived_users = set()
+    _index_complete = False
+    _index_lock = threading.Lock()
+
+    # Index of the events with a date: the next pings of the events of all users sorted as (timestamp, user, event)
+    # and the next pings of every user sorted as (timestamp, event). Guarded by the index lock as well.
+    _dated_events = []
+    _user_dated_events = {}
+    _event_index_complete = False
+    # Version of the events of every user, increased on every write so caches of the events notice changes
+    _event_versions = {}
+
     def __init__(self, config_file=CONFIG_PATH, userdata_path=USERDATA_PATH):
         """Constructor."""
         DatabaseController.config_file = config_file
         DatabaseController.userdata_path = userdata_path
         DatabaseController.configuration = DatabaseController.load_configuration()
+        with DatabaseController._index_lock:
+            DatabaseController._digest_minutes = {}
+            DatabaseController._digest_buckets = {}
+            DatabaseController._digest_timezones = {}
+            DatabaseController._inactive_users = set()
+            DatabaseController._archived_users = set()
+            DatabaseController._index_complete = False
+            DatabaseController._dated_events = []
+            DatabaseController._user_dated_events = {}
+            DatabaseController._event_index_complete = False
+            DatabaseController._event_versions = {}
 
     @staticmethod
     def load_configuration():
@@ -41,13 +90,28 @@ class DatabaseController:
             dict: Loaded configuration.
         """
         if DatabaseController.configuration:
-            logger.info(DatabaseController.configuration)
+            logger.debug("Configuration: %s", DatabaseController.configuration)
             return DatabaseController.configuration
         with open(DatabaseController.config_file) as configuration_file:
             json_content = json.load(configuration_file)
-            logger.info(json_content)
+            logger.debug("Loaded configuration: %s", json_content)
             return json_content
 
+    @staticmethod
+    def user_lock(user_id):
+        """Returns the lock that guards the files of the given user.
+        Args:
+            user_id (int): ID of user.
+        Returns:
+            threading.RLock: Lock of the user.
+        """
+        user_id_string = str(user_id)
+        with DatabaseController._user_locks_lock:
+            lock = DatabaseController._user_locks.get(user_id_string)
+            if lock is None:
+                lock = DatabaseController._user_locks[user_id_string] = threading.RLock()
+        return lock
+
     @staticmethod
     def load_user_config(user_id):
         """Loads the user config entry of the given user.
@@ -59,13 +123,16 @@ class DatabaseController:
         user_id_string = str(user_id)
         user_config_path = os.path.join(DatabaseController.userdata_path, "{}_config.json".format(user_id_string))
 
-        if not os.path.isfile(user_config_path):
-            with open(user_config_path, "w") as user_config_file:
-                user_config_dict = {"user_id": user_id, "language": DEFAULT_LANGUAGE, "daily_ping": True}
-                json.dump(user_config_dict, user_config_file)
+        with DatabaseController.user_lock(user_id):
+            if not os.path.isfile(user_config_path):
+                with DATABASE_SECONDS.labels("write", "config").time(), open(user_config_path, "w") as user_config_file:
+                    user_config_dict = {"user_id": user_id, "language": DEFAULT_LANGUAGE, "daily_ping": True,
+                                        "digest_time": DEFAULT_DIGEST_TIME}
+                    json.dump(user_config_dict, user_config_file)
+                DatabaseController._index_user_config(user_id, user_config_dict)
 
-        with open(user_config_path, "r") as user_config_file:
-            user_config = json.load(user_config_file)
+            with DATABASE_SECONDS.labels("read", "config").time(), open(user_config_path, "r") as user_config_file:
+                user_config = json.load(user_config_file)
 
         return user_config
 
@@ -77,16 +144,34 @@ class DatabaseController:
         Returns:
             list of 'Event': Events of the user as list.
         """
-        user_events_dict = DatabaseController._load_user_event_entry(user_id)
+        return DatabaseController.parse_user_events(DatabaseController._load_user_event_entry(user_id))
 
+    @staticmethod
+    def parse_user_events(user_events_dict):
+        """Creates the event objects of the given event entries.
+        Args:
+            user_events_dict (dict): Events of a user as they are stored.
+        Returns:
+            list of 'Event': Events of the user as list.
+        """
         user_events = []
         for event_id in user_events_dict:
             event = user_events_dict[event_id]
             event_object = Event(event['title'], DayEnum(event['day']), event['content'],
                                  EventType(event['event_type']), event['event_time'], event['ping_times'],
-                                 start_ping_done=event['start_ping_done'])
+                                 start_ping_done=event['start_ping_done'], date=event.get('date'))
+            if "recurrence" in event.keys():
+                event_object.recurrence = Recurrence.from_dict(event['recurrence'])
+            if "timezone" in event.keys():
+                event_object.timezone = event['timezone']
+            if "start_timestamp" in event.keys():
+                event_object.start_timestamp = event['start_timestamp']
             if "ping_times_to_refresh" in event.keys():
                 event_object.ping_times_to_refresh = event['ping_times_to_refresh']
+            if "calendar_uid" in event.keys():
+                event_object.calendar_uid = event['calendar_uid']
+            if "modified" in event.keys():
+                event_object.modified = event['modified']
             event_object.uuid = event_id
             user_events.append(event_object)
 
@@ -103,13 +188,14 @@ class DatabaseController:
         user_id_string = str(user_id)
         user_events_path = os.path.join(DatabaseController.userdata_path, "{}_events.json".format(user_id_string))
 
-        if not os.path.isfile(user_events_path):
-            with open(user_events_path, "w") as user_events_file:
-                user_events_dict = {}
-                json.dump(user_events_dict, user_events_file)
+        with DatabaseController.user_lock(user_id):
+            if not os.path.isfile(user_events_path):
+                with DATABASE_SECONDS.labels("write", "events").time(), open(user_events_path, "w") as user_events_file:
+                    user_events_dict = {}
+                    json.dump(user_events_dict, user_events_file)
 
-        with open(user_events_path, "r") as user_events_file:
-            user_events_dict = json.load(user_events_file)
+            with DATABASE_SECONDS.labels("read", "events").time(), open(user_events_path, "r") as user_events_file:
+                user_events_dict = json.load(user_events_file)
 
         return user_events_dict
 
@@ -124,32 +210,85 @@ class DatabaseController:
         user_id_string = "{}".format(user_id)
         userdata_path = os.path.join(DatabaseController.userdata_path, "{}_config.json".format(user_id_string))
 
-        with open(userdata_path, "r") as userdata_file:
-            userdata = json.load(userdata_file)
+        with DatabaseController.user_lock(user_id):
+            with DATABASE_SECONDS.labels("read", "config").time(), open(userdata_path, "r") as userdata_file:
+                userdata = json.load(userdata_file)
 
         return userdata["language"]
 
     @staticmethod
-    def save_event_data_user(user_id, event):
+    def save_event_data_user(user_id, event, user_event_data=None):
         """Saves the event data of a given day of a given user into the database
         Args:
             user_id (int): ID of user.
             event (Event): Event that should be saved.
+            user_event_data (dict, optional): Already loaded events of the user. Saves reading them again.
         """
-        user_event_data = DatabaseController._load_user_event_entry(user_id)
-        if not event.uuid:
-            user_event_data_id = uuid.uuid4().hex
-            while user_event_data_id in user_event_data:
+        with DatabaseController.user_lock(user_id):
+            if user_event_data is None:
+                user_event_data = DatabaseController._load_user_event_entry(user_id)
+            if not event.uuid:
                 user_event_data_id = uuid.uuid4().hex
-            event.uuid = user_event_data_id
+                while user_event_data_id in user_event_data:
+                    user_event_data_id = uuid.uuid4().hex
+                event.uuid = user_event_data_id
 
-        user_event_data[event.uuid] = {"title": event.name, "day": event.day.value, "content": event.content,
-                                       "event_type": event.event_type.value, "event_time": event.event_time,
-                                       "ping_times": event.ping_times, "in_daily_ping": event.in_daily_ping,
-                                       "start_ping_done": event.start_ping_done,
-                                       "ping_times_to_refresh": event.ping_times_to_refresh}
+            user_event_data[event.uuid] = DatabaseController._event_entry(event, user_event_data.get(event.uuid))
 
-        DatabaseController._save_event_data_user(user_id, user_event_data)
+            DatabaseController._save_event_data_user(user_id, user_event_data)
+
+    @staticmethod
+    def save_events_of_user(user_id, events, deleted_event_ids=()):
+        """Saves and deletes several events of a user with a single write of the events of the user.
+        Args:
+            user_id (int): ID of user.
+            events (list of 'Event'): Events that should be saved.
+            deleted_event_ids (list of 'str', optional): IDs of the events that should be deleted.
+        """
+        with DatabaseController.user_lock(user_id):
+            user_event_data = DatabaseController._load_user_event_entry(user_id)
+            for event in events:
+                if not event.uuid:
+                    event.uuid = uuid.uuid4().hex
+                    while event.uuid in user_event_data:
+                        event.uuid = uuid.uuid4().hex
+                user_event_data[event.uuid] = DatabaseController._event_entry(event, user_event_data.get(event.uuid))
+            for event_id in deleted_event_ids:
+                user_event_data.pop(event_id, None)
+
+            DatabaseController._save_event_data_user(user_id, user_event_data)
+
+    @staticmethod
+    def _event_entry(event, previous_entry=None):
+        """Returns the stored representation of the event. The time of the last modification is kept if the event
+        is saved unchanged and set to the current time otherwise.
+        Args:
+            event (Event): Event that should be saved.
+            previous_entry (dict, optional): Stored data of the event before, None for a new event.
+        Returns:
+            dict: Data of the event.
+        """
+        entry = {"title": event.name, "day": event.day.value, "content": event.content,
+                 "event_type": event.event_type.value, "event_time": event.event_time,
+                 "ping_times": event.ping_times, "in_daily_ping": event.in_daily_ping,
+                 "start_ping_done": event.start_ping_done, "ping_times_to_refresh": event.ping_times_to_refresh}
+        if event.date:
+            entry["date"] = event.date
+            entry["start_timestamp"] = event.start_timestamp
+            entry["next_fire"] = event.next_fire
+        if event.timezone:
+            entry["timezone"] = event.timezone
+        if event.recurrence:
+            entry["recurrence"] = event.recurrence.to_dict()
+        if event.calendar_uid:
+            entry["calendar_uid"] = event.calendar_uid
+
+        previous_entry = dict(previous_entry or {})
+        modified = previous_entry.pop("modified", None)
+        if modified is None or previous_entry != json.loads(json.dumps(entry)):
+            modified = int(clock.now().timestamp())
+        entry["modified"] = event.modified = modified
+        return entry
 
     @staticmethod
     def _save_event_data_user(user_id, user_event_data):
@@ -161,8 +300,11 @@ class DatabaseController:
         user_id_string = str(user_id)
         user_event_data_path = os.path.join(DatabaseController.userdata_path, "{}_events.json".format(user_id_string))
 
-        with open(user_event_data_path, "w") as user_event_data_file:
-            json.dump(user_event_data, user_event_data_file)
+        with DatabaseController.user_lock(user_id):
+            with DATABASE_SECONDS.labels("write", "events").time(), \
+                    open(user_event_data_path, "w") as user_event_data_file:
+                json.dump(user_event_data, user_event_data_file)
+            DatabaseController._index_user_events(user_id, user_event_data)
 
     @staticmethod
     def read_event_of_user(user_id, event_id):
@@ -179,16 +321,20 @@ class DatabaseController:
         return None
 
     @staticmethod
-    def delete_event_of_user(user_id, event_id):
+    def delete_event_of_user(user_id, event_id, user_event_data=None):
         """Removes the event with the given name from the given user on the given day.
         Args:
             user_id (int): ID of user.
             event_id (str): ID of the event.
+            user_event_data (dict, optional): Already loaded events of the user. Saves reading them again.
         """
-        event_data = DatabaseController._load_user_event_entry(user_id)
-        if event_id in event_data:
-            event_data.pop(event_id)
-            DatabaseController._save_event_data_user(user_id, event_data)
+        with DatabaseController.user_lock(user_id):
+            event_data = user_event_data
+            if event_data is None:
+                event_data = DatabaseController._load_user_event_entry(user_id)
+            if event_id in event_data:
+                event_data.pop(event_id)
+                DatabaseController._save_event_data_user(user_id, event_data)
 
     @staticmethod
     def _read_user_data(user_id):
@@ -199,8 +345,9 @@ class DatabaseController:
             dict: Contains all data of the user.
         """
         userdata_file = os.path.join(DatabaseController.userdata_path, "{}_config.json".format(user_id))
-        with open(userdata_file, "r") as userdata_content:
-            content = json.load(userdata_content)
+        with DatabaseController.user_lock(user_id):
+            with DATABASE_SECONDS.labels("read", "config").time(), open(userdata_file, "r") as userdata_content:
+                content = json.load(userdata_content)
         return content
 
     @staticmethod
@@ -211,8 +358,10 @@ class DatabaseController:
             content (dict): Contains the user data.
         """
         userdata_file = os.path.join(DatabaseController.userdata_path, "{}_config.json".format(user_id))
-        with open(userdata_file, "w") as userdata_content:
-            json.dump(content, userdata_content)
+        with DatabaseController.user_lock(user_id):
+            with DATABASE_SECONDS.labels("write", "config").time(), open(userdata_file, "w") as userdata_content:
+                json.dump(content, userdata_content)
+            DatabaseController._index_user_config(user_id, content)
 
     @staticmethod
     def load_all_user_ids():
@@ -220,13 +369,371 @@ class DatabaseController:
         Returns:
             list of 'str': Contains all user ids.
         """
-        user_data_config_files = glob.glob("{}/*_config.json".format(DatabaseController.userdata_path))
+        with DATABASE_SECONDS.labels("list", "config").time():
+            user_data_config_files = glob.glob("{}/*_config.json".format(DatabaseController.userdata_path))
 
         users = [os.path.basename(user_data_config_file).split('_')[0] for user_data_config_file in
                  user_data_config_files]
 
         return users
 
+    @staticmethod
+    def load_active_user_ids():
+        """Loads all users that are stored inside the database and were not marked as inactive.
+        Returns:
+            list of 'str': Contains the user ids.
+        """
+        DatabaseController._complete_index()
+        with DatabaseController._index_lock:
+            inactive_users = set(DatabaseController._inactive_users)
+        return [user_id for user_id in DatabaseController.load_all_user_ids() if user_id not in inactive_users]
+
+    @staticmethod
+    def digest_minute(user_config):
+        """Returns the minute of the day the daily ping of the user is sent at.
+        Args:
+            user_config (dict): Config of the user.
+        Returns:
+            int: Minutes since midnight or None if the user disabled the daily ping or is inactive.
+        """
+        if not user_config.get("daily_ping", True) or "inactive" in user_config:
+            return None
+        hours, minutes = user_config.get("digest_time", DEFAULT_DIGEST_TIME).split(":")
+        return int(hours) * 60 + int(minutes)
+
+    @staticmethod
+    def _index_user_config(user_id, user_config, overwrite=True):
+        """Updates the index with the config of the user.
+        Args:
+            user_id (int): ID of the user.
+            user_config (dict): Config of the user. None if the user was archived.
+            overwrite (bool, optional): False if a newer entry of the user should be kept.
+        """
+        user_id_string = str(user_id)
+        minute = DatabaseController.digest_minute(user_config) if user_config is not None else None
+        bucket = (user_config.get("timezone"), minute) if minute is not None else None
+        # Never waits for a user lock while holding the index lock, writers hold their user lock when calling this
+        with DatabaseController._index_lock:
+            timezones = DatabaseController._digest_timezones
+            if user_id_string in DatabaseController._digest_minutes:
+                if not overwrite:
+                    return
+                previous = DatabaseController._digest_minutes[user_id_string]
+                if previous is not None:
+                    DatabaseController._digest_buckets[previous].discard(user_id_string)
+                    timezones[previous[0]] -= 1
+                    if not timezones[previous[0]]:
+                        del timezones[previous[0]]
+            DatabaseController._digest_minutes[user_id_string] = bucket
+            if bucket is not None:
+                DatabaseController._digest_buckets.setdefault(bucket, set()).add(user_id_string)
+                timezones[bucket[0]] = timezones.get(bucket[0], 0) + 1
+
+            if user_config is None:
+                DatabaseController._inactive_users.discard(user_id_string)
+                DatabaseController._archived_users.add(user_id_string)
+                return
+            DatabaseController._archived_users.discard(user_id_string)
+            if "inactive" in user_config:
+                DatabaseController._inactive_users.add(user_id_string)
+            else:
+                DatabaseController._inactive_users.discard(user_id_string)
+
+    @staticmethod
+    def _complete_index():
+        """Builds the index from the configs of all users on first use. Afterwards it is kept up to date by every
+        write of a config.
+        """
+        if DatabaseController._index_complete:
+            return
+        for user_id in DatabaseController.load_all_user_ids():
+            user_config = DatabaseController._read_for_index(user_id, "config")
+            if user_config is not None:
+                DatabaseController._index_user_config(user_id, user_config, overwrite=False)
+        for archive_file in glob.glob("{}/*.json.gz".format(DatabaseController._archive_path())):
+            DatabaseController._index_user_config(os.path.basename(archive_file).split('.')[0], None,
+                                                  overwrite=False)
+        DatabaseController._index_complete = True
+
+    @staticmethod
+    def _index_user_events(user_id, user_event_data, overwrite=True):
+        """Updates the index of the events with a date with the events of the user and increases the version of the
+        events of the user. The events are indexed by the time of their next ping.
+        Args:
+            user_id (int): ID of the user.
+            user_event_data (dict): Events of the user as they are stored.
+            overwrite (bool, optional): False if a newer entry of the user should be kept.
+        """
+        user_id_string = str(user_id)
+        user_entries = []
+        for event_id, event in user_event_data.items():
+            next_fire = event.get("next_fire")
+            if "next_fire" not in event and event.get("date"):
+                # Stored before the next ping was saved along, the start is the latest possible ping
+                next_fire = Event.start_of(event["date"], event["event_time"]).timestamp()
+            if next_fire is not None:
+                user_entries.append((next_fire, event_id))
+        user_entries.sort()
+        with DatabaseController._index_lock:
+            if user_id_string in DatabaseController._user_dated_events:
+                if not overwrite:
+                    return
+                for timestamp, event_id in DatabaseController._user_dated_events.pop(user_id_string):
+                    entry = (timestamp, user_id_string, event_id)
+                    position = bisect.bisect_left(DatabaseController._dated_events, entry)
+                    if position < len(DatabaseController._dated_events) and \
+                            DatabaseController._dated_events[position] == entry:
+                        DatabaseController._dated_events.pop(position)
+            DatabaseController._event_versions[user_id_string] = \
+                DatabaseController._event_versions.get(user_id_string, 0) + 1
+            # Users without dated events keep an empty entry, so a later build of the index does not overwrite it
+            DatabaseController._user_dated_events[user_id_string] = user_entries
+            for timestamp, event_id in user_entries:
+                bisect.insort(DatabaseController._dated_events, (timestamp, user_id_string, event_id))
+
+    @staticmethod
+    def _complete_event_index():
+        """Builds the index of the events with a date from the events of all users on first use. Afterwards it is
+        kept up to date by every write of events.
+        """
+        if DatabaseController._event_index_complete:
+            return
+        for user_id in DatabaseController.load_all_user_ids():
+            user_event_data = DatabaseController._read_for_index(user_id, "events")
+            if user_event_data is not None:
+                DatabaseController._index_user_events(user_id, user_event_data, overwrite=False)
+        DatabaseController._event_index_complete = True
+
+    @staticmethod
+    def _read_for_index(user_id, kind):
+        """Reads a file of a user to build an index without taking the lock of the user. The indexes are built while
+        handling an update, with the lock of the user of the update held, so waiting for the locks of the other
+        users could deadlock with another worker. A file that is written in the meantime is indexed by its writer,
+        which wins over the entry read here.
+        Args:
+            user_id (str): ID of the user.
+            kind (str): "config" or "events".
+        Returns:
+            dict: Content of the file. None if the file does not exist or is being written.
+        """
+        path = os.path.join(DatabaseController.userdata_path, "{}_{}.json".format(user_id, kind))
+        try:
+            with DATABASE_SECONDS.labels("read", kind).time(), open(path, "r") as data_file:
+                return json.load(data_file)
+        except FileNotFoundError:
+            # No events yet or archived in the meantime
+            return None
+        except ValueError:
+            # Only partly written yet
+            return None
+
+    @staticmethod
+    def load_due_dated_events(until):
+        """Loads the events with a date whose next ping is due up to the given time, the head of the index.
+        Args:
+            until (datetime): Latest time of the next ping of the events.
+        Returns:
+            dict: IDs of the events per user ID, every list sorted by the next ping of the events.
+        """
+        DatabaseController._complete_event_index()
+        due_events = {}
+        with DatabaseController._index_lock:
+            end = bisect.bisect_right(DatabaseController._dated_events, (until.timestamp(), chr(0x10FFFF)))
+            for _, user_id, event_id in DatabaseController._dated_events[:end]:
+                due_events.setdefault(user_id, []).append(event_id)
+        return due_events
+
+    @staticmethod
+    def load_user_dated_events(user_id):
+        """Loads the events of the user that have a date.
+        Args:
+            user_id (int): ID of the user.
+        Returns:
+            list of 'tuple': Timestamp of the next ping and ID of every event, sorted by the next ping.
+        """
+        DatabaseController._complete_event_index()
+        with DatabaseController._index_lock:
+            return list(DatabaseController._user_dated_events.get(str(user_id), ()))
+
+    @staticmethod
+    def load_event_version(user_id):
+        """Returns the version of the events of the user, it changes whenever the events of the user are written.
+        Args:
+            user_id (int): ID of the user.
+        Returns:
+            int: Version of the events.
+        """
+        with DatabaseController._index_lock:
+            return DatabaseController._event_versions.get(str(user_id), 0)
+
+    @staticmethod
+    def clean_up_past_events(before):
+        """Cleans up all events with a date whose next ping was due before the given time without being sent, e.g.
+        of inactive users. Single events are deleted, recurring events are moved to their next occurrence. Every
+        user is written only once.
+        Args:
+            before (datetime): Events whose next ping was due before this time are cleaned up.
+        Returns:
+            int: Amount of cleaned up events.
+        """
+        DatabaseController._complete_event_index()
+        past_events = {}
+        with DatabaseController._index_lock:
+            end = bisect.bisect_left(DatabaseController._dated_events, (before.timestamp(),))
+            for _, user_id, event_id in DatabaseController._dated_events[:end]:
+                past_events.setdefault(user_id, set()).add(event_id)
+
+        for user_id, event_ids in past_events.items():
+            with DatabaseController.user_lock(user_id):
+                events = [event for event in DatabaseController.load_user_events(user_id) if event.uuid in event_ids]
+                moved = [event for event in events if event.recurrence and event.advance(clock.now())]
+                DatabaseController.save_events_of_user(user_id, moved, [event.uuid for event in events
+                                                                        if event not in moved])
+        return sum(len(event_ids) for event_ids in past_events.values())
+
+    @staticmethod
+    def load_digest_users(minute, timezone=None):
+        """Loads the active users whose daily ping is sent at the given minute of the day.
+        Args:
+            minute (int): Minutes since midnight in the time zone.
+            timezone (str, optional): Time zone of the users. The time zone of the server by default.
+        Returns:
+            list of 'str': Contains the IDs of the users.
+        """
+        DatabaseController._complete_index()
+        with DatabaseController._index_lock:
+            return sorted(DatabaseController._digest_buckets.get((timezone, minute), ()))
+
+    @staticmethod
+    def load_digest_timezones():
+        """Loads the time zones of the active users with a daily ping.
+        Returns:
+            list of 'str': Names of the time zones, None for the time zone of the server.
+        """
+        DatabaseController._complete_index()
+        with DatabaseController._index_lock:
+            return list(DatabaseController._digest_timezones)
+
+    @staticmethod
+    def is_user_inactive(user_id):
+        """Checks whether the user was marked as inactive or archived.
+        Args:
+            user_id (int): ID of the user.
+        Returns:
+            bool: True if the user is inactive.
+        """
+        DatabaseController._complete_index()
+        user_id_string = str(user_id)
+        with DatabaseController._index_lock:
+            return (user_id_string in DatabaseController._inactive_users
+                    or user_id_string in DatabaseController._archived_users)
+
+    @staticmethod
+    def mark_user_inactive(user_id, reason):
+        """Marks the user as inactive, e.g. because the user blocked the bot. Inactive users are skipped by the
+        event checker until they are reactivated.
+        Args:
+            user_id (int): ID of the user.
+            reason (str): Reason why messages can not be delivered to the user.
+        """
+        with DatabaseController.user_lock(user_id):
+            content = DatabaseController._read_user_data(user_id)
+            content["inactive"] = {"reason": reason, "since": clock.now().isoformat()}
+            DatabaseController._save_user_data(user_id, content)
+
+    @staticmethod
+    def reactivate_user(user_id):
+        """Reactivates the user if the user was marked as inactive or archived.
+        Args:
+            user_id (int): ID of the user.
+        Returns:
+            bool: True if the user was inactive.
+        """
+        if not DatabaseController.is_user_inactive(user_id):
+            return False
+        with DatabaseController.user_lock(user_id):
+            if str(user_id) in DatabaseController._archived_users:
+                DatabaseController._restore_user(user_id)
+            content = DatabaseController._read_user_data(user_id)
+            content.pop("inactive", None)
+            DatabaseController._save_user_data(user_id, content)
+        return True
+
+    @staticmethod
+    def archive_inactive_users(inactive_seconds):
+        """Archives the data of all users that are inactive for the given time. The config and the events of every
+        user are moved into a single compressed file, so they are no longer part of the scanned users.
+        Args:
+            inactive_seconds (float): Seconds a user has to be inactive.
+        Returns:
+            list of 'str': IDs of the archived users.
+        """
+        DatabaseController._complete_index()
+        with DatabaseController._index_lock:
+            inactive_users = sorted(DatabaseController._inactive_users)
+
+        archived = []
+        for user_id in inactive_users:
+            with DatabaseController.user_lock(user_id):
+                try:
+                    user_config = DatabaseController._read_user_data(user_id)
+                except FileNotFoundError:
+                    continue
+                inactive = user_config.get("inactive")
+                if not inactive:
+                    continue
+                inactive_since = datetime.fromisoformat(inactive["since"])
+                if (clock.now() - inactive_since).total_seconds() < inactive_seconds:
+                    continue
+                DatabaseController._archive_user(user_id, user_config)
+            archived.append(user_id)
+        return archived
+
+    @staticmethod
+    def _archive_path():
+        """Returns the directory of the archived users."""
+        return os.path.join(DatabaseController.userdata_path, "archive")
+
+    @staticmethod
+    def _archive_user(user_id, user_config):
+        """Moves the config and the events of the user into the archive. The caller holds the lock of the user.
+        Args:
+            user_id (int): ID of the user.
+            user_config (dict): Config of the user.
+        """
+        os.makedirs(DatabaseController._archive_path(), exist_ok=True)
+        archive_file = os.path.join(DatabaseController._archive_path(), "{}.json.gz".format(user_id))
+        config_file = os.path.join(DatabaseController.userdata_path, "{}_config.json".format(user_id))
+        events_file = os.path.join(DatabaseController.userdata_path, "{}_events.json".format(user_id))
+
+        user_events = {}
+        if os.path.isfile(events_file):
+            with open(events_file) as user_events_file:
+                user_events = json.load(user_events_file)
+        with DATABASE_SECONDS.labels("write", "archive").time(), gzip.open(archive_file, "wt") as archive:
+            json.dump({"config": user_config, "events": user_events}, archive)
+
+        # Removing the config last, the user is listed until the archive is complete
+        if os.path.isfile(events_file):
+            os.remove(events_file)
+        os.remove(config_file)
+        DatabaseController._index_user_config(user_id, None)
+        DatabaseController._index_user_events(user_id, {})
+
+    @staticmethod
+    def _restore_user(user_id):
+        """Restores the config and the events of an archived user. The caller holds the lock of the user.
+        Args:
+            user_id (int): ID of the user.
+        """
+        archive_file = os.path.join(DatabaseController._archive_path(), "{}.json.gz".format(user_id))
+        with DATABASE_SECONDS.labels("read", "archive").time(), gzip.open(archive_file, "rt") as archive:
+            content = json.load(archive)
+
+        DatabaseController._save_event_data_user(user_id, content["events"])
+        DatabaseController._save_user_data(user_id, content["config"])
+        os.remove(archive_file)
+
     @staticmethod
     def save_user_language(user_id, language):
         """Saves the selected language for the given user.
@@ -234,9 +741,28 @@ class DatabaseController:
             user_id (int): ID of the user whose language should be changed.
             language (str): Code of the desired language.
         """
-        content = DatabaseController._read_user_data(user_id)
-        content["language"] = language
-        DatabaseController._save_user_data(user_id, content)
+        with DatabaseController.user_lock(user_id):
+            content = DatabaseController._read_user_data(user_id)
+            content["language"] = language
+            DatabaseController._save_user_data(user_id, content)
+
+    @staticmethod
+    def save_user_timezone(user_id, timezone):
+        """Saves the time zone of the given user and moves all events of the user into it. Their times are converted
+        into UTC timestamps once here, so the event checker does not have to convert them.
+        Args:
+            user_id (int): ID of the user.
+            timezone (str): Name of the time zone. None for the time zone of the server.
+        """
+        with DatabaseController.user_lock(user_id):
+            content = DatabaseController._read_user_data(user_id)
+            content["timezone"] = timezone
+            DatabaseController._save_user_data(user_id, content)
+
+            events = DatabaseController.load_user_events(user_id)
+            for event in events:
+                event.use_timezone(timezone)
+            DatabaseController.save_events_of_user(user_id, events)
 
     @staticmethod
     def save_daily_ping(user_id, daily_ping):
@@ -245,6 +771,7 @@ class DatabaseController:
             user_id (int): ID of the user.
             daily_ping (bool): Indicates whether a daily ping should be done or not.
         """
-        content = DatabaseController._read_user_data(user_id)
-        content["daily_ping"] = daily_ping
-        DatabaseController._save_user_data(user_id, content)
+        with DatabaseController.user_lock(user_id):
+            content = DatabaseController._read_user_data(user_id)
+            content["daily_ping"] = daily_ping
+            DatabaseController._save_user_data(user_id, content)
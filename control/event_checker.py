@@ -7,21 +7,82 @@
 # Author: Daniel Bebber <daniel.bebber@gmx.de>
 # ----------------------------------------------
 import logging
-import time
+import zlib
 from datetime import datetime, timedelta
 
 from telegram import ParseMode
+from telegram.error import BadRequest, TelegramError, Unauthorized
 
 from control.bot_control import BotControl
 from control.database_controller import DatabaseController
-from models.event import Event, EventType
+from control.ping_delivery import PRIORITY_CLASSES, PingDelivery
+from models.event import DIGEST_PAGE_SIZE, Event, EventType
+from utils import clock
 from utils.localization_manager import receive_translation
-
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    level=logging.INFO)
+from utils.logging_utils import fields
+from utils.metrics import registry
+from utils.profiler import profiler
+from utils.time_zones import to_wall_time
 
 logger = logging.getLogger(__name__)
 
+CYCLE_SECONDS = registry.histogram("checker_cycle_seconds", "Duration of the passes of the event checker.", ("phase",),
+                                   buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 180, 600))
+USERS_SCANNED = registry.counter("checker_users_scanned", "Users whose events were checked.")
+EVENTS_SCANNED = registry.counter("checker_events_scanned", "Events that were checked for a ping.")
+PINGS_DECIDED = registry.counter("checker_pings_decided", "Pings the checker decided to send.", ("kind",))
+PINGS_SENT = registry.counter("checker_pings_sent", "Pings that were sent successfully.", ("kind",))
+SEND_SECONDS = registry.histogram("bot_send_seconds", "Duration of sending a message to Telegram.")
+SEND_ERRORS = registry.counter("bot_send_errors", "Messages that could not be sent.", ("error",))
+USERS_INACTIVE = registry.counter("users_marked_inactive", "Users that were marked as inactive by the reason.",
+                                  ("reason",))
+PING_LAG = registry.histogram("ping_lag_seconds", "Delay between the intended and the actual send time of pings.",
+                              ("kind",), buckets=(1, 5, 15, 30, 60, 120, 180, 300, 600, 1800, 3600))
+OLDEST_OVERDUE = registry.gauge("ping_oldest_overdue_seconds", "Largest ping lag of the last checker pass.",
+                                ("kind",))
+LAG_QUANTILES = (0.5, 0.95, 0.99)
+# Events merged into a single ping message at most, more events are split into several messages.
+COALESCED_EVENTS = 10
+# Ping times of at least this many hours before the start are early reminders that may be sent ahead.
+EARLY_PING_HOURS = 12
+# Events with a date whose next ping was due this long ago are cleaned up even if they could not be pinged, e.g. of
+# inactive users.
+PAST_EVENT_RETENTION = timedelta(days=1)
+
+
+# Errors of the Bot API that mean that no message can be delivered to the chat until the user writes again
+INACTIVE_ERRORS = (("bot was blocked by the user", "blocked"), ("user is deactivated", "deactivated"),
+                   ("bot was kicked", "kicked"), ("chat not found", "chat_not_found"))
+
+
+def inactive_reason(error):
+    """Classifies an error of sending a message.
+    Args:
+        error (telegram.error.TelegramError): Error of the request.
+    Returns:
+        str: Reason why the user is inactive. None if the error is not caused by the user, e.g. a network error.
+    """
+    if not isinstance(error, (Unauthorized, BadRequest)):
+        return None
+    message = str(error).lower()
+    for text, reason in INACTIVE_ERRORS:
+        if text in message:
+            return reason
+    # An invalid token is Unauthorized as well, but without being forbidden
+    if isinstance(error, Unauthorized) and message.startswith("forbidden"):
+        return "forbidden"
+    return None
+
+
+def _ping_lag_quantiles():
+    """Returns the estimated quantiles of the ping lag of every kind of ping."""
+    return {(kind, str(fraction)): child.quantile(fraction)
+            for (kind,), child in list(PING_LAG.children.items()) for fraction in LAG_QUANTILES}
+
+
+registry.gauge("ping_lag_quantile_seconds", "Estimated quantiles of the ping lag.",
+               ("kind", "quantile")).set_function(_ping_lag_quantiles)
+
 
 class EventChecker:
     """Checker for events."""
@@ -29,51 +90,125 @@ class EventChecker:
     def __init__(self):
         """Constructor."""
 
-        self.interval = DatabaseController.configuration['configuration_values']['event_checker']['interval']
-
-    def check_events(self):
-        """Checks the events of all user regularly and pings them."""
-        while True:
-            user_ids = DatabaseController.load_all_user_ids()
-            today = datetime.today().weekday()
-            self._ping_users(user_ids, today)
+        checker_configuration = DatabaseController.configuration['configuration_values']['event_checker']
+        self.interval = checker_configuration['interval']
+        self.lag_warning = checker_configuration['lag_warning']
+        self.daily_digest = checker_configuration['daily_digest']
+        self.coalesce_pings = checker_configuration['coalesce_pings']
+        smoothing = checker_configuration['smoothing']
+        self.early_lead = smoothing['early_lead']
+        self.early_ping_hours = smoothing['early_ping_hours']
+        self.delivery = PingDelivery(smoothing['window'], smoothing['rate'], smoothing['lateness'])
+
+        self._pass_lags = []
+        # Events to ping per user ID, collected by every ping phase of a cycle and sent by the delivery at once
+        self._ping_buffer = {}
+
+    def check_events(self, until=None):
+        """Checks the events of all user regularly and pings them.
+        Args:
+            until (datetime, optional): Time of the clock the checking stops at. Runs forever by default.
+        """
+        digests_checked = clock.now()
+        while until is None or clock.now() < until:
+            today = clock.now().weekday()
+            self._run_phase("ping", self._ping_users, today, counts=False)
+            self._ping_dated_events()
+            delivery_seconds = self._run_phase("delivery", self._deliver_pings, counts=False, users=False)
 
-            time.sleep(self.interval)
+            clock.sleep(max(0.0, self.interval - delivery_seconds))
 
-            # Check if a new day has begun
-            current_day = datetime.today().weekday()
-            if today != current_day:
-                # Use fresh userdata
-                user_ids = DatabaseController.load_all_user_ids()
-                self._daily_ping_users(user_ids, current_day)
+            # Send the daily pings of all minutes that were reached in the meantime
+            digests_checked = self._daily_ping_buckets(digests_checked, clock.now())
 
             # Refresh pings of all events of yesterday
-            user_ids = DatabaseController.load_all_user_ids()
-            self._refresh_start_pings(user_ids, (datetime.today() - timedelta(days=1)).weekday())
+            self._run_phase("refresh", self._refresh_start_pings, (clock.now() - timedelta(days=1)).weekday())
+            DatabaseController.clean_up_past_events(clock.now() - PAST_EVENT_RETENTION)
 
-    def _daily_ping_users(self, user_ids, day):
+    @staticmethod
+    def _run_phase(phase, function, *args, counts=True, user_ids=None, users=True):
+        """Runs a phase of a checker cycle with fresh user data, timed and profiled while profiling is requested.
+        Args:
+            phase (str): Name of the phase.
+            function (callable): Receives the IDs of the users and the arguments.
+            args: Arguments of the function, e.g. the day the phase is run for.
+            counts (bool, optional): True for the last phase of a cycle.
+            user_ids (list of 'str', optional): Users of the phase. All active users by default.
+            users (bool, optional): False for phases that do not work on the users, e.g. the delivery of the pings
+                that are already scheduled. The function only receives the arguments then.
+        Returns:
+            object: Result of the function.
+        """
+        with CYCLE_SECONDS.labels(phase).time():
+            if not users:
+                return profiler.profile("cycle", "checker:{}".format(phase), function, *args, counts=counts)
+            if user_ids is None:
+                user_ids = DatabaseController.load_active_user_ids()
+            return profiler.profile("cycle", "checker:{}".format(phase), function, user_ids, *args, counts=counts)
+
+    def _daily_ping_buckets(self, since, until):
+        """Sends the daily pings of every minute after the given start up to the given end. Every user is part of
+        the bucket of the time zone and the minute of their daily ping, each bucket is processed on its own.
+        Args:
+            since (datetime): Time up to which the daily pings were already sent.
+            until (datetime): Current time.
+        Returns:
+            datetime: Time up to which the daily pings are sent now.
+        """
+        minute = max(since, until - timedelta(days=1)).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        while minute <= until:
+            for timezone in DatabaseController.load_digest_timezones():
+                wall_minute = to_wall_time(minute, timezone)
+                user_ids = DatabaseController.load_digest_users(wall_minute.hour * 60 + wall_minute.minute, timezone)
+                if user_ids:
+                    self._run_phase("daily_ping", self._daily_ping_users, wall_minute.weekday(), minute,
+                                    wall_minute.date().isoformat(), counts=False, user_ids=user_ids)
+            minute += timedelta(minutes=1)
+        return until
+
+    def _daily_ping_users(self, user_ids, day, due_time=None, date=None):
         """Pings all users inside the user id list with all of their events of the given day.
         Args:
             user_ids (list of 'str'): Contains all users.
             day (int): Represents the day which should be pinged for.
+            due_time (datetime, optional): Time the daily pings should have been sent at. The current minute by
+                default.
+            date (str, optional): ISO date of the day in the time zone of the users. The date of the due time by
+                default.
         """
         bot = BotControl.get_bot()
+        if due_time is None:
+            due_time = clock.now().replace(second=0, microsecond=0)
+        if date is None:
+            date = due_time.date().isoformat()
 
         for user_id in user_ids:
             user_events = DatabaseController.load_user_events(user_id)
             language = DatabaseController.load_selected_language(user_id)
-            events_of_today = [event for event in user_events if event.day.value == day and event.in_daily_ping]
-            message = ""
-            if events_of_today:
-                message += "*{}*\n\n".format(receive_translation("event_daily_ping_header", language))
+            events_of_today = self.daily_digest_events(user_events, day, date)
+            PINGS_DECIDED.labels("daily").inc(len(events_of_today))
+            if not events_of_today:
+                continue
+
+            if self.daily_digest:
+                self._send_message(bot, user_id, "daily", due_time,
+                                   text=self.build_digest_message(language, events_of_today),
+                                   parse_mode=ParseMode.MARKDOWN_V2,
+                                   reply_markup=Event.event_keyboard_digest(events_of_today, language, day))
+                continue
+
+            message = "*{}*\n\n".format(receive_translation("event_daily_ping_header", language))
             for event in events_of_today:
                 message_event = self.build_ping_message(user_id, event)
                 postfix = "_{}".format(event.uuid)
-                bot.send_message(user_id, text=message + message_event, parse_mode=ParseMode.MARKDOWN_V2,
-                                 reply_markup=Event.event_keyboard_alteration(language, "event", postfix))
+                self._send_message(bot, user_id, "daily", due_time, text=message + message_event,
+                                   parse_mode=ParseMode.MARKDOWN_V2,
+                                   reply_markup=Event.event_keyboard_alteration(language, "event", postfix))
                 # Clear so that the header is only printed once
                 message = ""
 
+        self._report_lag("daily")
+
     def _ping_users(self, user_ids, day):
         """Pings all users inside userdata with the events of the given day
         Args:
@@ -81,96 +216,302 @@ class EventChecker:
             day (int): Represents the day which should be pinged for.
         """
         tomorrow = day + 1 if day < 6 else 0
+        USERS_SCANNED.inc(len(user_ids))
         for user_id in user_ids:
-            user_events = DatabaseController.load_user_events(user_id)
-            events_of_today = [event for event in user_events if event.day.value == day]
-            events_of_tomorrow = [event for event in user_events if event.day.value == tomorrow]
-            self._check_event_ping(user_id, events_of_today)
-            self._check_event_ping(user_id, events_of_tomorrow, today=False)
+            # Hold the lock of the user so the update workers can not change the events in between
+            with DatabaseController.user_lock(user_id):
+                # Events with a date are checked from the head of the index by _ping_dated_events
+                user_events = [event for event in DatabaseController.load_user_events(user_id) if not event.date]
+                events_of_today = [event for event in user_events if event.day.value == day]
+                events_of_tomorrow = [event for event in user_events if event.day.value == tomorrow]
+                ping_list = self._check_event_ping(user_id, events_of_today)
+                ping_list += self._check_event_ping(user_id, events_of_tomorrow, today=False)
+                self._buffer_pings(user_id, ping_list)
+
+    def _ping_dated_events(self):
+        """Pings the users with the events with a date whose next ping is due. Only the head of the index of these
+        events is checked, the changes of every user are saved with a single write.
+        """
+        # Early reminders may be sent ahead of their time
+        due_events = DatabaseController.load_due_dated_events(clock.now() + timedelta(seconds=self.early_lead))
+        self._run_phase("dated", self._ping_users_dated_events, due_events, counts=False, user_ids=list(due_events))
+
+    def _ping_users_dated_events(self, user_ids, due_events):
+        """Pings the users with their events with a date whose next ping is due.
+        Args:
+            user_ids (list of 'str'): Users with due events.
+            due_events (dict): IDs of the due events per user ID.
+        """
+        for user_id in user_ids:
+            if DatabaseController.is_user_inactive(user_id):
+                continue
+            with DatabaseController.user_lock(user_id):
+                event_ids = set(due_events[user_id])
+                events = [event for event in DatabaseController.load_user_events(user_id) if event.uuid in event_ids]
+                ping_list = self._check_event_ping(user_id, events, save=False)
+                if not ping_list:
+                    continue
+                DatabaseController.save_events_of_user(user_id, [event for event in ping_list if not event.deleted],
+                                                       [event.uuid for event in ping_list if event.deleted])
+                self._buffer_pings(user_id, ping_list)
+
+    def _buffer_pings(self, user_id, ping_list):
+        """Adds the pings of a user to the pings of the current cycle.
+        Args:
+            user_id (int): ID of the user.
+            ping_list (list of 'Event'): Events the user has to be pinged for.
+        """
+        if ping_list:
+            self._ping_buffer.setdefault(user_id, []).extend(ping_list)
 
-    def _check_event_ping(self, user_id, events, today=True):
+    def _deliver_pings(self):
+        """Sends the pings decided by the ping phases of the cycle spread over the smoothing window. The pings of
+        every user are scheduled together, so events with and without a date share a message if coalescing is
+        enabled.
+        Returns:
+            float: Seconds the delivery took.
+        """
+        ping_buffer, self._ping_buffer = self._ping_buffer, {}
+        for user_id, ping_list in ping_buffer.items():
+            self._schedule_pings(user_id, ping_list)
+        seconds = self.delivery.deliver()
+        self._report_lag("reminder")
+        return seconds
+
+    def _check_event_ping(self, user_id, events, today=True, save=True):
         """Check which events are not already passed and pings the user.
         Args:
             user_id (int): ID of the user.
             events (list of 'Event'): Contains all events of the user for a single day.
             today (bool, optional): Indicates whether the events of today or tomorrow are checked.
                 Checking today by default.
+            save (bool, optional): False if the caller saves the changed and deleted events itself.
+        Returns:
+            list of 'Event': Events the user has to be pinged for.
         """
-        bot = BotControl.get_bot()
-
         ping_list = []
-        logger.info("Checking %s | %s", user_id, events)
+        logger.debug("Checking %s events of %s", len(events), user_id)
+        EVENTS_SCANNED.inc(len(events))
         for event in events:
-            ping_needed, event_delete = self.check_ping_needed(user_id, event, today)
+            ping_needed, event_delete = self.check_ping_needed(user_id, event, today, self.early_lead,
+                                                               self.early_ping_hours, save)
             if ping_needed:
                 event.deleted = event_delete
                 ping_list.append(event)
+        return ping_list
 
-        # Only ping if there are events to notify about
-        if ping_list:
-            for event in ping_list:
-                message = self.build_ping_message(user_id, event)
-                if event.deleted:
-                    bot.send_message(user_id, text=message, parse_mode=ParseMode.MARKDOWN_V2)
-                else:
-                    language = DatabaseController.load_selected_language(user_id)
-                    postfix = "_{}".format(event.uuid)
-                    bot.send_message(user_id, text=message, parse_mode=ParseMode.MARKDOWN_V2,
-                                     reply_markup=Event.event_keyboard_alteration(language, "event", postfix))
+    def _schedule_pings(self, user_id, ping_list):
+        """Hands the pings of a user to the delivery. All pings of the cycle are merged into a single message with
+        the actions of every event if coalescing is enabled, one message per event otherwise.
+        Args:
+            user_id (int): ID of the user.
+            ping_list (list of 'Event'): Events the user has to be pinged for.
+        """
+        bot = BotControl.get_bot()
+        language = DatabaseController.load_selected_language(user_id)
+        PINGS_DECIDED.labels("reminder").inc(len(ping_list))
+
+        if self.coalesce_pings and len(ping_list) > 1:
+            for first in range(0, len(ping_list), COALESCED_EVENTS):
+                events = ping_list[first:first + COALESCED_EVENTS]
+                # The message is as urgent as its most urgent ping
+                priority_class = min((event.ping_class for event in events), key=PRIORITY_CLASSES.index)
+                due_time = min((event.due_time for event in events if event.due_time), default=None)
+                self.delivery.schedule(priority_class, due_time, self._send_message, bot, user_id, "reminder",
+                                       due_time, text=self.build_coalesced_ping_message(language, events),
+                                       parse_mode=ParseMode.MARKDOWN_V2,
+                                       reply_markup=Event.event_keyboard_actions(events, language))
+            return
+
+        for event in ping_list:
+            message = self.build_ping_message(user_id, event)
+            if event.deleted:
+                self.delivery.schedule(event.ping_class, event.due_time, self._send_message, bot, user_id,
+                                       "reminder", event.due_time, text=message, parse_mode=ParseMode.MARKDOWN_V2)
+            else:
+                postfix = "_{}".format(event.uuid)
+                self.delivery.schedule(event.ping_class, event.due_time, self._send_message, bot, user_id,
+                                       "reminder", event.due_time, text=message, parse_mode=ParseMode.MARKDOWN_V2,
+                                       reply_markup=Event.event_keyboard_alteration(language, "event", postfix))
+
+    def _send_message(self, bot, user_id, kind, due_time, **kwargs):
+        """Sends a ping to the user and records how late it is. A failed ping is logged and counted so it does not
+        stop the checker.
+        Args:
+            bot (telegram.Bot): Bot that sends the message.
+            user_id (int): ID of the user.
+            kind (str): Kind of the ping, used as metric label.
+            due_time (datetime): Time the ping should have been sent at.
+            **kwargs: Arguments of the message.
+        Returns:
+            bool: True if the message was sent.
+        """
+        # The user may have become inactive by an earlier ping of the same pass
+        if DatabaseController.is_user_inactive(user_id):
+            return False
+        try:
+            with SEND_SECONDS.time():
+                bot.send_message(user_id, **kwargs)
+        except TelegramError as error:
+            SEND_ERRORS.labels(type(error).__name__).inc()
+            reason = inactive_reason(error)
+            if reason:
+                USERS_INACTIVE.labels(reason).inc()
+                DatabaseController.mark_user_inactive(user_id, reason)
+                logger.info("Marked %s as inactive: %s", user_id, error,
+                            extra=fields(kind=kind, user_id=user_id, reason=reason))
+            else:
+                logger.warning("Sending %s ping to %s failed: %s", kind, user_id, error,
+                               extra=fields(kind=kind, user_id=user_id, error=type(error).__name__))
+            return False
+        PINGS_SENT.labels(kind).inc()
+
+        if due_time:
+            lag = max(0.0, (clock.now() - due_time).total_seconds())
+            PING_LAG.labels(kind).observe(lag)
+            self._pass_lags.append(lag)
+        return True
+
+    def _report_lag(self, kind):
+        """Publishes the largest lag of the pings sent during the current pass and warns if pings were later than
+        the configured threshold.
+        Args:
+            kind (str): Kind of the pings of the pass.
+        """
+        lags, self._pass_lags = self._pass_lags, []
+        oldest_overdue = max(lags, default=0.0)
+        OLDEST_OVERDUE.labels(kind).set(oldest_overdue)
+        if not lags:
+            return
+
+        late_pings = sum(1 for lag in lags if lag > self.lag_warning)
+        if late_pings:
+            logger.warning("%s of %s %s pings exceeded the lag threshold of %ss, the oldest one was %.0fs late",
+                           late_pings, len(lags), kind, self.lag_warning, oldest_overdue,
+                           extra=fields(kind=kind, late_pings=late_pings, pings=len(lags),
+                                        oldest_overdue=oldest_overdue))
+        lag_histogram = PING_LAG.labels(kind)
+        quantiles = [lag_histogram.quantile(fraction) for fraction in LAG_QUANTILES]
+        logger.info("Sent %s %s pings, lag p50 %.0fs | p95 %.0fs | p99 %.0fs", len(lags), kind, *quantiles,
+                    extra=fields(kind=kind, pings=len(lags), lag_p50=quantiles[0], lag_p95=quantiles[1],
+                                 lag_p99=quantiles[2]))
 
     @staticmethod
-    def check_ping_needed(user_id, event, today=True):
-        """Checks if an event needs to be pinged.
+    def check_ping_needed(user_id, event, today=True, early_lead=0, early_ping_hours=EARLY_PING_HOURS, save=True):
+        """Checks if an event needs to be pinged. Sets the due time and the priority class of the ping on the event.
         Args:
             user_id (int): ID of the user.
             event (Event): Contains the event that should be checked.
-            today (bool, optional): Indicates whether today or tomorrow is checked.
+            today (bool, optional): Indicates whether today or tomorrow is checked. Ignored for events with a date.
+            early_lead (int, optional): Seconds early reminders may be sent ahead of their time at most.
+            early_ping_hours (int, optional): Ping times of at least this many hours before the start are early
+                reminders.
+            save (bool, optional): False if the caller saves the changed event or deletes the passed one itself.
         Returns:
             bool: True if a ping has to be sent. False if not.
         """
-        current_time = datetime.now()
-        ping_times = event.ping_times
-
-        event_month = current_time.month
-        event_day = current_time.day
-        if not today:
-            event_date = current_time + timedelta(days=1)
-            event_day = event_date.day
-            event_month = event_date.month
-
-        event_time = datetime(year=current_time.year, month=event_month, day=event_day,
-                              hour=event.event_time_hours, minute=event.event_time_minutes)
-
-        needs_ping = False
-
-        for ping_time in ping_times:
-            # If multiple ping times are already reached ping one time and disable all "used" times.
-            if ping_times[ping_time]:
-                delta = timedelta(hours=int(ping_time.split(':')[0]), minutes=int(ping_time.split(':')[1]))
-                if event_time - delta < current_time:
-                    event.ping_times[ping_time] = False
-                    needs_ping = True
-
-                    # Save ping times for regularly events
-                    if event.event_type == EventType.REGULARLY:
-                        event.ping_times_to_refresh[ping_time] = True
-
+        current_time = clock.now()
+        # Compared as UTC timestamps, events with a date were converted when they were saved
+        now = current_time.timestamp()
+        event_time = event.start_timestamp
+        if event_time is None:
+            event_date = current_time if today else current_time + timedelta(days=1)
+            event_time = datetime(year=event_date.year, month=event_date.month, day=event_date.day,
+                                  hour=event.event_time_hours, minute=event.event_time_minutes).timestamp()
+
+        due_times, ping_class = EventChecker._reached_ping_times(event, event_time, now, early_lead,
+                                                                 early_ping_hours)
+        needs_ping = bool(due_times)
         event_deleted = False
 
         # Cleanup event if it is passed
-        if event_time < current_time and not event.start_ping_done:
+        if event_time <= now and not event.start_ping_done:
             needs_ping = True
-            if event.event_type == EventType.SINGLE:
-                DatabaseController.delete_event_of_user(user_id, event.uuid)
-                event_deleted = True
-            event.start_ping_done = True
+            due_times.append(event_time)
+            ping_class = "start"
+            event_deleted = EventChecker._start_reached(user_id, event, current_time, save)
+
+        # The lag of a combined ping is measured against the oldest time that was reached
+        event.due_time = datetime.fromtimestamp(min(due_times)) if due_times else None
+        event.ping_class = ping_class
 
-        if needs_ping and not event_deleted:
+        if needs_ping and not event_deleted and save:
             # Save the changes on the event
             DatabaseController.save_event_data_user(user_id, event)
 
         return needs_ping, event_deleted
 
+    @staticmethod
+    def _reached_ping_times(event, event_time, now, early_lead, early_ping_hours):
+        """Disables the enabled ping times of an event that are reached. Early reminders are reached ahead of their
+        time by their offset.
+        Args:
+            event (Event): Event whose ping times are checked.
+            event_time (float): UTC timestamp of the start of the event.
+            now (float): Current UTC timestamp.
+            early_lead (int): Seconds early reminders may be sent ahead of their time at most.
+            early_ping_hours (int): Ping times of at least this many hours before the start are early reminders.
+        Returns:
+            tuple: List of the UTC timestamps the reached pings were due at and the priority class of the ping.
+        """
+        due_times = []
+        ping_class = "early"
+        for ping_time in event.ping_times:
+            # If multiple ping times are already reached ping one time and disable all "used" times.
+            if not event.ping_times[ping_time]:
+                continue
+            delta = int(ping_time.split(':')[0]) * 3600 + int(ping_time.split(':')[1]) * 60
+            early = delta >= early_ping_hours * 3600
+            lead = EventChecker.early_offset(event, ping_time, early_lead) if early else 0
+            if event_time - delta - lead > now:
+                continue
+            event.ping_times[ping_time] = False
+            due_times.append(event_time - delta)
+            if not early:
+                ping_class = "reminder"
+
+            # Save ping times for regularly events
+            if event.event_type == EventType.REGULARLY:
+                event.ping_times_to_refresh[ping_time] = True
+        return due_times, ping_class
+
+    @staticmethod
+    def _start_reached(user_id, event, current_time, save):
+        """Marks the start ping of an event as done. Recurring events move on to their next occurrence instead of
+        being refreshed the next day, single events and recurring events without further occurrences are deleted.
+        Args:
+            user_id (int): ID of the user.
+            event (Event): Event that started.
+            current_time (datetime): Current time.
+            save (bool): False if the caller deletes the passed event itself.
+        Returns:
+            bool: True if the event is deleted.
+        """
+        event.start_ping_done = True
+        if event.recurrence:
+            event_deleted = not event.advance(current_time)
+        else:
+            event_deleted = event.event_type == EventType.SINGLE
+        if event_deleted and save:
+            DatabaseController.delete_event_of_user(user_id, event.uuid)
+        return event_deleted
+
+    @staticmethod
+    def early_offset(event, ping_time, early_lead):
+        """Returns how many seconds an early reminder is sent ahead of its time. The offset is spread over the lead
+        per event and ping time, so the early reminders of events starting at the same time do not line up. It stays
+        the same for every pass, so a reminder is never sent twice.
+        Args:
+            event (Event): Event of the reminder.
+            ping_time (str): Ping time of the reminder.
+            early_lead (int): Largest offset in seconds.
+        Returns:
+            int: Offset in seconds.
+        """
+        if early_lead <= 0:
+            return 0
+        return zlib.crc32("{}_{}".format(event.uuid, ping_time).encode()) % (early_lead + 1)
+
     @staticmethod
     def build_ping_message(user_id, event):
         """Generates the ping message for the user.
@@ -190,21 +531,97 @@ class EventChecker:
 
         return message
 
+    @staticmethod
+    def build_coalesced_ping_message(user_language, events):
+        """Generates a single ping message for several events. The events are numbered like the rows of the
+        keyboard of Event.event_keyboard_actions.
+        Args:
+            user_language (str): Language that should be used.
+            events (list of 'Event'): Events the user is pinged for.
+        Returns:
+            str: Formatted message.
+        """
+        message = "*{}*\n\n".format(receive_translation("event_reminder", user_language))
+        for number, event in enumerate(events, start=1):
+            message += "*{}\\. {}:* {}\n".format(number, receive_translation("event", user_language), event.name)
+            message += "*{}:* {}\n".format(receive_translation("event_content", user_language), event.content)
+            message += "*{}:* {}\n".format(receive_translation("event_start", user_language), event.event_time)
+            message += "\n"
+        return message
+
+    @staticmethod
+    def daily_digest_events(events, day, date=None):
+        """Selects the events of the daily ping of the given day.
+        Args:
+            events (list of 'Event'): Contains all events of a user.
+            day (int): Day of the daily ping.
+            date (str, optional): ISO date of the daily ping. Events with a date are only part of the daily ping of
+                their date.
+        Returns:
+            list of 'Event': Events of the day that are part of the daily ping, sorted by their start.
+        """
+        return sorted((event for event in events if event.in_daily_ping
+                       and EventChecker._happens_on(event, day, date)),
+                      key=lambda event: (event.event_time_hours, event.event_time_minutes))
+
+    @staticmethod
+    def _happens_on(event, day, date):
+        """Checks whether the event happens on the given day.
+        Args:
+            event (Event): Event that should be checked.
+            day (int): Weekday.
+            date (str): ISO date of the day, None if unknown.
+        Returns:
+            bool: True if the event happens on the day.
+        """
+        if event.recurrence:
+            return date is not None and event.recurrence.occurs_on(datetime.strptime(date, "%Y-%m-%d").date())
+        if event.date:
+            return event.date == date
+        return event.day.value == day
+
+    @staticmethod
+    def build_digest_message(user_language, events, page=0):
+        """Generates a page of the daily digest that lists all events of the day in a single message.
+        Args:
+            user_language (str): Language that should be used.
+            events (list of 'Event'): Events of the day, sorted by their start.
+            page (int, optional): Page that is shown.
+        Returns:
+            str: Formatted message.
+        """
+        message = "*{}*\n\n".format(receive_translation("event_daily_ping_header", user_language))
+        first = page * DIGEST_PAGE_SIZE
+        for number, event in enumerate(events[first:first + DIGEST_PAGE_SIZE], start=first + 1):
+            message += "*{}\\. {}* {}\n".format(number, event.event_time, event.name)
+            if event.content:
+                message += "{}\n".format(event.content)
+            message += "\n"
+        return message
+
     @staticmethod
     def _refresh_start_pings(user_ids, day):
         """Refreshes the "start ping done" booleans inside the user data for regularly events on the given day.
+        Regularly events without a rule are moved onto a weekly rule, afterwards they move on to their next
+        occurrence when their start is pinged and are no longer refreshed here.
         Args:
             user_ids (dict): Contains all users and their events.
             day (int): Day which should be refreshed.
         """
         for user_id in user_ids:
-            events = [event for event in DatabaseController.load_user_events(user_id) if event.day == day]
-            for event in events:
-                event.start_ping_done = False
-
-                # Restore ping times for regularly events
-                for event_ping in event.ping_times_to_refresh:
-                    event.ping_times[event_ping] = True
-                event.ping_times_to_refresh = {}
+            with DatabaseController.user_lock(user_id):
+                events = [event for event in DatabaseController.load_user_events(user_id)
+                          if event.day.value == day and not event.date]
+                for event in events:
+                    event.start_ping_done = False
+
+                    # Restore ping times for regularly events
+                    for event_ping in event.ping_times_to_refresh:
+                        event.ping_times[event_ping] = True
+                    event.ping_times_to_refresh = {}
+
+                    # Gives regularly events a weekly rule
+                    if event.event_type == EventType.REGULARLY:
+                        event.use_timezone(event.timezone)
 
-                DatabaseController.save_event_data_user(user_id, event)
+                    DatabaseController.save_event_data_user(user_id, event)
@@ -7,26 +7,45 @@
 # Author: Daniel Bebber <daniel.bebber@gmx.de>
 # ----------------------------------------------
 import logging
-from datetime import datetime
+from datetime import timedelta
 
 from telegram import ParseMode
+from telegram.error import BadRequest
 
 from control.bot_control import BotControl
-from control.database_controller import DatabaseController
+from control.event_checker import EventChecker
 from models.day import DayEnum
 from models.event import Event, EventType, DEFAULT_PING_STATES
-from models.user import User
+from models.recurrence import WEEKLY, Recurrence
 from state_machines.user_event_alteration_machine import UserEventAlterationMachine
+from state_machines.user_event_alteration_machine import ValidStates as AlterationStates
 from state_machines.user_event_creation_machine import UserEventCreationMachine
+from state_machines.user_event_creation_machine import ValidStates as CreationStates
+from utils import clock
 from utils.localization_manager import receive_translation
-from utils.parsing_utils import replace_reserved_characters
+from utils.logging_utils import lazy
+from utils.parsing_utils import parse_date, replace_reserved_characters
+from utils.session_store import SessionStore
+from utils.time_zones import to_wall_time
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_TEXT = "text"
+
+CREATION_EVENT_TYPES = {"{}".format(event_type.value) for event_type in EventType}
+CREATION_PREFIX_TRIGGERS = {"d": "day", "h": "hours", "m": "minutes"}
+
+ALTERATION_CHOICES = {"name": AlterationStates.ALTER_NAME, "content": AlterationStates.ALTER_CONTENT,
+                      "type": AlterationStates.ALTER_TYPE, "start": AlterationStates.ALTER_START_TIME,
+                      "pingtimes": AlterationStates.ALTER_PING_TIMES, "day": AlterationStates.ALTER_DAY,
+                      "done": AlterationStates.DONE}
 
 
 class EventHandler:
     """Handler for events."""
 
-    events_in_creation = {}
-    events_in_alteration = {}
+    events_in_creation = SessionStore("events_in_creation")
+    events_in_alteration = SessionStore("events_in_alteration")
 
     def __init__(self):
         """Constructor."""
@@ -37,155 +56,206 @@ class EventHandler:
         """Reply to the /new_event command. Created the event in creation entry for the requesting user and starts the
         event creation cycle.
         """
-        user = User.resolve_user(update)
-        UserEventCreationMachine.set_state_of_user(user.user_id, 1)
+        user = context.request_context.user
+        UserEventCreationMachine.set_state_of_user(user.user_id, CreationStates.STARTED)
         EventHandler.events_in_creation[user.user_id] = {}
         update.message.reply_text(receive_translation("event_creation_start", user.language)
                                   .format(USERNAME=user.telegram_user.first_name))
 
     @staticmethod
-    def add_new_event_title(update, context):
-        """Handles the title of the new event."""
-        user = User.resolve_user(update)
-        user_language = DatabaseController.load_selected_language(user.user_id)
-        if UserEventCreationMachine.receive_state_of_user(user.user_id) != 1:
-            return
-        title = replace_reserved_characters(update.message.text)
-        EventHandler.events_in_creation[user.user_id]["title"] = title
-        update.message.reply_text(receive_translation("event_creation_content", user_language))
+    def add_new_event_reply(update, context):
+        """Handles the text replies of the event creation.
+        Returns:
+            bool: True if the reply was part of the event creation.
+        """
+        user = context.request_context.user
+        return UserEventCreationMachine.machine.dispatch(user.user_id, TRIGGER_TEXT, user, update, None,
+                                                         update.message.text)
 
     @staticmethod
-    def add_new_event_content(update, context):
-        """Handles the addition of content of a new event."""
-        user = User.resolve_user(update)
-        user_language = DatabaseController.load_selected_language(user.user_id)
-        if UserEventCreationMachine.receive_state_of_user(user.user_id) != 1:
-            return
-        content = replace_reserved_characters(update.message.text)
-        EventHandler.events_in_creation[user.user_id]["content"] = content
-        update.message.reply_text(receive_translation("event_creation_type", user_language),
-                                  reply_markup=Event.event_keyboard_type(user_language))
+    def add_new_event_query_handler(update, context, callback):
+        """Creates a new event with help of the event creation state machine and keyboards."""
+        user = context.request_context.user
+        trigger, argument = EventHandler._creation_trigger(callback)
+        UserEventCreationMachine.machine.dispatch(user.user_id, trigger, user, update, None, argument)
 
     @staticmethod
-    def add_new_event_query_handler(update, context):
-        """Creates a new event with help of the event creation state machine and keyboards."""
-        query = update.callback_query
-        query.answer()
+    def creation_callback_guard(update, context, callback):
+        """Checks whether the callback belongs to the current step of an event creation.
+        Returns:
+            bool: False if the callback is stale.
+        """
+        trigger, _ = EventHandler._creation_trigger(callback)
+        user_id = context.request_context.user_id
+        return trigger is not None and UserEventCreationMachine.machine.accepts(user_id, trigger)
+
+    @staticmethod
+    def _creation_trigger(callback):
+        """Determines the trigger of the event creation callback.
+        Args:
+            callback (CallbackData): Parsed callback data of the query.
+        Returns:
+            tuple: Name of the trigger and its argument. The trigger is None if the data is unknown.
+        """
+        argument = callback.argument or ""
+        if argument in CREATION_EVENT_TYPES:
+            return "event_type", argument
+        if argument.startswith("ping_times_"):
+            return "ping_times", callback.arguments[-1]
+        if argument[:1] in CREATION_PREFIX_TRIGGERS:
+            return CREATION_PREFIX_TRIGGERS[argument[0]], argument[1:]
+        return None, None
 
-        if query.message.chat['type'] == "group":
-            user_id = query.message.chat['id']
+    @staticmethod
+    def _creation_text(user, update, event_id, text):
+        """Handles the title and afterwards the content of the new event."""
+        event_in_creation = EventHandler.events_in_creation.get(user.user_id)
+        if event_in_creation is None:
+            return CreationStates.INITIAL
+
+        if "title" not in event_in_creation:
+            event_in_creation["title"] = replace_reserved_characters(text)
+            update.message.reply_text(receive_translation("event_creation_content", user.language))
         else:
-            user_id = query.from_user['id']
-        user_language = DatabaseController.load_selected_language(user_id)
+            event_in_creation["content"] = replace_reserved_characters(text)
+            update.message.reply_text(receive_translation("event_creation_type", user.language),
+                                      reply_markup=Event.event_keyboard_type(user.language))
+        return None
 
-        bot = BotControl.get_bot()
+    @staticmethod
+    def _creation_event_type(user, update, event_id, event_type):
+        """Handles the selected event type."""
+        EventHandler.events_in_creation[user.user_id]["event_type"] = int(event_type)
+        if event_type == "{}".format(EventType.SINGLE.value):
+            message = receive_translation("event_creation_type_single", user.language)
+        else:
+            message = receive_translation("event_creation_type_regularly", user.language)
+        update.callback_query.edit_message_text(text=message)
+        return CreationStates.DAY
 
-        # State: Requesting event type
-        if UserEventCreationMachine.receive_state_of_user(user_id) == 1:
-            EventHandler.events_in_creation[user_id]["event_type"] = int(query.data)
-            if query.data == "{}".format(EventType.SINGLE.value):
-                message = receive_translation("event_creation_type_single", user_language)
-            elif query.data == "{}".format(EventType.REGULARLY.value):
-                message = receive_translation("event_creation_type_regularly", user_language)
-            else:
-                message = receive_translation("undefined_error_response", user_language)
-            query.edit_message_text(text=message)
-            UserEventCreationMachine.set_state_of_user(user_id, 2)
-
-        # State: Requesting day of the event
-        if UserEventCreationMachine.receive_state_of_user(user_id) == 2:
-            logging.info(query.data)
-            if query.data[0] == 'd':
-                EventHandler.events_in_creation[user_id]["day"] = query.data[1:]
-                UserEventCreationMachine.set_state_of_user(user_id, 3)
-                bot.delete_message(user_id, query.message.message_id)
-            else:
-                bot.send_message(user_id, text=receive_translation("event_creation_day", user_language),
-                                 reply_markup=Event.event_keyboard_day(user_language))
-
-        # State: Requesting start hours of the event
-        if UserEventCreationMachine.receive_state_of_user(user_id) == 3:
-            logging.info(query.data)
-            if query.data[0] == 'h':
-                EventHandler.events_in_creation[user_id]["hours"] = query.data[1:]
-                UserEventCreationMachine.set_state_of_user(user_id, 4)
-                bot.delete_message(user_id, query.message.message_id)
-            else:
-                bot.send_message(user_id, text=receive_translation("event_creation_hours", user_language),
-                                 reply_markup=Event.event_keyboard_hours())
-
-        # State: Requesting start minutes of the event
-        if UserEventCreationMachine.receive_state_of_user(user_id) == 4:
-            logging.info(query.data)
-            if query.data[0] == 'm':
-                EventHandler.events_in_creation[user_id]["event_time"] = \
-                    "{}:{}".format(EventHandler.events_in_creation[user_id]["hours"], query.data[1:])
-                UserEventCreationMachine.set_state_of_user(user_id, 10)
-                query.edit_message_text(text=receive_translation("event_creation_finished", user_language))
-            else:
-                bot.send_message(user_id, text=receive_translation("event_creation_minutes", user_language),
-                                 reply_markup=Event.event_keyboard_minutes())
-
-        # State: Start requesting ping times for the event - reset status.
-        if UserEventCreationMachine.receive_state_of_user(user_id) == 10:
-            ping_states = DEFAULT_PING_STATES.copy()
-            EventHandler.events_in_creation[user_id]["ping_times"] = ping_states
-            query.edit_message_text(text=receive_translation("event_creation_ping_times_header", user_language),
-                                    reply_markup=Event.event_keyboard_ping_times(user_language, "event_creation",
-                                                                                 ping_states))
-            UserEventCreationMachine.set_state_of_user(user_id, 11)
-
-        elif UserEventCreationMachine.receive_state_of_user(user_id) == 11:
-            if "ping_times" in query.data:
-                suffix = query.data.split('_')[-1]
-                if suffix == "done":
-                    UserEventCreationMachine.set_state_of_user(user_id, -1)
-                    bot.delete_message(user_id, query.message.message_id)
-                else:
-                    EventHandler.events_in_creation[user_id]["ping_times"][suffix] = \
-                        not EventHandler.events_in_creation[user_id]["ping_times"][suffix]
-                    query.edit_message_text(
-                        text=receive_translation("event_creation_ping_times_header", user_language),
-                        reply_markup=Event.event_keyboard_ping_times(
-                            user_language, "event_creation", EventHandler.events_in_creation[user_id]["ping_times"]))
-
-        # State: All data collected - creating event
-        if UserEventCreationMachine.receive_state_of_user(user_id) == -1:
-            event_in_creation = EventHandler.events_in_creation[user_id]
-            event = Event(event_in_creation["title"], DayEnum(int(event_in_creation["day"])),
-                          event_in_creation["content"],
-                          EventType(event_in_creation["event_type"]), event_in_creation["event_time"],
-                          event_in_creation["ping_times"])
-            DatabaseController.save_event_data_user(user_id, event)
-            UserEventCreationMachine.set_state_of_user(user_id, 0)
-            EventHandler.events_in_creation.pop(user_id)
-
-            # Needed because when an event is created on the current day but has already passed there
-            # would be pings for it.
-            event_hour, event_minute = event.event_time.split(":")
-            current_time = datetime.now()
-            if int(event_in_creation["day"]) == current_time.weekday() and int(event_hour) < current_time.hour or \
-                    (int(event_hour) == current_time.hour and int(event_minute) < current_time.minute):
-                event.start_ping_done = True
-                event.ping_times_to_refresh = {}
-                for ping_time in event.ping_times:
-                    if event.ping_times[ping_time]:
-                        event.ping_times_to_refresh[ping_time] = True
-
-                event.ping_times = DEFAULT_PING_STATES.copy()
-                DatabaseController.save_event_data_user(user_id, event)
-
-            message = receive_translation("event_creation_summary_header", user_language)
-            message += event.pretty_print_formatting(user_language)
-            bot.send_message(user_id, text=message, parse_mode=ParseMode.MARKDOWN_V2)
+    @staticmethod
+    def _creation_request_day(user, update, event_id, argument):
+        """Requests the day of the event, single events may get a date instead."""
+        message = receive_translation("event_creation_day", user.language)
+        if EventHandler.events_in_creation[user.user_id]["event_type"] == EventType.SINGLE.value:
+            message += "\n{}".format(receive_translation("event_creation_date_hint", user.language))
+        BotControl.get_bot().send_message(user.user_id, text=message,
+                                          reply_markup=Event.event_keyboard_day(user.language))
+
+    @staticmethod
+    def _creation_day(user, update, event_id, day):
+        """Handles the selected day of the event."""
+        EventHandler.events_in_creation[user.user_id]["day"] = day
+        BotControl.get_bot().delete_message(user.user_id, update.callback_query.message.message_id)
+        return CreationStates.HOURS
+
+    @staticmethod
+    def _creation_date(user, update, event_id, text):
+        """Handles the date of the event the user sent instead of selecting a day."""
+        event_in_creation = EventHandler.events_in_creation.get(user.user_id)
+        if event_in_creation is None:
+            return CreationStates.INITIAL
+
+        date = parse_date(text)
+        if date is None or date < to_wall_time(clock.now(), user.timezone).date():
+            update.message.reply_text(receive_translation("event_creation_date_invalid", user.language))
+            return None
+        event_in_creation["day"] = date.weekday()
+        # Regularly events only take the weekday of the date
+        if event_in_creation["event_type"] == EventType.SINGLE.value:
+            event_in_creation["date"] = date.isoformat()
+        return CreationStates.HOURS
+
+    @staticmethod
+    def _creation_request_hours(user, update, event_id, argument):
+        """Requests the start hours of the event."""
+        BotControl.get_bot().send_message(user.user_id,
+                                          text=receive_translation("event_creation_hours", user.language),
+                                          reply_markup=Event.event_keyboard_hours())
+
+    @staticmethod
+    def _creation_hours(user, update, event_id, hours):
+        """Handles the selected start hours of the event."""
+        EventHandler.events_in_creation[user.user_id]["hours"] = hours
+        BotControl.get_bot().delete_message(user.user_id, update.callback_query.message.message_id)
+        return CreationStates.MINUTES
+
+    @staticmethod
+    def _creation_request_minutes(user, update, event_id, argument):
+        """Requests the start minutes of the event."""
+        BotControl.get_bot().send_message(user.user_id,
+                                          text=receive_translation("event_creation_minutes", user.language),
+                                          reply_markup=Event.event_keyboard_minutes())
+
+    @staticmethod
+    def _creation_minutes(user, update, event_id, minutes):
+        """Handles the selected start minutes of the event."""
+        event_in_creation = EventHandler.events_in_creation[user.user_id]
+        event_in_creation["event_time"] = "{}:{}".format(event_in_creation["hours"], minutes)
+        update.callback_query.edit_message_text(text=receive_translation("event_creation_finished", user.language))
+        return CreationStates.PING_TIMES_START
+
+    @staticmethod
+    def _creation_request_ping_times(user, update, event_id, argument):
+        """Start requesting ping times for the event - reset status."""
+        ping_states = DEFAULT_PING_STATES.copy()
+        EventHandler.events_in_creation[user.user_id]["ping_times"] = ping_states
+        update.callback_query.edit_message_text(
+            text=receive_translation("event_creation_ping_times_header", user.language),
+            reply_markup=Event.event_keyboard_ping_times(user.language, "event_creation", ping_states))
+        return CreationStates.PING_TIMES_SELECT
+
+    @staticmethod
+    def _creation_ping_times(user, update, event_id, ping_time):
+        """Toggles the selected ping time or finishes the selection."""
+        query = update.callback_query
+        if ping_time == "done":
+            BotControl.get_bot().delete_message(user.user_id, query.message.message_id)
+            return CreationStates.DONE
+
+        ping_states = EventHandler.events_in_creation[user.user_id]["ping_times"]
+        ping_states[ping_time] = not ping_states[ping_time]
+        query.edit_message_text(text=receive_translation("event_creation_ping_times_header", user.language),
+                                reply_markup=Event.event_keyboard_ping_times(user.language, "event_creation",
+                                                                             ping_states))
+        return None
+
+    @staticmethod
+    def _creation_done(user, update, event_id, argument):
+        """All data collected - creating event."""
+        event_in_creation = EventHandler.events_in_creation[user.user_id]
+        event = Event(event_in_creation["title"], DayEnum(int(event_in_creation["day"])),
+                      event_in_creation["content"],
+                      EventType(event_in_creation["event_type"]), event_in_creation["event_time"],
+                      event_in_creation["ping_times"])
+        # Single events happen on a date, the next occurrence of the day if the user selected a day. Regularly events
+        # get a weekly rule.
+        event.date = event_in_creation.get("date")
+        event.use_timezone(user.timezone)
+
+        # A single event entered with the date of today may have started already, it would never be pinged or
+        # cleaned up, so the user chooses the day again
+        if event.start_timestamp <= clock.now().timestamp():
+            event_in_creation.pop("date", None)
+            BotControl.get_bot().send_message(user.user_id,
+                                              text=receive_translation("event_creation_started", user.language))
+            return CreationStates.DAY
+
+        del EventHandler.events_in_creation[user.user_id]
+        user.save_event(event)
+
+        message = receive_translation("event_creation_summary_header", user.language)
+        message += event.pretty_print_formatting(user.language)
+        BotControl.get_bot().send_message(user.user_id, text=message, parse_mode=ParseMode.MARKDOWN_V2)
+        return CreationStates.INITIAL
 
     @staticmethod
     def list_all_events_of_user(update, context):
         """Lists all events of the user."""
-        user = User.resolve_user(update)
+        user = context.request_context.user
 
         message = "*{}:*\n\n".format(receive_translation("event_list_header", user.language))
-        event_data = DatabaseController.load_user_events(user.user_id)
+        event_data = user.events
         has_content = False
 
         for day in DayEnum:
@@ -208,16 +278,17 @@ class EventHandler:
                          reply_markup=Event.event_keyboard_alteration(user.language))
 
     @staticmethod
-    def event_alteration_start(update, context):
+    def event_alteration_start(update, context, callback):
         """Starts the event alteration process."""
-        query = update.callback_query
-        query.answer()
+        altering_type = callback.argument
 
-        altering_type = query.data.split("_")[-1:][0]
+        user = context.request_context.sender
+        if UserEventAlterationMachine.receive_state_of_user(user.user_id) not in (AlterationStates.INITIAL.value,
+                                                                                  AlterationStates.DONE.value):
+            return
 
-        user_id = query.from_user['id']
-        events = DatabaseController.load_user_events(user_id)
-        user_language = DatabaseController.load_selected_language(user_id)
+        events = user.events
+        user_language = user.language
 
         message = None
         if altering_type == 'change':
@@ -225,236 +296,382 @@ class EventHandler:
         elif altering_type == 'delete':
             message = receive_translation("event_alteration_delete_header", user_language)
 
-        if UserEventAlterationMachine.receive_state_of_user(
-                user_id) == 0 or UserEventAlterationMachine.receive_state_of_user(user_id) == -1:
-            bot = BotControl.get_bot()
-            bot.send_message(user_id, text=message, parse_mode=ParseMode.MARKDOWN_V2,
-                             reply_markup=Event.event_keyboard_alteration_action(events, user_language,
-                                                                                 mode=altering_type))
+        bot = BotControl.get_bot()
+        bot.send_message(user.user_id, text=message, parse_mode=ParseMode.MARKDOWN_V2,
+                         reply_markup=Event.event_keyboard_alteration_action(events, user_language,
+                                                                             mode=altering_type))
 
     @staticmethod
-    def event_alteration_perform(update, context):
+    def event_alteration_perform(update, context, callback):
         """Performs the event alteration."""
-        query = update.callback_query
-        query.answer()
-
-        user_id = query.from_user['id']
-        user_language = DatabaseController.load_selected_language(user_id)
-        logging.info("data: %s | state: %s", query.data, UserEventAlterationMachine.receive_state_of_user(user_id))
-
-        event_id = query.data.split('_')[2]
-
-        # Handle silencing of events
-        if query.data.startswith("event_silence"):
-            event = [event for event in DatabaseController.load_user_events(user_id) if event.uuid == event_id][0]
-
-            # For regularly events the ping times have to be marked as to be refreshed
-            if event.event_type == EventType.REGULARLY:
-                for ping_time in event.ping_times:
-                    if event.ping_times[ping_time]:
-                        event.ping_times_to_refresh[ping_time] = True
-
-            event.ping_times = DEFAULT_PING_STATES.copy()
-            DatabaseController.save_event_data_user(user_id, event)
-            query.edit_message_text(text=receive_translation("event_silenced", user_language))
-            UserEventAlterationMachine.set_state_of_user(user_id, 0)
-
-        # Handle change of events
-        elif query.data.startswith("event_change"):
-
-            # State: Choice - Check which button the user clicked after change was started.
-            if UserEventAlterationMachine.receive_state_of_user(user_id) == 99:
-                choice = query.data.split('_')[-1]
-                if choice == "name":
-                    UserEventAlterationMachine.set_state_of_user(user_id, 1)
-                elif choice == "content":
-                    UserEventAlterationMachine.set_state_of_user(user_id, 2)
-                elif choice == "type":
-                    UserEventAlterationMachine.set_state_of_user(user_id, 3)
-                elif choice == "start":
-                    UserEventAlterationMachine.set_state_of_user(user_id, 4)
-                elif choice == "pingtimes":
-                    UserEventAlterationMachine.set_state_of_user(user_id, 5)
-                elif choice == "day":
-                    UserEventAlterationMachine.set_state_of_user(user_id, 6)
-                elif choice == "done":
-                    UserEventAlterationMachine.set_state_of_user(user_id, -1)
-
-            # State: Initial - return options to the user.
-            if UserEventAlterationMachine.receive_state_of_user(user_id) == 0:
-                EventHandler.events_in_alteration[user_id] = {}
-                EventHandler.events_in_alteration[user_id]['old'] = \
-                    DatabaseController.read_event_of_user(user_id, event_id)
-                EventHandler.events_in_alteration[user_id]['old']['id'] = event_id
-                EventHandler.events_in_alteration[user_id]['new'] = \
-                    EventHandler.events_in_alteration[user_id]['old'].copy()
-
-                query.edit_message_text(text=receive_translation("event_alteration_change_decision", user_language),
-                                        reply_markup=Event.event_keyboard_alteration_change_start(user_language,
-                                                                                                  query.data))
-                UserEventAlterationMachine.set_state_of_user(user_id, 99)
-
-            # State: Name - Change name of event.
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 1:
-                query.edit_message_text(text=receive_translation("event_alteration_change_name", user_language))
-                UserEventAlterationMachine.set_state_of_user(user_id, 11)
-
-            # State: Content - Change content of event.
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 2:
-                query.edit_message_text(text=receive_translation("event_alteration_change_content", user_language))
-                UserEventAlterationMachine.set_state_of_user(user_id, 12)
-
-            # State: Type - Change type of event.
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 3:
-                query.edit_message_text(text=receive_translation("event_alteration_change_type", user_language),
-                                        reply_markup=Event.event_keyboard_type(user_language, callback_prefix=
-                                        "event_change_{}_type_".format(event_id)))
-                UserEventAlterationMachine.set_state_of_user(user_id, 13)
-
-            # State: Start time - Change start time of event.
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 4:
-                query.edit_message_text(text=receive_translation("event_alteration_change_hours", user_language),
-                                        reply_markup=Event.event_keyboard_hours(
-                                            callback_prefix="event_change_{}_hours_".format(event_id)))
-                UserEventAlterationMachine.set_state_of_user(user_id, 41)
-
-            # State: Ping times - Change ping times of event.
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 5:
-                query.edit_message_text(text=receive_translation("event_creation_ping_times_header", user_language),
-                                        reply_markup=Event.event_keyboard_ping_times(
-                                            user_language, callback_prefix="event_change_{}".format(event_id),
-                                            states=EventHandler.events_in_alteration[user_id]["old"]["ping_times"]))
-                UserEventAlterationMachine.set_state_of_user(user_id, 51)
-
-            # State: Day - Change day of event.
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 6:
-                query.edit_message_text(text=receive_translation("event_creation_day", user_language),
-                                        reply_markup=Event.event_keyboard_day(
-                                            user_language, callback_prefix="event_change_{}_".format(event_id)))
-                UserEventAlterationMachine.set_state_of_user(user_id, 16)
-
-            # State: Alter event type
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 13:
-                EventHandler.events_in_alteration[user_id]['new']['event_type'] = int(query.data.split('_')[-1][0])
-                UserEventAlterationMachine.set_state_of_user(user_id, 99)
-                query.edit_message_text(text=receive_translation("event_alteration_change_decision", user_language),
-                                        reply_markup=Event.event_keyboard_alteration_change_start(
-                                            user_language, "event_change_{}".format(event_id)))
-
-            # State: Alter event day
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 16:
-                EventHandler.events_in_alteration[user_id]['new']['day'] = int(query.data.split('_')[-1][1])
-                UserEventAlterationMachine.set_state_of_user(user_id, 99)
-                query.edit_message_text(text=receive_translation("event_alteration_change_decision", user_language),
-                                        reply_markup=Event.event_keyboard_alteration_change_start(
-                                            user_language, "event_change_{}".format(event_id)))
-
-            # State: Alter event hours
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 41:
-                EventHandler.events_in_alteration[user_id]['new']['event_time'] = \
-                    "{}:{}".format(query.data.split('_')[-1][1:],
-                                   EventHandler.events_in_alteration[user_id]['new']['event_time'].split(':')[1])
-                UserEventAlterationMachine.set_state_of_user(user_id, 42)
-                query.edit_message_text(text=receive_translation("event_alteration_change_minutes", user_language),
-                                        reply_markup=Event.event_keyboard_minutes(
-                                            callback_prefix="event_change_{}_minutes_".format(event_id)))
-
-            # State: Alter event minutes
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 42:
-                EventHandler.events_in_alteration[user_id]['new']['event_time'] = \
-                    "{}:{}".format(EventHandler.events_in_alteration[user_id]['new']['event_time'].split(':')[0],
-                                   query.data.split('_')[-1][1:])
-                UserEventAlterationMachine.set_state_of_user(user_id, 99)
-                query.edit_message_text(text=receive_translation("event_alteration_change_decision", user_language),
-                                        reply_markup=Event.event_keyboard_alteration_change_start(
-                                            user_language, "event_change_{}".format(event_id)))
-
-            # State: Alter ping times - trigger chance on ping time
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 51:
-                toggle_data = query.data.split('_')[-1]
-                if toggle_data == 'done':
-                    UserEventAlterationMachine.set_state_of_user(user_id, 99)
-                    query.edit_message_text(text=receive_translation("event_alteration_change_decision", user_language),
-                                            reply_markup=Event.event_keyboard_alteration_change_start(
-                                                user_language, "event_change_{}".format(event_id)))
-                else:
-                    EventHandler.events_in_alteration[user_id]["new"]["ping_times"][toggle_data] = \
-                        not EventHandler.events_in_alteration[user_id]["new"]["ping_times"][toggle_data]
-                    query.edit_message_text(text=receive_translation("event_creation_ping_times_header", user_language),
-                                            reply_markup=Event.event_keyboard_ping_times(
-                                                user_language, callback_prefix="event_change_{}".format(event_id),
-                                                states=EventHandler.events_in_alteration[user_id]["new"]["ping_times"]))
-
-            # State: Done - Save changes and delete temporary object.
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == -1:
-                event_dict = EventHandler.events_in_alteration[user_id]["new"]
-                event = Event(event_dict['title'], DayEnum(int(event_dict['day'])), event_dict['content'],
-                              EventType(int(event_dict['event_type'])), event_dict['event_time'],
-                              event_dict['ping_times'], start_ping_done=event_dict['start_ping_done'])
-                event.uuid = event_id
-                DatabaseController.save_event_data_user(user_id, event)
-                query.edit_message_text(text=receive_translation("event_alteration_change_done", user_language))
-                EventHandler.events_in_alteration.pop(user_id)
-                UserEventAlterationMachine.set_state_of_user(user_id, 0)
-
-        elif query.data.startswith("event_delete"):
-
-            # State: Initial - request confirmation from user
-            if UserEventAlterationMachine.receive_state_of_user(user_id) == 0:
-
-                message = receive_translation("event_alteration_delete_request_confirmation", user_language)
-                message += "\n"
+        user = context.request_context.sender
+        logger.debug("data: %s | state: %s", callback,
+                     lazy(UserEventAlterationMachine.receive_state_of_user, user.user_id))
 
-                event_data = DatabaseController.read_event_of_user(user_id, event_id)
-                event = Event(event_data['title'], DayEnum(event_data['day']), event_data['content'],
-                              EventType(event_data['event_type']), event_data['event_time'])
+        trigger, argument = EventHandler._alteration_trigger(callback)
+        UserEventAlterationMachine.machine.dispatch(user.user_id, trigger, user, update, callback.event_id, argument)
 
-                message += event.pretty_print_formatting(user_language)
+    @staticmethod
+    def alteration_callback_guard(update, context, callback):
+        """Checks whether the callback belongs to the current step of an event alteration.
+        Returns:
+            bool: False if the callback is stale.
+        """
+        trigger, _ = EventHandler._alteration_trigger(callback)
+        user_id = context.request_context.sender.user_id
+        if trigger is None or not UserEventAlterationMachine.machine.accepts(user_id, trigger):
+            return False
+        return EventHandler.event_callback_guard(update, context, callback)
 
-                query.edit_message_text(text=message, reply_markup=Event.event_keyboard_confirmation(
-                    user_language, "event_delete_{}".format(event_id)), parse_mode=ParseMode.MARKDOWN_V2)
+    @staticmethod
+    def event_callback_guard(update, context, callback):
+        """Checks whether the event of the callback still exists, the buttons of deleted events stay in the chat.
+        Returns:
+            bool or str: True if the event exists, else the text the query is answered with.
+        """
+        user = context.request_context.sender
+        if callback.event_id is None or user.read_event(callback.event_id) is not None:
+            return True
+        return receive_translation("event_not_found", user.language)
 
-                UserEventAlterationMachine.set_state_of_user(user_id, 101)
+    @staticmethod
+    def _alteration_trigger(callback):
+        """Determines the trigger of the event alteration callback.
+        Args:
+            callback (CallbackData): Parsed callback data of the query.
+        Returns:
+            tuple: Name of the trigger and its argument. The trigger is None if the data is unknown.
+        """
+        arguments = callback.arguments
+
+        if callback.action == "delete":
+            if arguments:
+                return "confirm", arguments[0]
+            return "delete", None
+        if not arguments:
+            return "open", None
+        if len(arguments) == 1 and arguments[0] in ALTERATION_CHOICES:
+            return "choice", arguments[0]
+        if arguments[0] == "type":
+            return "type", arguments[-1][0]
+        if arguments[0] in ("hours", "minutes"):
+            return arguments[0], arguments[-1][1:]
+        if arguments[0] == "ping":
+            return "ping_times", arguments[-1]
+        if arguments[0].startswith("d"):
+            return "day", arguments[0][1:]
+        return None, None
+
+    @staticmethod
+    def event_silence(update, context, callback):
+        """Silences all upcoming pings of the event. Silencing is possible at any time and not part of the
+        alteration dialog.
+        """
+        user = context.request_context.sender
+        event_id = callback.event_id
+
+        event = [event for event in user.events if event.uuid == event_id][0]
+
+        # For regularly events the ping times have to be marked as to be refreshed
+        if event.event_type == EventType.REGULARLY:
+            for ping_time in event.ping_times:
+                if event.ping_times[ping_time]:
+                    event.ping_times_to_refresh[ping_time] = True
+
+        event.ping_times = DEFAULT_PING_STATES.copy()
+        user.save_event(event)
+        update.callback_query.edit_message_text(text=receive_translation("event_silenced", user.language))
+        UserEventAlterationMachine.set_state_of_user(user.user_id, AlterationStates.INITIAL)
 
-            elif UserEventAlterationMachine.receive_state_of_user(user_id) == 101:
+    @staticmethod
+    def daily_digest_page(update, context, callback):
+        """Shows another page of the daily digest. The page is rendered from the current events of the day."""
+        arguments = callback.arguments
+        if len(arguments) != 2 or not all(argument.isdigit() for argument in arguments):
+            return
+        day, page = int(arguments[0]), int(arguments[1])
+        user = context.request_context.user
+
+        # The events with a date of the latest occurrence of the day
+        today = to_wall_time(clock.now(), user.timezone).date()
+        date = today - timedelta(days=(today.weekday() - day) % 7)
+        events = EventChecker.daily_digest_events(user.events, day, date.isoformat())
+        if not events:
+            update.callback_query.edit_message_text(text=receive_translation("no_events", user.language))
+            return
+        page = min(page, Event.digest_pages(events) - 1)
+        try:
+            update.callback_query.edit_message_text(
+                text=EventChecker.build_digest_message(user.language, events, page),
+                parse_mode=ParseMode.MARKDOWN_V2,
+                reply_markup=Event.event_keyboard_digest(events, user.language, day, page))
+        except BadRequest as error:
+            # The current page was requested again and nothing changed since it was rendered
+            if "not modified" not in str(error):
+                raise
 
-                if query.data.split('_')[-1] == 'yes':
-                    DatabaseController.delete_event_of_user(user_id, event_id)
-                    query.edit_message_text(text=receive_translation("event_alteration_delete_confirmed",
-                                                                     user_language))
-                elif query.data.split('_')[-1] == 'no':
-                    query.edit_message_text(text=receive_translation("event_alteration_delete_aborted", user_language))
+    @staticmethod
+    def _show_change_decision(user_language, update, event_id):
+        """Shows the options of the event change to the user."""
+        update.callback_query.edit_message_text(
+            text=receive_translation("event_alteration_change_decision", user_language),
+            reply_markup=Event.event_keyboard_alteration_change_start(user_language,
+                                                                      "event_change_{}".format(event_id)))
+        return AlterationStates.PARSE_CHOICE
 
-                UserEventAlterationMachine.set_state_of_user(user_id, 0)
+    @staticmethod
+    def _alteration_open(user, update, event_id, argument):
+        """Initial - return options to the user."""
+        old_event = dict(user.read_event(event_id))
+        old_event['id'] = event_id
+        EventHandler.events_in_alteration[user.user_id] = {'old': old_event, 'new': old_event.copy()}
+        return EventHandler._show_change_decision(user.language, update, event_id)
+
+    @staticmethod
+    def _alteration_choice(user, update, event_id, choice):
+        """Choice - Check which button the user clicked after change was started."""
+        return ALTERATION_CHOICES[choice]
+
+    @staticmethod
+    def _alteration_request_name(user, update, event_id, argument):
+        """Name - Change name of event."""
+        update.callback_query.edit_message_text(text=receive_translation("event_alteration_change_name",
+                                                                         user.language))
+        return AlterationStates.ALTER_NAME_REPLY
+
+    @staticmethod
+    def _alteration_request_content(user, update, event_id, argument):
+        """Content - Change content of event."""
+        update.callback_query.edit_message_text(text=receive_translation("event_alteration_change_content",
+                                                                         user.language))
+        return AlterationStates.ALTER_CONTENT_REPLY
+
+    @staticmethod
+    def _alteration_request_type(user, update, event_id, argument):
+        """Type - Change type of event."""
+        update.callback_query.edit_message_text(
+            text=receive_translation("event_alteration_change_type", user.language),
+            reply_markup=Event.event_keyboard_type(user.language,
+                                                   callback_prefix="event_change_{}_type_".format(event_id)))
+        return AlterationStates.ALTER_TYPE_REPLY
+
+    @staticmethod
+    def _alteration_request_hours(user, update, event_id, argument):
+        """Start time - Change start time of event."""
+        update.callback_query.edit_message_text(
+            text=receive_translation("event_alteration_change_hours", user.language),
+            reply_markup=Event.event_keyboard_hours(callback_prefix="event_change_{}_hours_".format(event_id)))
+        return AlterationStates.ALTER_START_TIME_HOURS
+
+    @staticmethod
+    def _alteration_request_ping_times(user, update, event_id, argument):
+        """Ping times - Change ping times of event."""
+        update.callback_query.edit_message_text(
+            text=receive_translation("event_creation_ping_times_header", user.language),
+            reply_markup=Event.event_keyboard_ping_times(
+                user.language, callback_prefix="event_change_{}".format(event_id),
+                states=EventHandler.events_in_alteration[user.user_id]["old"]["ping_times"]))
+        return AlterationStates.ALTER_PING_TIMES_SELECT
+
+    @staticmethod
+    def _alteration_request_day(user, update, event_id, argument):
+        """Day - Change day of event."""
+        update.callback_query.edit_message_text(
+            text=receive_translation("event_creation_day", user.language),
+            reply_markup=Event.event_keyboard_day(user.language,
+                                                  callback_prefix="event_change_{}_".format(event_id)))
+        return AlterationStates.ALTER_DAY_REPLY
+
+    @staticmethod
+    def _alteration_type(user, update, event_id, event_type):
+        """Alter event type."""
+        EventHandler.events_in_alteration[user.user_id]['new']['event_type'] = int(event_type)
+        return EventHandler._show_change_decision(user.language, update, event_id)
+
+    @staticmethod
+    def _alteration_day(user, update, event_id, day):
+        """Alter event day."""
+        EventHandler.events_in_alteration[user.user_id]['new']['day'] = int(day)
+        return EventHandler._show_change_decision(user.language, update, event_id)
+
+    @staticmethod
+    def _alteration_hours(user, update, event_id, hours):
+        """Alter event hours."""
+        new_event = EventHandler.events_in_alteration[user.user_id]['new']
+        new_event['event_time'] = "{}:{}".format(hours, new_event['event_time'].split(':')[1])
+        update.callback_query.edit_message_text(
+            text=receive_translation("event_alteration_change_minutes", user.language),
+            reply_markup=Event.event_keyboard_minutes(callback_prefix="event_change_{}_minutes_".format(event_id)))
+        return AlterationStates.ALTER_START_TIME_MINUTES
+
+    @staticmethod
+    def _alteration_minutes(user, update, event_id, minutes):
+        """Alter event minutes."""
+        new_event = EventHandler.events_in_alteration[user.user_id]['new']
+        new_event['event_time'] = "{}:{}".format(new_event['event_time'].split(':')[0], minutes)
+        return EventHandler._show_change_decision(user.language, update, event_id)
+
+    @staticmethod
+    def _alteration_ping_times(user, update, event_id, ping_time):
+        """Alter ping times - trigger chance on ping time."""
+        if ping_time == 'done':
+            return EventHandler._show_change_decision(user.language, update, event_id)
+
+        ping_states = EventHandler.events_in_alteration[user.user_id]["new"]["ping_times"]
+        ping_states[ping_time] = not ping_states[ping_time]
+        update.callback_query.edit_message_text(
+            text=receive_translation("event_creation_ping_times_header", user.language),
+            reply_markup=Event.event_keyboard_ping_times(user.language,
+                                                         callback_prefix="event_change_{}".format(event_id),
+                                                         states=ping_states))
+        return None
+
+    @staticmethod
+    def _alteration_done(user, update, event_id, argument):
+        """Done - Save changes and delete temporary object."""
+        event_in_alteration = EventHandler.events_in_alteration.pop(user.user_id)
+        event_dict = event_in_alteration["new"]
+        event = Event(event_dict['title'], DayEnum(int(event_dict['day'])), event_dict['content'],
+                      EventType(int(event_dict['event_type'])), event_dict['event_time'],
+                      event_dict['ping_times'], start_ping_done=event_dict['start_ping_done'])
+        event.uuid = event_id
+        event.calendar_uid = event_dict.get('calendar_uid')
+        event.timezone = user.timezone
+        if event.event_type == EventType.SINGLE:
+            # Keep the date unless the day changed or the event did not have one
+            event.date = event_dict.get('date')
+            if not event.date or Event.start_of(event.date, event.event_time).weekday() != event.day.value:
+                event.date = Event.next_date(event.day, event.event_time, user.timezone)
+        else:
+            # Keep the rule unless the day changed, the next occurrence follows the changed start time
+            if event_dict.get('recurrence') and event_dict['day'] == event_in_alteration['old']['day']:
+                event.recurrence = Recurrence.from_dict(event_dict['recurrence'])
+            else:
+                event.recurrence = Recurrence(WEEKLY, weekdays=[event.day.value],
+                                              start=to_wall_time(clock.now(), user.timezone).date())
+            event.ping_times_to_refresh = event_dict.get('ping_times_to_refresh', {})
+            if not event.advance(clock.now()):
+                event.recurrence = None
+        user.save_event(event)
+        update.callback_query.edit_message_text(text=receive_translation("event_alteration_change_done",
+                                                                         user.language))
+        return AlterationStates.INITIAL
+
+    @staticmethod
+    def _alteration_delete(user, update, event_id, argument):
+        """Initial - request confirmation from user."""
+        message = receive_translation("event_alteration_delete_request_confirmation", user.language)
+        message += "\n"
+
+        event_data = user.read_event(event_id)
+        event = Event(event_data['title'], DayEnum(event_data['day']), event_data['content'],
+                      EventType(event_data['event_type']), event_data['event_time'], date=event_data.get('date'))
+        if event_data.get('recurrence'):
+            event.recurrence = Recurrence.from_dict(event_data['recurrence'])
+
+        message += event.pretty_print_formatting(user.language)
+
+        update.callback_query.edit_message_text(text=message, reply_markup=Event.event_keyboard_confirmation(
+            user.language, "event_delete_{}".format(event_id)), parse_mode=ParseMode.MARKDOWN_V2)
+        return AlterationStates.DELETE_CONFIRMATION
+
+    @staticmethod
+    def _alteration_confirm_delete(user, update, event_id, answer):
+        """Deletes the event if the user confirmed the deletion."""
+        if answer == 'yes':
+            user.delete_event(event_id)
+            update.callback_query.edit_message_text(text=receive_translation("event_alteration_delete_confirmed",
+                                                                             user.language))
+        elif answer == 'no':
+            update.callback_query.edit_message_text(text=receive_translation("event_alteration_delete_aborted",
+                                                                             user.language))
+        return AlterationStates.INITIAL
 
     @staticmethod
     def event_alteration_handle_reply(update, context):
-        """Handles the replies of the event alteration."""
-        user_id = update.message.from_user.id
-        user_language = DatabaseController.load_selected_language(user_id)
+        """Handles the replies of the event alteration.
+        Returns:
+            bool: True if the reply was part of the event alteration.
+        """
+        user = context.request_context.sender
+        return UserEventAlterationMachine.machine.dispatch(user.user_id, TRIGGER_TEXT, user, update, None,
+                                                           update.message.text)
 
-        state = UserEventAlterationMachine.receive_state_of_user(user_id)
+    @staticmethod
+    def _alteration_name(user, update, event_id, text):
+        """Alter name."""
+        return EventHandler._alteration_text(user, 'title', text)
 
-        bot = BotControl.get_bot()
-        logging.info(EventHandler.events_in_alteration[user_id]['old'])
-        event_suffix = "{}".format(EventHandler.events_in_alteration[user_id]['old']['id'])
-
-        # State: Alter name
-        if state == 11:
-            title = replace_reserved_characters(update.message.text)
-            EventHandler.events_in_alteration[user_id]['new']['title'] = title
-            UserEventAlterationMachine.set_state_of_user(user_id, 99)
-            bot.send_message(user_id, text=receive_translation("event_alteration_change_decision", user_language),
-                             reply_markup=Event.event_keyboard_alteration_change_start(user_language,
-                                                                                       "event_change_{}".format(
-                                                                                           event_suffix)))
-
-        # State: Alter content
-        elif state == 12:
-            content = replace_reserved_characters(update.message.text)
-            EventHandler.events_in_alteration[user_id]['new']['content'] = content
-            UserEventAlterationMachine.set_state_of_user(user_id, 99)
-            bot.send_message(user_id, text=receive_translation("event_alteration_change_decision", user_language),
-                             reply_markup=Event.event_keyboard_alteration_change_start(user_language,
-                                                                                       "event_change_{}".format(
-                                                                                           event_suffix)))
+    @staticmethod
+    def _alteration_content(user, update, event_id, text):
+        """Alter content."""
+        return EventHandler._alteration_text(user, 'content', text)
+
+    @staticmethod
+    def _alteration_text(user, field, text):
+        """Saves the text reply into the given field of the event in alteration and shows the options again."""
+        event_in_alteration = EventHandler.events_in_alteration.get(user.user_id)
+        if event_in_alteration is None:
+            return AlterationStates.INITIAL
+
+        event_in_alteration['new'][field] = replace_reserved_characters(text)
+
+        event_suffix = "{}".format(event_in_alteration['old']['id'])
+        BotControl.get_bot().send_message(
+            user.user_id, text=receive_translation("event_alteration_change_decision", user.language),
+            reply_markup=Event.event_keyboard_alteration_change_start(user.language,
+                                                                      "event_change_{}".format(event_suffix)))
+        return AlterationStates.PARSE_CHOICE
+
+
+def _build_creation_machine(machine):
+    """Declares the states and transitions of the event creation dialog.
+    Args:
+        machine (StateMachine): Machine of the event creation.
+    """
+    machine.add_transition(CreationStates.STARTED, TRIGGER_TEXT, EventHandler._creation_text)
+    machine.add_transition(CreationStates.STARTED, "event_type", EventHandler._creation_event_type)
+    machine.add_entry_action(CreationStates.DAY, EventHandler._creation_request_day)
+    machine.add_transition(CreationStates.DAY, "day", EventHandler._creation_day)
+    machine.add_transition(CreationStates.DAY, TRIGGER_TEXT, EventHandler._creation_date)
+    machine.add_entry_action(CreationStates.HOURS, EventHandler._creation_request_hours)
+    machine.add_transition(CreationStates.HOURS, "hours", EventHandler._creation_hours)
+    machine.add_entry_action(CreationStates.MINUTES, EventHandler._creation_request_minutes)
+    machine.add_transition(CreationStates.MINUTES, "minutes", EventHandler._creation_minutes)
+    machine.add_entry_action(CreationStates.PING_TIMES_START, EventHandler._creation_request_ping_times)
+    machine.add_transition(CreationStates.PING_TIMES_SELECT, "ping_times", EventHandler._creation_ping_times)
+    machine.add_entry_action(CreationStates.DONE, EventHandler._creation_done)
+    machine.compile()
+
+
+def _build_alteration_machine(machine):
+    """Declares the states and transitions of the event alteration dialog.
+    Args:
+        machine (StateMachine): Machine of the event alteration.
+    """
+    machine.add_transition(AlterationStates.INITIAL, "open", EventHandler._alteration_open)
+    machine.add_transition(AlterationStates.PARSE_CHOICE, "choice", EventHandler._alteration_choice)
+
+    machine.add_entry_action(AlterationStates.ALTER_NAME, EventHandler._alteration_request_name)
+    machine.add_transition(AlterationStates.ALTER_NAME_REPLY, TRIGGER_TEXT, EventHandler._alteration_name)
+    machine.add_entry_action(AlterationStates.ALTER_CONTENT, EventHandler._alteration_request_content)
+    machine.add_transition(AlterationStates.ALTER_CONTENT_REPLY, TRIGGER_TEXT, EventHandler._alteration_content)
+    machine.add_entry_action(AlterationStates.ALTER_TYPE, EventHandler._alteration_request_type)
+    machine.add_transition(AlterationStates.ALTER_TYPE_REPLY, "type", EventHandler._alteration_type)
+    machine.add_entry_action(AlterationStates.ALTER_DAY, EventHandler._alteration_request_day)
+    machine.add_transition(AlterationStates.ALTER_DAY_REPLY, "day", EventHandler._alteration_day)
+    machine.add_entry_action(AlterationStates.ALTER_START_TIME, EventHandler._alteration_request_hours)
+    machine.add_transition(AlterationStates.ALTER_START_TIME_HOURS, "hours", EventHandler._alteration_hours)
+    machine.add_transition(AlterationStates.ALTER_START_TIME_MINUTES, "minutes", EventHandler._alteration_minutes)
+    machine.add_entry_action(AlterationStates.ALTER_PING_TIMES, EventHandler._alteration_request_ping_times)
+    machine.add_transition(AlterationStates.ALTER_PING_TIMES_SELECT, "ping_times",
+                           EventHandler._alteration_ping_times)
+    machine.add_entry_action(AlterationStates.DONE, EventHandler._alteration_done)
+
+    machine.add_transition(AlterationStates.INITIAL, "delete", EventHandler._alteration_delete)
+    machine.add_transition(AlterationStates.DELETE_CONFIRMATION, "confirm", EventHandler._alteration_confirm_delete)
+    machine.compile()
+
+
+_build_creation_machine(UserEventCreationMachine.machine)
+_build_alteration_machine(UserEventAlterationMachine.machine)
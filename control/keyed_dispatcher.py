@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+"""Dispatcher that processes updates of different chats in parallel while keeping the order inside a chat."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import logging
+import queue
+import threading
+from collections import deque
+
+from telegram import Update
+from telegram.ext import CommandHandler, Dispatcher
+
+from control.database_controller import DatabaseController
+from utils.profiler import profiler
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class KeyedExecutor:
+    """Thread pool that runs tasks with the same key strictly one after another in submission order, while tasks
+    with different keys run in parallel.
+
+    Every key with pending tasks is inside the ready queue at most once. The worker that takes a key runs exactly one
+    of its tasks and puts the key back to the end of the ready queue if there are more, so one busy key can not
+    starve the others. If ``max_pending`` is set, ``submit`` blocks while that many tasks are unfinished, which passes
+    the back pressure on to whoever produces the tasks.
+    """
+
+    def __init__(self, workers, name="keyed", max_pending=None):
+        """Constructor.
+        Args:
+            workers (int): Amount of worker threads.
+            name (str, optional): Prefix of the thread names.
+            max_pending (int, optional): Maximum amount of unfinished tasks. Unbounded by default.
+        """
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._pending = {}
+        self._pending_count = 0
+        self.max_pending = max_pending
+        self._ready = queue.Queue()
+        self._stopped = False
+
+        self._threads = [threading.Thread(target=self._work, name="{}_worker_{}".format(name, index), daemon=True)
+                         for index in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def pending_count(self):
+        """Returns the amount of tasks that are not finished yet."""
+        with self._lock:
+            return self._pending_count
+
+    def submit(self, key, function, *args):
+        """Schedules the function for execution after all previously submitted tasks of the same key.
+        Args:
+            key (object): Key the task is serialised by.
+            function (callable): Function that should be executed.
+            *args: Arguments of the function.
+        """
+        with self._lock:
+            while self.max_pending and self._pending_count >= self.max_pending and not self._stopped:
+                self._not_full.wait()
+            if self._stopped:
+                raise RuntimeError("Executor was already shut down")
+            self._pending_count += 1
+            tasks = self._pending.get(key)
+            if tasks is None:
+                self._pending[key] = deque([(function, args)])
+                self._ready.put(key)
+            else:
+                tasks.append((function, args))
+
+    def join(self):
+        """Blocks until all submitted tasks are finished."""
+        with self._idle:
+            while self._pending:
+                self._idle.wait()
+
+    def shutdown(self, wait=True):
+        """Stops accepting tasks and stops the workers.
+        Args:
+            wait (bool, optional): Indicates whether the pending tasks are finished before the workers stop.
+        """
+        with self._lock:
+            self._stopped = True
+            self._not_full.notify_all()
+        if wait:
+            self.join()
+        for _ in self._threads:
+            self._ready.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        """Thread target of the workers."""
+        while True:
+            key = self._ready.get()
+            if key is _STOP:
+                return
+
+            with self._lock:
+                function, args = self._pending[key].popleft()
+            try:
+                function(*args)
+            except Exception:
+                logger.exception("Task of %s failed", key)
+
+            with self._lock:
+                self._pending_count -= 1
+                self._not_full.notify()
+                if self._pending[key]:
+                    self._ready.put(key)
+                else:
+                    del self._pending[key]
+                    if not self._pending:
+                        self._idle.notify_all()
+
+
+class KeyedDispatcher(Dispatcher):
+    """Dispatcher that hands every update to a KeyedExecutor keyed by its chat.
+
+    Updates of the same chat are processed one after another in the order they arrived and while holding the
+    DatabaseController lock of the chat, so the dialog state and the files of a user stay consistent. Updates of
+    different chats are processed in parallel by ``update_workers`` threads.
+    """
+
+    def __init__(self, *args, update_workers=1, max_pending_updates=None, **kwargs):
+        """Constructor.
+        Args:
+            *args: Arguments of the Dispatcher.
+            update_workers (int, optional): Amount of threads processing updates.
+            max_pending_updates (int, optional): Maximum amount of updates that are handed to the workers but not
+                processed yet. Further updates stay inside the update queue.
+            **kwargs: Keyword arguments of the Dispatcher.
+        """
+        super().__init__(*args, **kwargs)
+        self.executor = KeyedExecutor(update_workers, name="update", max_pending=max_pending_updates)
+
+    @staticmethod
+    def update_key(update):
+        """Returns the key updates are serialised by.
+        Args:
+            update (object): Update that should be processed.
+        Returns:
+            int: ID of the chat or the user of the update. None if there is neither.
+        """
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+        return None
+
+    @staticmethod
+    def handler_name(handler):
+        """Returns the name of a handler as it was registered.
+        Args:
+            handler (telegram.ext.Handler): Registered handler.
+        Returns:
+            str: The command of command handlers, the name of the callback otherwise.
+        """
+        if isinstance(handler, CommandHandler):
+            return "/{}".format(handler.command[0])
+        return getattr(handler.callback, "__qualname__", repr(handler.callback))
+
+    def matching_handler_name(self, update):
+        """Returns the name of the first handler outside of the middleware groups that handles the update.
+        Args:
+            update (object): Update that should be processed.
+        Returns:
+            str: Name of the handler or "unhandled".
+        """
+        for group in self.groups:
+            if group < 0:
+                continue
+            for handler in self.handlers[group]:
+                check = handler.check_update(update)
+                if check is not None and check is not False:
+                    return self.handler_name(handler)
+        return "unhandled"
+
+    def process_update(self, update):
+        """Schedules the processing of the update behind all earlier updates of the same chat."""
+        key = self.update_key(update)
+        self.executor.submit(key, self._process_update_of_key, key, update)
+
+    def _process_update_of_key(self, key, update):
+        """Processes the update while holding the lock of its chat."""
+        if key is None:
+            self._profiled_process_update(update)
+            return
+        with DatabaseController.user_lock(key):
+            self._profiled_process_update(update)
+
+    def _profiled_process_update(self, update):
+        """Processes the update, profiled by the name of its handler while profiling is requested."""
+        profiler.profile("update", lambda: "handler:{}".format(self.matching_handler_name(update)),
+                         Dispatcher.process_update, self, update)
+
+    def stop(self):
+        """Stops the dispatcher after all accepted updates were processed."""
+        super().stop()
+        self.executor.shutdown(wait=True)
@@ -7,89 +7,241 @@
 # Author: Daniel Bebber <daniel.bebber@gmx.de>
 # ----------------------------------------------
 import logging
+import signal
+import threading
 
-from telegram.ext import CommandHandler, MessageHandler, Filters, CallbackQueryHandler
+from telegram import Update
+from telegram.ext import CommandHandler, MessageHandler, Filters, CallbackQueryHandler, TypeHandler
 
 from control.bot_control import BotControl
+from control.calendar_feed_server import CalendarFeedServer
+from control.calendar_importer import CalendarImporter
+from control.callback_router import CallbackRouter
 from control.configurator import Configurator
 from control.database_controller import DatabaseController
 from control.event_checker import EventChecker
 from control.event_handler import EventHandler
-from models.user import User
-from state_machines.user_event_alteration_machine import UserEventAlterationMachine
-from state_machines.user_event_creation_machine import UserEventCreationMachine
+from control.request_context import RequestContext
+from control.update_recorder import UpdateRecorder
+from control.webhook_server import WebhookServer
 from utils.localization_manager import receive_translation
-
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    level=logging.INFO)
+from utils.logging_utils import setup_logging
+from utils.metrics import MetricsServer, registry
+from utils.path_utils import RECORDING_PATH
+from utils.profiler import profiler
+from utils.session_store import SessionStore
 
 logger = logging.getLogger(__name__)
 
 db_controller = DatabaseController()
 
+callback_router = CallbackRouter()
+callback_router.add_route("config_start", Configurator.handle_configuration_dialog)
+callback_router.add_route("config_select", Configurator.handle_configuration_change)
+callback_router.add_route("event_alteration", EventHandler.event_alteration_start)
+callback_router.add_route("event_change", EventHandler.event_alteration_perform, EventHandler.alteration_callback_guard)
+callback_router.add_route("event_delete", EventHandler.event_alteration_perform, EventHandler.alteration_callback_guard)
+callback_router.add_route("event_silence", EventHandler.event_silence, EventHandler.event_callback_guard)
+callback_router.add_route("digest_page", EventHandler.daily_digest_page)
+callback_router.add_route("event_creation", EventHandler.add_new_event_query_handler,
+                          EventHandler.creation_callback_guard)
+
 
 # Define a few command handlers. These usually take the two arguments update and
 # context. Error handlers also receive the raised TelegramError object in error.
 def start(update, context):
     """Send a message when the command /start is issued."""
-    user = User.resolve_user(update)
+    user = context.request_context.user
     update.message.reply_text(
         receive_translation("greeting", user.language).format(USERNAME=user.telegram_user.first_name))
 
 
 def help_command(update, context):
     """Send a message when the command /help is issued."""
-    user = User.resolve_user(update)
+    user = context.request_context.user
     update.message.reply_markdown_v2(receive_translation("help", user.language))
 
 
 def parse_input(update, context):
-    """Echo the user message."""
-    user = User.resolve_user(update)
-    if UserEventCreationMachine.receive_state_of_user(user.user_id) == 1:
-        if user.user_id in EventHandler.events_in_creation.keys() and not EventHandler.events_in_creation[user.user_id]:
-            EventHandler.add_new_event_title(update, context)
-        elif EventHandler.events_in_creation[user.user_id]["title"]:
-            EventHandler.add_new_event_content(update, context)
-    elif UserEventAlterationMachine.receive_state_of_user(user.user_id) > 10:
-        EventHandler.event_alteration_handle_reply(update, context)
-    else:
+    """Passes the user message to the dialog the user is in or echoes it."""
+    if EventHandler.add_new_event_reply(update, context):
+        return
+    if EventHandler.event_alteration_handle_reply(update, context):
+        return
+    user = context.request_context.user
+    update.message.reply_text(receive_translation("confused_echo", user.language))
+
+
+def profile_command(update, context):
+    """Starts profiling when an admin issues /profile [updates] [cycles]."""
+    profiling_configuration = DatabaseController.configuration['configuration_values'].get('profiling', {})
+    user = context.request_context.user
+    # Like unknown commands the command is ignored for everybody else
+    if update.effective_user.id not in profiling_configuration.get('admins', []):
+        logger.warning("User %s is not allowed to start profiling", update.effective_user.id)
+        return
+
+    try:
+        updates = int(context.args[0]) if context.args else profiling_configuration.get('updates', 100)
+        cycles = int(context.args[1]) if len(context.args) > 1 else profiling_configuration.get('cycles', 1)
+    except ValueError:
         update.message.reply_text(receive_translation("confused_echo", user.language))
-
-
-def main():
-    """Start the bot."""
-    # Get the dispatcher to register handlers
-    updater = BotControl.setup_bot()
-
-    dp = updater.dispatcher
+        return
+
+    session = profiler.request(updates, cycles)
+    if session is None:
+        update.message.reply_text(receive_translation("profiling_running", user.language))
+        return
+    update.message.reply_text(receive_translation("profiling_started", user.language).format(
+        UPDATES=updates, CYCLES=cycles, PATH=session.directory))
+
+
+def archive_inactive_users(context):
+    """Archives the users that are inactive for longer than configured, runs as a job of the job queue."""
+    archived = DatabaseController.archive_inactive_users(context.job.context * 86400)
+    if archived:
+        logger.info("Archived %s inactive users", len(archived))
+
+
+def setup_profiling(profiling_configuration):
+    """Configures the profiler and starts it on SIGUSR1.
+    Args:
+        profiling_configuration (dict): Profiling section of the configuration.
+    """
+    profiler.configure(path=profiling_configuration.get('path'), memory=profiling_configuration.get('memory', True),
+                       sample_interval=profiling_configuration.get('sample_interval', 0.005))
+
+    def on_signal(signum, frame):
+        # The handler interrupts the main thread, which may hold the lock of the profiler
+        threading.Thread(target=profiler.request, name="profiler_request", daemon=True,
+                         args=(profiling_configuration.get('updates', 100),
+                               profiling_configuration.get('cycles', 1))).start()
+
+    # Not available on Windows
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, on_signal)
+
+
+def setup_shutdown():
+    """Stops the bot on SIGTERM like on Ctrl-C. SIGTERM is how services are stopped, the cleanup of main saves the
+    dialogs in progress then.
+    """
+    def on_signal(signum, frame):
+        logger.info("Received signal %s, stopping", signum)
+        # Raised inside the main thread, which runs the event checker
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, on_signal)
+
+
+def register_handlers(dp):
+    """Registers all handlers of the bot.
+    Args:
+        dp (telegram.ext.Dispatcher): Dispatcher the handlers are added to.
+    """
+    # Resolve the user of every update once before any other handler runs
+    dp.add_handler(TypeHandler(Update, RequestContext.middleware), group=-1)
 
     # on different commands - answer in Telegram
     dp.add_handler(CommandHandler("start", start))
     dp.add_handler(CommandHandler("help", help_command))
     dp.add_handler(CommandHandler("config", Configurator.start_configuration_dialog))
+    dp.add_handler(CommandHandler("timezone", Configurator.handle_timezone_command))
     dp.add_handler(CommandHandler("new_event", EventHandler.add_new_event))
     dp.add_handler(CommandHandler("list_events", EventHandler.list_all_events_of_user))
-    dp.add_handler(CallbackQueryHandler(Configurator.handle_configuration_dialog, pattern="config_start_[_a-zA-Z]*"))
-    dp.add_handler(CallbackQueryHandler(Configurator.handle_configuration_change, pattern="config_select_[_a-zA-Z]*"))
-    dp.add_handler(CallbackQueryHandler(EventHandler.event_alteration_start, pattern="event_alteration_[a-zA-Z]*"))
-    dp.add_handler(CallbackQueryHandler(EventHandler.event_alteration_perform,
-                                        pattern="event_(delete|change|silence)_[0-9a-zA-Z]+"))
-    dp.add_handler(CallbackQueryHandler(EventHandler.add_new_event_query_handler))
+    dp.add_handler(CommandHandler("profile", profile_command))
+    dp.add_handler(CallbackQueryHandler(callback_router.dispatch_query))
+    dp.add_handler(MessageHandler(Filters.document.file_extension("ics") | Filters.document.mime_type("text/calendar"),
+                                  CalendarImporter.handle_document))
 
     # on noncommand i.e message - echo the message on Telegram
     dp.add_handler(MessageHandler(Filters.text & ~Filters.command, parse_input))
 
+
+def main():
+    """Start the bot."""
+    configuration_values = DatabaseController.configuration['configuration_values']
+    setup_logging(configuration_values.get('logging'))
+
+    # Get the dispatcher to register handlers
+    updater = BotControl.setup_bot(update_workers=configuration_values.get('update_workers', 1),
+                                   update_queue_size=configuration_values.get('update_queue_size', 0),
+                                   base_url=configuration_values.get('bot_api', {}).get('base_url'))
+
+    # Restore the dialogs that were in progress before the last shutdown
+    SessionStore.configure_all(configuration_values['session_store'])
+
+    dp = updater.dispatcher
+
+    metrics_configuration = configuration_values.get('metrics', {})
+    metrics_server = None
+    if metrics_configuration.get('enabled'):
+        registry.gauge("updates_pending", "Updates handed to the workers that are not processed yet.").set_function(
+            lambda: dp.executor.pending_count)
+        registry.gauge("updates_queued", "Updates waiting inside the update queue.").set_function(
+            dp.update_queue.qsize)
+        metrics_server = MetricsServer(listen=metrics_configuration['listen'], port=metrics_configuration['port'])
+        metrics_server.start()
+
+    register_handlers(dp)
+    setup_profiling(configuration_values.get('profiling', {}))
+    setup_shutdown()
+
+    recorder_configuration = configuration_values.get('update_recorder', {})
+    update_recorder = None
+    if recorder_configuration.get('enabled'):
+        update_recorder = UpdateRecorder(recorder_configuration['path'] or RECORDING_PATH)
+        dp.add_handler(TypeHandler(Update, update_recorder.record), group=-2)
+
+    feed_configuration = configuration_values.get('calendar_feed', {})
+    calendar_feed_server = None
+    if feed_configuration.get('enabled'):
+        calendar_feed_server = CalendarFeedServer(listen=feed_configuration['listen'], port=feed_configuration['port'],
+                                                  url=feed_configuration['url'], secret=feed_configuration['secret'],
+                                                  max_size=feed_configuration['max_size'])
+        dp.add_handler(CommandHandler("calendar_feed", calendar_feed_server.handle_command))
+        calendar_feed_server.start()
+
     # Start the Bot
-    updater.start_polling()
+    webhook_configuration = configuration_values.get('webhook', {})
+    webhook_server = None
+    if webhook_configuration.get('enabled'):
+        webhook_server = WebhookServer(dp, listen=webhook_configuration['listen'], port=webhook_configuration['port'],
+                                       secret_path=webhook_configuration['secret_path'],
+                                       max_body_size=webhook_configuration['max_body_size'])
+        webhook_server.start(webhook_configuration['url'])
+    else:
+        updater.start_polling()
 
-    event_checker = EventChecker()
-    event_checker.check_events()
+    inactive_configuration = configuration_values['inactive_users']
+    updater.job_queue.run_repeating(archive_inactive_users, interval=inactive_configuration['compaction_interval'],
+                                    first=inactive_configuration['compaction_interval'],
+                                    context=inactive_configuration['archive_after_days'])
+    # Only started together with the polling
+    updater.job_queue.start()
 
-    # Run the bot until you press Ctrl-C or the process receives SIGINT,
-    # SIGTERM or SIGABRT. This should be used most of the time, since
-    # start_polling() is non-blocking and will stop the bot gracefully.
-    updater.idle()
+    event_checker = EventChecker()
+    try:
+        event_checker.check_events()
+
+        # Run the bot until you press Ctrl-C or the process receives SIGINT,
+        # SIGTERM or SIGABRT. This should be used most of the time, since
+        # start_polling() is non-blocking and will stop the bot gracefully.
+        updater.idle()
+    finally:
+        # No job may run while the bot shuts down, e.g. archive users whose dialogs are saved afterwards
+        updater.job_queue.stop()
+        # Finish the updates that were already accepted before the dialogs are saved
+        if webhook_server:
+            webhook_server.stop()
+        updater.stop()
+        SessionStore.save_all()
+        if update_recorder:
+            update_recorder.close()
+        if metrics_server:
+            metrics_server.stop()
+        if calendar_feed_server:
+            calendar_feed_server.stop()
 
 
 if __name__ == '__main__':
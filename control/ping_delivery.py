@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+"""Delivery of the pings of a checker pass spread over a window."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+from collections import namedtuple
+from datetime import timedelta
+
+from utils import clock
+
+# Priority classes of pings, the first one is sent first.
+PRIORITY_CLASSES = ("start", "reminder", "early")
+# Pings per second a pass is sent with if the window allows it, Telegram allows about 30 messages per second.
+DEFAULT_RATE = 20
+# Seconds every class of ping may be sent after its due time at most, unless it is already later.
+DEFAULT_LATENESS = {"start": 15, "reminder": 60, "early": 120}
+
+PendingPing = namedtuple("PendingPing", ["priority_class", "due_time", "function", "args", "kwargs"])
+
+
+class PingDelivery:
+    """Collects the pings of a checker pass and sends them spread over a window instead of all at once.
+
+    Most events start on the hour or half hour, so their pings become due in the same few minutes. The pings are
+    sent with the configured rate, a spike that would take longer than the window at that rate is compressed into
+    the window. The pings are ordered by their priority class and their due time and get their slots in that order,
+    so start pings are sent first. No ping is delayed past its due time plus the lateness of its class. Pings that
+    are already later than that are sent right away.
+    """
+
+    def __init__(self, window=0, rate=DEFAULT_RATE, lateness=None):
+        """Constructor.
+        Args:
+            window (float, optional): Seconds the pings of a pass are spread over at most. Sent at once if 0.
+            rate (float, optional): Pings per second that are sent if the window allows it.
+            lateness (dict, optional): Seconds every priority class may be sent after its due time.
+        """
+        self.window = window
+        self.rate = rate
+        self.lateness = dict(DEFAULT_LATENESS, **(lateness or {}))
+        self.pending = []
+
+    def schedule(self, priority_class, due_time, function, *args, **kwargs):
+        """Adds a ping to the current pass.
+        Args:
+            priority_class (str): One of PRIORITY_CLASSES.
+            due_time (datetime): Time the ping should be sent at. None if unknown.
+            function (callable): Sends the ping.
+            args: Arguments of the function.
+            kwargs: Keyword arguments of the function.
+        """
+        self.pending.append(PendingPing(priority_class, due_time, function, args, kwargs))
+
+    def plan(self, start):
+        """Assigns a send time to every pending ping.
+        Args:
+            start (datetime): Time the delivery starts.
+        Returns:
+            list of 'tuple': Send time and ping, sorted by the send time.
+        """
+        pings = sorted(self.pending, key=lambda ping: (PRIORITY_CLASSES.index(ping.priority_class),
+                                                       ping.due_time or start))
+        step = timedelta(seconds=min(self.window / len(pings), 1 / self.rate)) if pings else timedelta()
+        planned = []
+        for slot, ping in enumerate(pings):
+            send_time = start + step * slot
+            if ping.due_time is not None:
+                send_time = min(send_time, ping.due_time + timedelta(seconds=self.lateness[ping.priority_class]))
+            planned.append((max(start, send_time), ping))
+        # Stable, so pings with the same send time keep their priority order
+        planned.sort(key=lambda entry: entry[0])
+        return planned
+
+    def deliver(self):
+        """Sends all pending pings at their planned times.
+        Returns:
+            float: Seconds the delivery took.
+        """
+        start = clock.now()
+        planned, self.pending = self.plan(start), []
+        for send_time, ping in planned:
+            delay = (send_time - clock.now()).total_seconds()
+            if delay > 0:
+                clock.sleep(delay)
+            ping.function(*ping.args, **ping.kwargs)
+        return (clock.now() - start).total_seconds()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+"""Context of a single update that is shared by all handlers processing it."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+from control.database_controller import DatabaseController
+from models.user import User
+
+
+class RequestContext:
+    """Holds the users of an update. It is created once per update by the middleware and passed to every handler via
+    ``context.request_context``. Everything is loaded lazily so updates that never need the user data cost nothing.
+    """
+
+    def __init__(self, update):
+        """Constructor.
+        Args:
+            update (telegram.Update): Update that is processed.
+        """
+        self.update = update
+        self.user = None
+        self.sender = None
+
+        telegram_user = update.effective_user
+        if telegram_user is None:
+            return
+
+        self.sender = User(telegram_user.id, telegram_user)
+
+        chat = update.effective_chat
+        if chat is not None and chat.type == "group":
+            self.user = User(chat.id, telegram_user)
+        else:
+            self.user = self.sender
+
+    @property
+    def user_id(self):
+        """Returns the ID of the user or group chat the update belongs to."""
+        return self.user.user_id
+
+    @property
+    def language(self):
+        """Returns the language of the user or group chat the update belongs to."""
+        return self.user.language
+
+    def reactivate(self):
+        """Reactivates the users of the update if they were marked as inactive, they can be reached again."""
+        for user in {self.user, self.sender} - {None}:
+            DatabaseController.reactivate_user(user.user_id)
+
+    @staticmethod
+    def middleware(update, context):
+        """Creates the context of the update before any other handler runs."""
+        context.request_context = RequestContext(update)
+        context.request_context.reactivate()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+"""Recorder that writes the incoming updates anonymised to a log so real traffic can be replayed as benchmark."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Objects inside an update that describe a user or a chat
+ENTITY_KEYS = {"from", "chat", "user", "sender_chat"}
+# Fields of users and chats that identify a person
+NAME_KEYS = {"first_name", "last_name", "username", "title"}
+# Fields containing text written by a user or shown to a user
+TEXT_KEYS = {"text", "caption"}
+# Flags of messages that are only sent if they are set, they are dropped if unset to keep the log compact
+OPTIONAL_FLAGS = {"delete_chat_photo", "group_chat_created", "supergroup_chat_created", "channel_chat_created"}
+FLUSH_INTERVAL = 100
+
+
+def open_recording(path, mode):
+    """Opens a recording, files ending with .gz are compressed.
+    Args:
+        path (str): Path of the recording.
+        mode (str): "r", "w" or "a".
+    Returns:
+        file: Text file of the recording.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_recording(path):
+    """Reads the updates of a recording.
+    Args:
+        path (str): Path of the recording.
+    Returns:
+        list of 'tuple': Seconds since the start of the recording and the update as sent by Telegram, ordered by
+            time.
+    """
+    records = []
+    with open_recording(path, "r") as recording_file:
+        for line in recording_file:
+            if line.strip():
+                record = json.loads(line)
+                records.append((record["time"], record["update"]))
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+def mask_text(text):
+    """Replaces every letter of the text by "x". Commands, digits, punctuation and the length of the text are kept,
+    so times typed into a dialog stay valid and the offsets of message entities still match.
+    Args:
+        text (str): Text written by a user.
+    Returns:
+        str: Masked text.
+    """
+    command = ""
+    if text.startswith("/"):
+        command, separator, text = text.partition(" ")
+        command += separator
+    return command + "".join("x" if character.isalpha() else character for character in text)
+
+
+class UpdateRecorder:
+    """Writes commands, text messages and callback queries as one JSON object per line together with the seconds
+    since the recording started. Other updates are skipped.
+
+    The updates are anonymised before they are written: user and chat IDs are replaced by pseudonyms that are stable
+    inside one recording but cannot be mapped back because the key is never stored, names are replaced and the
+    letters of all texts are masked.
+    """
+
+    def __init__(self, path):
+        """Constructor.
+        Args:
+            path (str): File the updates are appended to, compressed if it ends with .gz.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open_recording(path, "a")
+        self._key = secrets.token_bytes(32)
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def pseudonym(self, identifier):
+        """Returns the pseudonym of a user or chat ID, the sign of group chat IDs is kept.
+        Args:
+            identifier (int): ID of the user or chat.
+        Returns:
+            int: Pseudonym of the ID.
+        """
+        digest = hmac.new(self._key, str(abs(identifier)).encode(), hashlib.sha256).hexdigest()
+        pseudonym = int(digest[:12], 16) % 10 ** 12 + 1
+        return -pseudonym if identifier < 0 else pseudonym
+
+    def anonymise(self, data):
+        """Returns an anonymised copy of the data of an update without empty lists and unset flags.
+        Args:
+            data (dict): Part of an update as sent by Telegram.
+        Returns:
+            dict: Anonymised copy.
+        """
+        anonymised = {}
+        for key, value in data.items():
+            if value == [] or (value is False and key in OPTIONAL_FLAGS):
+                continue
+            if key in ENTITY_KEYS and isinstance(value, dict):
+                value = self.anonymise(value)
+                if isinstance(value.get("id"), int):
+                    value["id"] = self.pseudonym(value["id"])
+                for name_key in NAME_KEYS & value.keys():
+                    value[name_key] = "user" if name_key != "title" else "chat"
+            elif key in TEXT_KEYS and isinstance(value, str):
+                value = mask_text(value)
+            else:
+                value = self._anonymise_value(value)
+            anonymised[key] = value
+        return anonymised
+
+    def _anonymise_value(self, value):
+        """Anonymises the objects inside nested lists like keyboards."""
+        if isinstance(value, dict):
+            return self.anonymise(value)
+        if isinstance(value, list):
+            return [self._anonymise_value(item) for item in value]
+        return value
+
+    def record(self, update, context):
+        """Handler that records the update. Registered in a group before all other handlers."""
+        if not ((update.message and update.message.text) or update.callback_query):
+            return
+
+        line = json.dumps({"time": round(time.monotonic() - self._start, 3),
+                           "update": self.anonymise(update.to_dict())}, separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self.recorded += 1
+            if self.recorded % FLUSH_INTERVAL == 0:
+                self._file.flush()
+
+    def close(self):
+        """Writes the remaining updates and closes the recording."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        logger.info("Recorded %s updates to %s", self.recorded, self.path)
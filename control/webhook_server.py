@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+"""Embedded HTTP server that receives the updates of the bot via webhook."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import hmac
+import json
+import logging
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Full
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BODY_SIZE = 1024 * 1024
+
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    """Handles the POST requests Telegram sends to the webhook."""
+
+    # Telegram reuses its connections to the webhook
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        """Validates the request and puts the contained update into the update queue."""
+        webhook = self.server.webhook
+
+        if not hmac.compare_digest(self.path.encode(), webhook.path.encode()):
+            webhook.count("rejected_path")
+            self._respond(404, close=True)
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            webhook.count("invalid")
+            self._respond(411, close=True)
+            return
+        if length > webhook.max_body_size:
+            webhook.count("invalid")
+            self._respond(413, close=True)
+            return
+
+        try:
+            update = Update.de_json(json.loads(self.rfile.read(length)), webhook.bot)
+        except (ValueError, TypeError, KeyError):
+            webhook.count("invalid")
+            self._respond(400)
+            return
+
+        try:
+            webhook.update_queue.put_nowait(update)
+        except Full:
+            # Telegram retries the delivery later, so nothing is lost while the bot is overloaded
+            webhook.count("rejected_full")
+            self._respond(503, {"Retry-After": "1"})
+            return
+
+        webhook.count("accepted")
+        self._respond(200)
+
+    def _respond(self, status, headers=None, close=False):
+        """Sends an empty response.
+        Args:
+            status (int): HTTP status code.
+            headers (dict, optional): Additional headers of the response.
+            close (bool, optional): Closes the connection, needed if the body of the request was not read.
+        """
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if close:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        """Logs the requests with the logger of the module instead of stderr."""
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class WebhookServer:
+    """Receives updates via HTTP and feeds them into the update queue of the dispatcher.
+
+    The update queue of the dispatcher is bounded, requests that find it full are answered with 503 so Telegram
+    delivers them again later. Only requests to the secret path are accepted, it is generated on every start unless
+    it is configured.
+    """
+
+    def __init__(self, dispatcher, listen="127.0.0.1", port=8443, secret_path="",
+                 max_body_size=DEFAULT_MAX_BODY_SIZE):
+        """Constructor.
+        Args:
+            dispatcher (telegram.ext.Dispatcher): Dispatcher that processes the received updates.
+            listen (str, optional): Address the server listens on.
+            port (int, optional): Port the server listens on. 0 selects a free port.
+            secret_path (str, optional): Path the updates are sent to. Generated if empty.
+            max_body_size (int, optional): Maximum size of a request in bytes.
+        """
+        self.dispatcher = dispatcher
+        self.bot = dispatcher.bot
+        self.update_queue = dispatcher.update_queue
+        self.secret_path = secret_path or secrets.token_urlsafe(32)
+        self.path = "/{}".format(self.secret_path)
+        self.max_body_size = max_body_size
+
+        self.counters = {"accepted": 0, "rejected_full": 0, "rejected_path": 0, "invalid": 0}
+        self.lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((listen, port), WebhookRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.webhook = self
+        self.threads = []
+
+    @property
+    def port(self):
+        """Returns the port the server is bound to."""
+        return self.httpd.server_address[1]
+
+    def count(self, counter):
+        """Increments the given request counter.
+        Args:
+            counter (str): Name of the counter.
+        """
+        with self.lock:
+            self.counters[counter] += 1
+
+    def stats(self):
+        """Returns the request counters and the amount of queued updates.
+        Returns:
+            dict: Contains the request counters and the size of the update queue.
+        """
+        with self.lock:
+            stats = dict(self.counters)
+        stats["queued"] = self.update_queue.qsize()
+        return stats
+
+    def start(self, url=None):
+        """Starts the dispatcher and the server and registers the webhook at Telegram.
+        Args:
+            url (str, optional): Public base URL of the server. The webhook is not registered if it is not given.
+        """
+        for name, target in (("dispatcher", self.dispatcher.start), ("webhook", self.httpd.serve_forever)):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+        if url:
+            self.bot.set_webhook("{}{}".format(url.rstrip("/"), self.path))
+        logger.info("Webhook server listening on %s:%s", *self.httpd.server_address[:2])
+
+    def stop(self):
+        """Stops accepting updates and waits until all received updates are processed."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        # The dispatcher only stops once its queue is empty and waits for its workers
+        self.dispatcher.stop()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        logger.info("Webhook server stopped %s", self.stats())
@@ -11,9 +11,6 @@ from enum import Enum
 
 from utils.localization_manager import receive_translation
 
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    level=logging.INFO)
-
 logger = logging.getLogger(__name__)
 
 
@@ -33,7 +30,7 @@ class Day:
         Returns:
 
         """
-        logger.info("Add event called with %s for %s %s", event, self.user, self.day)
+        logger.debug("Add event called with %s for %s %s", event, self.user, self.day)
         return True
 
 
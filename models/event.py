@@ -12,7 +12,10 @@ from enum import Enum
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from models.day import DayEnum
+from models.recurrence import WEEKLY, Recurrence
+from utils import clock
 from utils.localization_manager import receive_translation
+from utils.time_zones import to_timestamp, to_wall_time
 
 UNCHECKED_CHECKBOX = u'\U00002610'
 CHECKED_CHECKBOX = u'\U00002611'
@@ -21,12 +24,15 @@ CHECKED_CHECKBOX = u'\U00002611'
 DEFAULT_PING_STATES = {"00:30": False, "01:00": False, "02:00": False, "04:00": False, "06:00": False,
                        "12:00": False, "24:00": False}
 
+# Events shown on a single page of the daily digest, more events are paginated.
+DIGEST_PAGE_SIZE = 5
+
 
 class Event:
     """Represents a single event."""
 
     def __init__(self, name, day, content, event_type, event_time, ping_times=None, in_daily_ping=True,
-                 start_ping_done=False):
+                 start_ping_done=False, date=None, recurrence=None, timezone=None):
         """Constructor.
         Args:
             name (str): Name of the event.
@@ -37,8 +43,16 @@ class Event:
             ping_times (list of 'str', optional): Timeslots when the user should be pinged for that event.
             in_daily_ping (bool, optional): Determines whether this event is shown in the daily ping or not.
             start_ping_done (bool, optional): Determines whether the start ping of this event was already done or not.
+            date (str, optional): ISO date of a single event that happens on a certain date instead of the next
+                occurrence of its weekday. The date of the next occurrence for a recurring event.
+            recurrence (Recurrence, optional): Rule of a recurring event.
+            timezone (str, optional): Time zone of the date and the time. The time zone of the server by default.
         """
         self.uuid = None
+        # UID of the calendar entry the event was imported from, identifies the event when it is imported again
+        self.calendar_uid = None
+        # UTC timestamp of the last change of the stored event, set when it is saved
+        self.modified = None
         self.name = name
         self.day = day
         self.content = content
@@ -50,10 +64,20 @@ class Event:
             self.ping_times = {}
         self.in_daily_ping = in_daily_ping
         self.start_ping_done = start_ping_done
+        self.date = date
+        self.recurrence = recurrence
+        self.timezone = timezone
 
         self.ping_times_to_refresh = {}
+        # UTC timestamp of the start and the values it was converted from, it is only converted again on changes
+        self._start_timestamp = None
+        self._start_source = None
 
         self.deleted = False
+        # Time the pending ping should have been sent at, set by the event checker
+        self.due_time = None
+        # Priority class of the pending ping, set by the event checker
+        self.ping_class = None
 
     @property
     def event_time_hours(self):
@@ -65,6 +89,108 @@ class Event:
         """Returns event minutes"""
         return int(self.event_time.split(":")[1])
 
+    @property
+    def start(self):
+        """Returns the start of an event with a date in its time zone, None for events that only have a weekday."""
+        return Event.start_of(self.date, self.event_time)
+
+    @property
+    def start_timestamp(self):
+        """Returns the UTC timestamp of the start of an event with a date, None for events that only have a weekday."""
+        source = (self.date, self.event_time, self.timezone)
+        if source != self._start_source:
+            self._start_timestamp = to_timestamp(self.start, self.timezone) if self.date else None
+            self._start_source = source
+        return self._start_timestamp
+
+    @start_timestamp.setter
+    def start_timestamp(self, timestamp):
+        """Sets the stored UTC timestamp of the start, so it does not have to be converted again."""
+        self._start_timestamp = timestamp
+        self._start_source = (self.date, self.event_time, self.timezone)
+
+    @property
+    def next_fire(self):
+        """Returns the UTC timestamp of the next ping of an event with a date, None if no ping is pending."""
+        start = self.start_timestamp
+        if start is None:
+            return None
+        instants = [start - int(ping_time.split(":")[0]) * 3600 - int(ping_time.split(":")[1]) * 60
+                    for ping_time, enabled in self.ping_times.items() if enabled]
+        if not self.start_ping_done:
+            instants.append(start)
+        return min(instants) if instants else None
+
+    def advance(self, after):
+        """Moves a recurring event to its first occurrence starting after the given time and enables the ping times
+        that were used for the previous occurrence again.
+        Args:
+            after (datetime): Time of the server the next occurrence has to start after.
+        Returns:
+            bool: False if the rule of the event ended.
+        """
+        after_timestamp = after.timestamp()
+        date = self.recurrence.next_occurrence(to_wall_time(after, self.timezone).date())
+        while date is not None and \
+                to_timestamp(Event.start_of(date.isoformat(), self.event_time), self.timezone) <= after_timestamp:
+            date = self.recurrence.next_occurrence(date + timedelta(days=1))
+        if date is None:
+            return False
+
+        self.date = date.isoformat()
+        self.day = DayEnum(date.weekday())
+        for ping_time in self.ping_times_to_refresh:
+            self.ping_times[ping_time] = True
+        self.ping_times_to_refresh = {}
+        self.start_ping_done = False
+        return True
+
+    @staticmethod
+    def start_of(date, event_time):
+        """Returns the start of an event on the given date.
+        Args:
+            date (str): ISO date of the event, None if the event only has a weekday.
+            event_time (str): Time when the event is happening.
+        Returns:
+            datetime: Start of the event or None if there is no date.
+        """
+        if not date:
+            return None
+        return datetime.strptime("{} {}".format(date, event_time), "%Y-%m-%d %H:%M")
+
+    def use_timezone(self, timezone):
+        """Moves the event into the given time zone, its date and time stay the same on the wall clock. Events that
+        only have a weekday get a date, single events the one of their next occurrence and regularly events a
+        weekly rule.
+        Args:
+            timezone (str): Name of the time zone. None for the time zone of the server.
+        """
+        self.timezone = timezone
+        if self.date:
+            return
+        if self.event_type == EventType.SINGLE:
+            self.date = Event.next_date(self.day, self.event_time, timezone)
+        else:
+            self.recurrence = Recurrence(WEEKLY, weekdays=[self.day.value],
+                                         start=to_wall_time(clock.now(), timezone).date())
+            self.advance(clock.now())
+
+    @staticmethod
+    def next_date(day, event_time, timezone=None):
+        """Returns the date of the next occurrence of the weekday at the given time, today if it did not pass yet.
+        Args:
+            day (DayEnum): Weekday of the event.
+            event_time (str): Time when the event is happening.
+            timezone (str, optional): Time zone of the event. The time zone of the server by default.
+        Returns:
+            str: ISO date of the event.
+        """
+        current_time = to_wall_time(clock.now(), timezone)
+        date = current_time.date() + timedelta(days=(day.value - current_time.weekday()) % 7)
+        if Event.start_of(date.isoformat(), event_time) <= current_time:
+            date += timedelta(days=7)
+        return date.isoformat()
+
     @staticmethod
     def event_keyboard_type(user_language, callback_prefix=""):
         """Generates the keyboard for the event types.
@@ -158,6 +284,78 @@ class Event:
                                      callback_data="{}_silence{}".format(callback_prefix, callback_postfix)))
         return InlineKeyboardMarkup(keyboard)
 
+    @staticmethod
+    def event_keyboard_digest(events, user_language, day, page=0):
+        """Generates the keyboard of a page of the daily digest with one row of actions per event and the
+        navigation between the pages if the events do not fit on a single one.
+        Args:
+            events (list of 'Event'): Events of the digest, sorted like in the message.
+            user_language (str): Language that should be used.
+            day (int): Day of the digest.
+            page (int, optional): Page that is shown.
+        Returns:
+            InlineKeyboardMarkup: Generated keyboard.
+        """
+        first = page * DIGEST_PAGE_SIZE
+        keyboard = [Event._event_actions_row(number, event, user_language)
+                    for number, event in enumerate(events[first:first + DIGEST_PAGE_SIZE], start=first + 1)]
+
+        pages = Event.digest_pages(events)
+        if pages > 1:
+            navigation = []
+            if page > 0:
+                navigation.append(InlineKeyboardButton("«", callback_data="digest_page_{}_{}".format(day, page - 1)))
+            navigation.append(InlineKeyboardButton("{}/{}".format(page + 1, pages),
+                                                   callback_data="digest_page_{}_{}".format(day, page)))
+            if page < pages - 1:
+                navigation.append(InlineKeyboardButton("»", callback_data="digest_page_{}_{}".format(day, page + 1)))
+            keyboard.append(navigation)
+        return InlineKeyboardMarkup(keyboard)
+
+    @staticmethod
+    def event_keyboard_actions(events, user_language):
+        """Generates the keyboard of a message about several events with one row of actions per event. Events that
+        were deleted already get no row.
+        Args:
+            events (list of 'Event'): Events of the message, numbered in this order.
+            user_language (str): Language that should be used.
+        Returns:
+            InlineKeyboardMarkup: Generated keyboard.
+        """
+        return InlineKeyboardMarkup([Event._event_actions_row(number, event, user_language)
+                                     for number, event in enumerate(events, start=1) if not event.deleted])
+
+    @staticmethod
+    def _event_actions_row(number, event, user_language):
+        """Generates the row of actions of a numbered event.
+        Args:
+            number (int): Number of the event inside the message.
+            event (Event): Event the actions refer to.
+            user_language (str): Language that should be used.
+        Returns:
+            list of 'InlineKeyboardButton': Buttons to change, delete and mute the event.
+        """
+        postfix = "_{}".format(event.uuid)
+        return [
+            InlineKeyboardButton("{}. {}".format(number, receive_translation("event_alteration_change",
+                                                                             user_language)),
+                                 callback_data="event_change{}".format(postfix)),
+            InlineKeyboardButton(receive_translation("event_alteration_delete", user_language),
+                                 callback_data="event_delete{}".format(postfix)),
+            InlineKeyboardButton(receive_translation("event_alteration_silence", user_language),
+                                 callback_data="event_silence{}".format(postfix))
+        ]
+
+    @staticmethod
+    def digest_pages(events):
+        """Returns the amount of pages the daily digest of the events needs.
+        Args:
+            events (list of 'Event'): Events of the digest.
+        Returns:
+            int: Amount of pages, at least one.
+        """
+        return max(1, -(-len(events) // DIGEST_PAGE_SIZE))
+
     @staticmethod
     def event_keyboard_alteration_action(events, user_language, mode):
         """Generates the event alteration keyboard for the given mode.
@@ -266,10 +464,14 @@ class Event:
         message += "*{}:* {}\n".format(receive_translation("event_content", user_language), self.content)
         message += "*{}:* {}\n".format(receive_translation("event_type", user_language),
                                        self.event_type.receive_type_translation(user_language))
+        if self.date:
+            date_label = "event_next_date" if self.recurrence else "event_date"
+            message += "*{}:* {}\n".format(receive_translation(date_label, user_language),
+                                           self.date.replace("-", "\\-"))
         message += "*{}:* {}\n".format(receive_translation("event_start", user_language), self.event_time)
 
         ping_times_enabled = ""
-        current_time = datetime.now()
+        current_time = clock.now()
         start_time = datetime(current_time.year, current_time.month, current_time.day, self.event_time_hours,
                               self.event_time_minutes)
         for ping_time in self.ping_times:
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+"""Model for recurrence rules of events."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import calendar
+from datetime import date, timedelta
+
+from utils import clock
+
+DAILY = "daily"
+WEEKLY = "weekly"
+MONTHLY = "monthly"
+FREQUENCIES = (DAILY, WEEKLY, MONTHLY)
+
+# Months that are looked at for a monthly rule at most, e.g. the 31st does not exist in every month.
+MAX_MONTHS = 48
+
+
+class Recurrence:
+    """Rule that determines the dates an event happens on.
+
+    Daily and weekly rules are computed arithmetically from the start, monthly rules look at the months of the
+    interval until one contains the day. Exception dates are skipped one by one, so computing the next occurrence
+    takes constant time amortised over the occurrences of an event.
+    """
+
+    def __init__(self, frequency, interval=1, weekdays=None, month_day=None, month_week=None, start=None,
+                 until=None, exceptions=None):
+        """Constructor.
+        Args:
+            frequency (str): One of FREQUENCIES.
+            interval (int, optional): Happens every n days, weeks or months.
+            weekdays (list of 'int', optional): Weekdays of a weekly rule or the weekday of a monthly rule by
+                weekday, Monday is 0.
+            month_day (int, optional): Day of the month of a monthly rule by day.
+            month_week (int, optional): Week of the weekday of a monthly rule by weekday, 1 to 5 or -1 for the last.
+            start (datetime.date, optional): First date of the rule, the intervals are counted from it.
+                Today by default.
+            until (datetime.date, optional): Last date of the rule. Endless by default.
+            exceptions (set of 'str', optional): ISO dates the event does not happen on.
+        """
+        if frequency not in FREQUENCIES:
+            raise ValueError("Unknown frequency: {}".format(frequency))
+        self.frequency = frequency
+        self.interval = max(1, int(interval))
+        self.start = start or clock.now().date()
+        self.weekdays = sorted(set(weekdays)) if weekdays else [self.start.weekday()]
+        self.month_day = month_day
+        self.month_week = month_week
+        if frequency == MONTHLY and month_day is None and month_week is None:
+            self.month_day = self.start.day
+        self.until = until
+        self.exceptions = set(exceptions or ())
+
+    @staticmethod
+    def from_dict(rule):
+        """Creates the rule from its stored representation.
+        Args:
+            rule (dict): Rule as it is stored.
+        Returns:
+            Recurrence: Created rule.
+        """
+        return Recurrence(rule["frequency"], rule.get("interval", 1), rule.get("weekdays"), rule.get("month_day"),
+                          rule.get("month_week"), date.fromisoformat(rule["start"]),
+                          date.fromisoformat(rule["until"]) if rule.get("until") else None,
+                          rule.get("exceptions"))
+
+    def to_dict(self):
+        """Returns the stored representation of the rule.
+        Returns:
+            dict: Rule as it is stored.
+        """
+        rule = {"frequency": self.frequency, "interval": self.interval, "weekdays": self.weekdays,
+                "start": self.start.isoformat()}
+        if self.month_day is not None:
+            rule["month_day"] = self.month_day
+        if self.month_week is not None:
+            rule["month_week"] = self.month_week
+        if self.until:
+            rule["until"] = self.until.isoformat()
+        if self.exceptions:
+            rule["exceptions"] = sorted(self.exceptions)
+        return rule
+
+    def next_occurrence(self, after):
+        """Returns the first date of the rule that is not before the given date.
+        Args:
+            after (datetime.date): Earliest date.
+        Returns:
+            datetime.date: Date of the occurrence or None if the rule ended.
+        """
+        candidate = max(after, self.start)
+        while True:
+            candidate = self._next_candidate(candidate)
+            if candidate is None or (self.until and candidate > self.until):
+                return None
+            if candidate.isoformat() not in self.exceptions:
+                return candidate
+            candidate += timedelta(days=1)
+
+    def occurs_on(self, day):
+        """Checks whether the rule contains the given date.
+        Args:
+            day (datetime.date): Date that should be checked.
+        Returns:
+            bool: True if the event happens on the date.
+        """
+        return self.next_occurrence(day) == day
+
+    def _next_candidate(self, candidate):
+        """Returns the first date of the rule not before the candidate, ignoring the end and the exceptions."""
+        if self.frequency == DAILY:
+            return candidate + timedelta(days=-(candidate - self.start).days % self.interval)
+        if self.frequency == WEEKLY:
+            return self._next_weekly(candidate)
+        return self._next_monthly(candidate)
+
+    def _next_weekly(self, candidate):
+        """Returns the first date of the weekly rule not before the candidate."""
+        first_monday = self.start - timedelta(days=self.start.weekday())
+        week = (candidate - first_monday).days // 7
+        if week % self.interval == 0:
+            for weekday in self.weekdays:
+                if weekday >= candidate.weekday():
+                    return first_monday + timedelta(days=week * 7 + weekday)
+        # Continue with the first weekday of the next week of the interval
+        week += self.interval - week % self.interval
+        return first_monday + timedelta(days=week * 7 + self.weekdays[0])
+
+    def _next_monthly(self, candidate):
+        """Returns the first date of the monthly rule not before the candidate."""
+        month = (candidate.year - self.start.year) * 12 + candidate.month - self.start.month
+        month += -month % self.interval
+        for _ in range(MAX_MONTHS):
+            year, month_of_year = divmod(self.start.year * 12 + self.start.month - 1 + month, 12)
+            day = self._day_of_month(year, month_of_year + 1)
+            if day is not None and day >= candidate:
+                return day
+            month += self.interval
+        return None
+
+    def _day_of_month(self, year, month):
+        """Returns the date of the rule inside the given month or None if the month does not contain it."""
+        days = calendar.monthrange(year, month)[1]
+        if self.month_week is None:
+            return date(year, month, self.month_day) if self.month_day <= days else None
+
+        weekday = self.weekdays[0]
+        if self.month_week > 0:
+            day = 1 + (weekday - date(year, month, 1).weekday()) % 7 + (self.month_week - 1) * 7
+        else:
+            day = days - (date(year, month, days).weekday() - weekday) % 7
+        return date(year, month, day) if day <= days else None
@@ -6,12 +6,16 @@
 # Copyright: Daniel Bebber, 2020
 # Author: Daniel Bebber <daniel.bebber@gmx.de>
 # ----------------------------------------------
-from control.database_controller import DatabaseController
-from models.day import DayEnum
-from models.event import EventType, Event
+from control.database_controller import DEFAULT_DIGEST_TIME, DatabaseController
+from utils.metrics import registry
+
+CACHE_REQUESTS = registry.counter("cache_requests", "Lookups of cached data by cache and result.", ("cache", "result"))
 
 
 class User:
+    """Represents a user or group chat. The config and the events are loaded on first access and kept until the
+    object is discarded, so every file is read at most once during the lifetime of the object.
+    """
 
     def __init__(self, user_id, telegram_user=None):
         """Constructor.
@@ -21,8 +25,10 @@ class User:
         """
         self.telegram_user = telegram_user
         self.user_id = user_id
-        self.user_config = DatabaseController.load_user_config(self.user_id)
-        self.language = self.user_config["language"]
+
+        self._user_config = None
+        self._event_entries = None
+        self._events = None
 
     @staticmethod
     def resolve_user(update):
@@ -32,19 +38,107 @@ class User:
             user = User(update.message.from_user.id, update.message.from_user)
         return user
 
+    @property
+    def user_config(self):
+        """Returns the config of the user."""
+        if self._user_config is None:
+            CACHE_REQUESTS.labels("user_config", "miss").inc()
+            self._user_config = DatabaseController.load_user_config(self.user_id)
+        else:
+            CACHE_REQUESTS.labels("user_config", "hit").inc()
+        return self._user_config
+
+    @property
+    def language(self):
+        """Returns the code of the language the user has selected."""
+        return self.user_config["language"]
+
+    @property
+    def digest_time(self):
+        """Returns the time of the daily ping of the user as "HH:MM"."""
+        return self.user_config.get("digest_time", DEFAULT_DIGEST_TIME)
+
+    @property
+    def timezone(self):
+        """Returns the name of the time zone of the user, None for the time zone of the server."""
+        return self.user_config.get("timezone")
+
+    @property
+    def event_entries(self):
+        """Returns the raw event entries of the user as dict."""
+        if self._event_entries is None:
+            CACHE_REQUESTS.labels("user_events", "miss").inc()
+            self._event_entries = DatabaseController._load_user_event_entry(self.user_id)
+        else:
+            CACHE_REQUESTS.labels("user_events", "hit").inc()
+        return self._event_entries
+
+    @property
+    def events(self):
+        """Returns the events of the user.
+        Returns:
+            list of 'Event': Events of the user.
+        """
+        if self._events is None:
+            self._events = DatabaseController.parse_user_events(self.event_entries)
+        return self._events
+
     def retrieve_all_events(self):
         """Retrieve all events of the user.
         Returns:
-            dict: Contains all events of the user.
+            list of 'Event': Contains all events of the user.
         """
-        event_list = []
+        return self.events
 
-        for event in DatabaseController.load_user_events(self.user_id):
-            name = event["name"]
-            day = DayEnum(event["day"])
-            content = event["content"]
-            event_type = EventType(event["event_type"])
-            ping_time = event["event_time"]
-            event_list.append(Event(name, day, content, event_type, ping_time))
+    def read_event(self, event_id):
+        """Read the event data with the given ID.
+        Args:
+            event_id (str): ID of the event.
+        Returns:
+            dict: Contains all data of the event or None if there is no such event.
+        """
+        return self.event_entries.get(event_id)
 
-        return event_list
+    def save_event(self, event):
+        """Saves the event into the events of the user.
+        Args:
+            event (Event): Event that should be saved.
+        """
+        DatabaseController.save_event_data_user(self.user_id, event, user_event_data=self.event_entries)
+        self._events = None
+
+    def save_events(self, events):
+        """Saves several events into the events of the user with a single write.
+        Args:
+            events (list of 'Event'): Events that should be saved.
+        """
+        DatabaseController.save_events_of_user(self.user_id, events)
+        self._event_entries = None
+        self._events = None
+
+    def delete_event(self, event_id):
+        """Removes the event with the given ID from the events of the user.
+        Args:
+            event_id (str): ID of the event.
+        """
+        DatabaseController.delete_event_of_user(self.user_id, event_id, user_event_data=self.event_entries)
+        self._events = None
+
+    def save_config_value(self, key, value):
+        """Saves a single value inside the config of the user.
+        Args:
+            key (str): Key of the config value.
+            value (object): Value that should be saved.
+        """
+        self.user_config[key] = value
+        DatabaseController._save_user_data(self.user_id, self.user_config)
+
+    def save_timezone(self, timezone):
+        """Saves the time zone of the user and moves all events of the user into it.
+        Args:
+            timezone (str): Name of the time zone.
+        """
+        DatabaseController.save_user_timezone(self.user_id, timezone)
+        self._user_config = None
+        self._event_entries = None
+        self._events = None
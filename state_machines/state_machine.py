@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+"""Table driven state machine engine for the dialogs of the bot."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _state_value(state):
+    """Returns the raw value of a state that is either given as enum member or as value."""
+    return getattr(state, "value", state)
+
+
+class StateMachine:
+    """State machine whose transitions are looked up inside a dispatch table instead of being checked one after
+    another.
+
+    A transition is declared for a state and a trigger. Its handler returns the state the user moves to or None to
+    stay inside the current state. When a state with an entry action is reached the entry action is executed right
+    away and may return a further state, which allows states that only prompt the user and move on.
+    """
+
+    def __init__(self, name, valid_states, store, initial_state):
+        """Constructor.
+        Args:
+            name (str): Name of the state machine.
+            valid_states (EnumMeta): Enum that declares all states of the machine.
+            store (SessionStore): Store that holds the current state of each user.
+            initial_state (Enum): State that users without a session are in.
+        """
+        self.name = name
+        self.valid_states = frozenset(state.value for state in valid_states)
+        self.store = store
+        self.initial_state = _state_value(initial_state)
+
+        self._transitions = {}
+        self._entry_actions = {}
+        self._dispatch_table = None
+        self.timing_hooks = []
+
+    def add_transition(self, state, trigger, handler):
+        """Declares the handler that is called when the trigger occurs inside the given state.
+        Args:
+            state (Enum): State in which the trigger is accepted.
+            trigger (str): Name of the trigger.
+            handler (callable): Performs the transition and returns the next state or None.
+        """
+        self._transitions[(self._validate(state), trigger)] = handler
+        self._dispatch_table = None
+
+    def add_entry_action(self, state, handler):
+        """Declares the handler that is called whenever the given state is entered.
+        Args:
+            state (Enum): State that is entered.
+            handler (callable): Performs the entry action and returns the next state or None.
+        """
+        self._entry_actions[self._validate(state)] = handler
+
+    def add_timing_hook(self, hook):
+        """Registers a hook that is called after every dispatched transition.
+        Args:
+            hook (callable): Receives the machine name, the state, the trigger, the resulting state and the duration
+                of the transition in seconds.
+        """
+        self.timing_hooks.append(hook)
+
+    def compile(self):
+        """Builds the dispatch table. Transitions that are added afterwards trigger a rebuild on the next dispatch."""
+        self._dispatch_table = dict(self._transitions)
+
+    def receive_state(self, key):
+        """Receives the state of the given user.
+        Args:
+            key (int): ID of the user.
+        Returns:
+            int: State the user is currently in.
+        """
+        return self.store.get(key, self.initial_state)
+
+    def set_state(self, key, state):
+        """Sets the state of the given user. Returning to the initial state ends the session of the user.
+        Args:
+            key (int): ID of the user.
+            state (int): State the user should be in.
+        """
+        state = self._validate(state)
+        if state == self.initial_state:
+            self.store.pop(key, None)
+            return
+        self.store[key] = state
+
+    def accepts(self, key, trigger):
+        """Checks whether the trigger is accepted inside the current state of the user.
+        Args:
+            key (int): ID of the user.
+            trigger (str): Name of the trigger.
+        Returns:
+            bool: True if there is a transition for the trigger.
+        """
+        if self._dispatch_table is None:
+            self.compile()
+        return (self.receive_state(key), trigger) in self._dispatch_table
+
+    def dispatch(self, key, trigger, *args):
+        """Performs the transition of the trigger inside the current state of the user.
+        Args:
+            key (int): ID of the user.
+            trigger (str): Name of the trigger.
+            *args: Arguments that are passed to the handlers.
+        Returns:
+            bool: True if a transition was performed. False if the trigger is not accepted inside the current state.
+        """
+        if self._dispatch_table is None:
+            self.compile()
+
+        state = self.receive_state(key)
+        handler = self._dispatch_table.get((state, trigger))
+        if handler is None:
+            return False
+
+        start = time.perf_counter()
+        next_state = handler(*args)
+        while next_state is not None:
+            self.set_state(key, next_state)
+            entry_action = self._entry_actions.get(_state_value(next_state))
+            if entry_action is None:
+                break
+            next_state = entry_action(*args)
+        duration = time.perf_counter() - start
+
+        new_state = self.receive_state(key)
+        logger.debug("%s: %s --%s--> %s in %.6fs", self.name, state, trigger, new_state, duration)
+        for hook in self.timing_hooks:
+            hook(self.name, state, trigger, new_state, duration)
+        return True
+
+    def _validate(self, state):
+        """Returns the value of the state and ensures that it is declared.
+        Args:
+            state (Enum): State that should be validated.
+        Returns:
+            int: Value of the state.
+        """
+        state = _state_value(state)
+        if state not in self.valid_states:
+            raise RuntimeError("Invalid {} state reached".format(self.name.replace("_", " ")))
+        return state
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-"""State machine for event creation of a user."""
+"""State machine for event alteration of a user."""
 
 # ----------------------------------------------
 # Copyright: Daniel Bebber, 2020
@@ -8,37 +8,12 @@
 # ----------------------------------------------
 from enum import Enum
 
-
-class UserEventAlterationMachine:
-
-    state_dict = {}
-
-    @staticmethod
-    def receive_state_of_user(user_id):
-        """Receives the state the user is currently in. If there was no state saved the state is set to 0.
-        Args:
-            user_id (int): ID of the user
-        Returns:
-            int: State the user is currently in.
-        """
-        if not UserEventAlterationMachine.state_dict or not UserEventAlterationMachine.state_dict[user_id]:
-            UserEventAlterationMachine.state_dict[user_id] = 0
-        return UserEventAlterationMachine.state_dict[user_id]
-
-    @staticmethod
-    def set_state_of_user(user_id, state):
-        """Sets the state of the given user.
-        Args:
-            user_id (int): ID of the user.
-            state (int): State the user should be in.
-        """
-        if not ValidStates.has_value(state):
-            raise RuntimeError("Invalid event alteration state reached")
-        UserEventAlterationMachine.state_dict[user_id] = state
+from state_machines.state_machine import StateMachine
+from utils.session_store import SessionStore
 
 
 class ValidStates(Enum):
-    """Contains all valid states for the UserEventCreationMachine."""
+    """Contains all valid states for the UserEventAlterationMachine."""
     DONE = -1
     INITIAL = 0
     ALTER_NAME = 1
@@ -69,4 +44,29 @@ class ValidStates(Enum):
         Returns:
             bool: Indicates the validity of the value.
         """
-        return value in [item.value for item in cls]
+        return value in cls._value2member_map_
+
+
+class UserEventAlterationMachine:
+
+    state_dict = SessionStore("event_alteration_states")
+    machine = StateMachine("event_alteration", ValidStates, state_dict, ValidStates.INITIAL)
+
+    @staticmethod
+    def receive_state_of_user(user_id):
+        """Receives the state the user is currently in. If there is no state saved 0 is returned.
+        Args:
+            user_id (int): ID of the user
+        Returns:
+            int: State the user is currently in.
+        """
+        return UserEventAlterationMachine.machine.receive_state(user_id)
+
+    @staticmethod
+    def set_state_of_user(user_id, state):
+        """Sets the state of the given user.
+        Args:
+            user_id (int): ID of the user.
+            state (int): State the user should be in. Returning to the initial state ends the session of the user.
+        """
+        UserEventAlterationMachine.machine.set_state(user_id, state)
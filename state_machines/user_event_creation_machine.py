@@ -8,42 +8,43 @@
 # ----------------------------------------------
 from enum import Enum
 
+from state_machines.state_machine import StateMachine
+from utils.session_store import SessionStore
+
+
+class ValidStates(Enum):
+    """Contains all valid states for the UserEventCreationMachine."""
+    DONE = -1
+    INITIAL = 0
+    STARTED = 1
+    DAY = 2
+    HOURS = 3
+    MINUTES = 4
+
+    PING_TIMES_START = 10
+    PING_TIMES_SELECT = 11
+
 
 class UserEventCreationMachine:
 
-    state_dict = {}
+    state_dict = SessionStore("event_creation_states")
+    machine = StateMachine("event_creation", ValidStates, state_dict, ValidStates.INITIAL)
 
     @staticmethod
     def receive_state_of_user(user_id):
-        """Receives the state the user is currently in. If there was no state saved the state is set to 0.
+        """Receives the state the user is currently in. If there is no state saved 0 is returned.
         Args:
             user_id (int): ID of the user
         Returns:
             int: State the user is currently in.
         """
-        if not UserEventCreationMachine.state_dict or user_id not in UserEventCreationMachine.state_dict.keys():
-            UserEventCreationMachine.state_dict[user_id] = 0
-        return UserEventCreationMachine.state_dict[user_id]
+        return UserEventCreationMachine.machine.receive_state(user_id)
 
     @staticmethod
     def set_state_of_user(user_id, state):
         """Sets the state of the given user.
         Args:
             user_id (int): ID of the user.
-            state (int): State the user should be in.
+            state (int): State the user should be in. Returning to the initial state ends the session of the user.
         """
-        # TODO: Add check for valid state
-        UserEventCreationMachine.state_dict[user_id] = state
-
-
-class ValidStates(Enum):
-    """Contains all valid states for the UserEventCreationMachine."""
-    DONE = -1
-    INITIAL = 0
-    STARTED = 1
-    DAY = 2
-    HOURS = 3
-    MINUTES = 4
-
-    PING_TIMES_START = 10
-    PING_TIMES_SELECT = 11
+        UserEventCreationMachine.machine.set_state(user_id, state)
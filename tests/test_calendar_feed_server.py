@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+"""Contains tests of the calendar feed server."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import glob
+import http.client
+import os
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from control.calendar_feed_server import CalendarFeed, CalendarFeedServer
+from control.calendar_importer import CalendarImporter
+from control.database_controller import DatabaseController
+from models.day import DayEnum
+from models.event import Event, EventType
+from models.recurrence import MONTHLY, Recurrence
+from utils import clock
+from utils.clock import SimulatedClock
+from utils.icalendar_utils import format_date_time, read_events
+from utils.path_utils import PROJECT_ROOT
+
+TEST_CONFIG = os.path.join(PROJECT_ROOT, "tests", "test_files", "configuration.json")
+TEST_USER_DATA = os.path.join(PROJECT_ROOT, "tests", "test_files", ".data", "user_data")
+
+START = datetime(2021, 3, 1, 9)
+
+
+class TestCalendarFeedServer(unittest.TestCase):
+    """Tests the rendering, the caching and the serving of the calendar feeds."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test."""
+        DatabaseController(config_file=TEST_CONFIG, userdata_path=TEST_USER_DATA)
+
+    def setUp(self):
+        """Set up test."""
+        self.previous_clock = clock.use_clock(SimulatedClock(START))
+        self.user_id = 4711
+        DatabaseController.load_user_config(self.user_id)
+        self.server = CalendarFeedServer(port=0, secret="secret", max_size=2)
+        self.server.start()
+        self.connection = http.client.HTTPConnection("127.0.0.1", self.server.port)
+
+    def tearDown(self):
+        """Tear down test."""
+        self.connection.close()
+        self.server.stop()
+        clock.use_clock(self.previous_clock)
+        for user_data_file in glob.glob("{}/*.json".format(TEST_USER_DATA)):
+            os.remove(user_data_file)
+
+    def _get(self, path, headers=None):
+        """Requests the given path and returns the status, the ETag and the body of the response."""
+        self.connection.request("GET", path, headers=headers or {})
+        response = self.connection.getresponse()
+        return response.status, response.getheader("ETag"), response.read()
+
+    def test_render(self):
+        """Check that the rendered events can be imported again with the same dates, rules and ping times."""
+        single = Event("Dentist, Dr. Smith", DayEnum.FRIDAY, "Bring the\nx-ray", EventType.SINGLE, "15:00",
+                       {"01:00": True, "24:00": False}, date="2021-03-05", timezone="Europe/Berlin")
+        single.uuid = "single"
+        recurring = Event("Rent", DayEnum.FRIDAY, "-", EventType.REGULARLY, "08:00", {}, date="2021-03-26",
+                          recurrence=Recurrence(MONTHLY, weekdays=[4], month_week=-1, start=date(2021, 2, 1),
+                                                until=date(2021, 6, 30), exceptions={"2021-04-30"}),
+                          timezone="America/New_York")
+        recurring.uuid = "recurring"
+        recurring.ping_times_to_refresh = {"00:30": True}
+
+        calendar = CalendarFeed.render([single, recurring])
+        self.assertTrue(all(len(line.encode()) <= 75 for line in calendar.split("\r\n")))
+        entries = list(read_events(calendar.splitlines(keepends=True)))
+        self.assertEqual([entry["UID"][0][1] for entry in entries], ["single@remindeasy", "recurring@remindeasy"])
+        self.assertEqual(entries[0]["DTSTART"][0][1], "20210305T140000Z")
+        self.assertEqual(entries[0]["SUMMARY"][0][1], "Dentist\\, Dr. Smith")
+        # Never saved, so the time of the last modification is unknown
+        self.assertEqual(entries[0]["DTSTAMP"][0][1], "20200101T000000Z")
+        self.assertEqual(entries[1]["RRULE"][0][1], "FREQ=MONTHLY;BYDAY=-1FR;UNTIL=20210701T035959Z")
+        self.assertNotIn("DESCRIPTION", entries[1])
+
+        imported_single = CalendarImporter.event_from_entry(entries[0], "Europe/Berlin")
+        self.assertEqual((imported_single.name, imported_single.content), (single.name, single.content))
+        self.assertEqual((imported_single.date, imported_single.event_time), ("2021-03-05", "15:00"))
+        self.assertTrue(imported_single.ping_times["01:00"])
+
+        imported_recurring = CalendarImporter.event_from_entry(entries[1], "Europe/Berlin")
+        self.assertEqual(imported_recurring.timezone, "America/New_York")
+        self.assertEqual(imported_recurring.recurrence.until, date(2021, 6, 30))
+        self.assertEqual(imported_recurring.recurrence.exceptions, {"2021-04-30"})
+        self.assertTrue(imported_recurring.ping_times["00:30"])
+
+    def test_render_undated(self):
+        """Check that events without a date are rendered as weekly rules that do not depend on the current day."""
+        training = Event("Training", DayEnum.WEDNESDAY, "Gym", EventType.REGULARLY, "18:30", timezone="Europe/Berlin")
+        dentist = Event("Dentist", DayEnum.FRIDAY, "-", EventType.SINGLE, "15:00")
+        calendar = CalendarFeed.render([training, dentist])
+        entries = list(read_events(calendar.splitlines(keepends=True)))
+        self.assertEqual([(entry["DTSTART"][0], entry["RRULE"][0][1]) for entry in entries],
+                         [(({"TZID": "Europe/Berlin"}, "20200108T183000"), "FREQ=WEEKLY;BYDAY=WE"),
+                          (({}, "20200110T150000"), "FREQ=WEEKLY;BYDAY=FR")])
+
+        clock.use_clock(SimulatedClock(START + timedelta(days=3)))
+        self.assertEqual(CalendarFeed.render([training, dentist]), calendar)
+
+    def test_serve_feed(self):
+        """Check that feeds are only served on their signed path and answered without body if the ETag is known."""
+        path = self.server.feed.path(self.user_id)
+        self.assertTrue(self.server.feed_url(self.user_id).endswith(path))
+        self.assertEqual(self._get(path.replace("4711", "4712"))[0], 404)
+        self.assertEqual(self._get("/calendar/{}/{}.ics".format(self.user_id, "0" * 32))[0], 404)
+
+        status, etag, body = self._get(path)
+        self.assertEqual(status, 200)
+        self.assertIn(b"BEGIN:VCALENDAR", body)
+        self.assertEqual(self._get(path, {"If-None-Match": 'W/"other", {}'.format(etag)})[:2], (304, etag))
+
+        # Writing the events of the user invalidates the cached feed
+        event = Event("Dentist", DayEnum.FRIDAY, "-", EventType.SINGLE, "15:00", date="2021-03-05")
+        DatabaseController.save_events_of_user(self.user_id, [event])
+        status, new_etag, body = self._get(path, {"If-None-Match": etag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(new_etag, etag)
+        self.assertIn(b"SUMMARY:Dentist", body)
+        self.assertIn("DTSTAMP:{}".format(format_date_time(CalendarFeed._utc(START.timestamp()), utc=True)).encode(),
+                      body)
+
+    def test_cache(self):
+        """Check that feeds are only rendered again after the events changed and the cache is bounded."""
+        feed = self.server.feed
+        with mock.patch.object(CalendarFeed, "render", wraps=CalendarFeed.render) as render:
+            etag, _ = feed.load(self.user_id)
+            self.assertEqual(feed.load(self.user_id)[0], etag)
+            self.assertEqual(render.call_count, 1)
+
+            DatabaseController.save_events_of_user(self.user_id, [])
+            feed.load(self.user_id)
+            self.assertEqual(render.call_count, 2)
+
+        for user_id in (1, 2):
+            DatabaseController.load_user_config(user_id)
+            feed.load(user_id)
+        self.assertEqual(list(feed.cache), ["1", "2"])
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+"""Contains tests of the import of iCalendar files."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import glob
+import os
+import unittest
+from datetime import date, datetime
+
+from control.calendar_importer import CalendarImporter
+from control.database_controller import DatabaseController
+from models.event import EventType
+from models.recurrence import MONTHLY, WEEKLY
+from models.user import User
+from utils import clock
+from utils.clock import SimulatedClock
+from utils.icalendar_utils import read_events, unescape_text
+from utils.path_utils import PROJECT_ROOT
+from utils.time_zones import to_timestamp
+
+TEST_CONFIG = os.path.join(PROJECT_ROOT, "tests", "test_files", "configuration.json")
+TEST_USER_DATA = os.path.join(PROJECT_ROOT, "tests", "test_files", ".data", "user_data")
+
+# Monday, 1st of March 2021, 09:00 in Berlin
+START = datetime.fromtimestamp(to_timestamp(datetime(2021, 3, 1, 9), "Europe/Berlin"))
+
+CALENDAR = """BEGIN:VCALENDAR\r
+VERSION:2.0\r
+BEGIN:VTIMEZONE\r
+TZID:Europe/Berlin\r
+BEGIN:STANDARD\r
+DTSTART:19701025T030000\r
+END:STANDARD\r
+END:VTIMEZONE\r
+BEGIN:VEVENT\r
+UID:dentist@example.com\r
+SUMMARY:Dentist\\, Dr. Smith\r
+DESCRIPTION:Bring the\\nx-ray\r
+DTSTART:20210305T130000Z\r
+BEGIN:VALARM\r
+TRIGGER:-PT1H\r
+ACTION:DISPLAY\r
+END:VALARM\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:yoga@example.com\r
+SUMMARY:Yoga\r
+DTSTART;TZID=Europe/Berlin:20210101T183000\r
+RRULE:FREQ=WEEKLY;BYDAY=TU,TH\r
+EXDATE;TZID=Europe/Berlin:20210302T183000\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:rent@example.com\r
+SUMMARY:Rent\r
+DTSTART;VALUE=DATE:20210201\r
+RRULE:FREQ=MONTHLY;BYDAY=-1FR;COUNT=3\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:past@example.com\r
+SUMMARY:Past\r
+DTSTART:20200101T100000\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:yearly@example.com\r
+SUMMARY:Conference\r
+DTSTART:20200315T090000\r
+RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=2SU\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:dentist@example.com\r
+SUMMARY:Dentist\\, Dr. Smith\r
+DESCRIPTION:Bring the\\nx-ray\r
+DTSTART:20210305T140000Z\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+
+
+class TestCalendarImport(unittest.TestCase):
+    """Tests the mapping of calendar entries onto events and their import."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test."""
+        DatabaseController(config_file=TEST_CONFIG, userdata_path=TEST_USER_DATA)
+
+    def setUp(self):
+        """Set up test."""
+        self.previous_clock = clock.use_clock(SimulatedClock(START))
+        self.user_id = 4242
+        DatabaseController.load_user_config(self.user_id)
+        DatabaseController.save_user_timezone(self.user_id, "Europe/Berlin")
+
+    def tearDown(self):
+        """Tear down test."""
+        clock.use_clock(self.previous_clock)
+        for user_data_file in glob.glob("{}/*.json".format(TEST_USER_DATA)):
+            os.remove(user_data_file)
+
+    def test_read_events(self):
+        """Check that folded lines are joined and alarms are kept apart from the properties of the event."""
+        entries = list(read_events(["BEGIN:VCALENDAR\r\n", "BEGIN:VEVENT\r\n", "SUMMARY:Long\r\n", "  name\r\n",
+                                    "BEGIN:VALARM\r\n", "TRIGGER:-PT30M\r\n", "END:VALARM\r\n", "END:VEVENT\r\n",
+                                    "END:VCALENDAR\r\n"]))
+        self.assertEqual(entries, [{"SUMMARY": [({}, "Long name")], "VALARM.TRIGGER": [({}, "-PT30M")]}])
+        self.assertEqual(unescape_text("a\\, b\\; c\\\\n\\nd"), "a, b; c\\n\nd")
+
+        with self.assertRaises(ValueError):
+            list(read_events(["SUMMARY:No calendar\r\n"]))
+        with self.assertRaises(ValueError):
+            list(read_events(["BEGIN:VCALENDAR\r\n", "BEGIN:VEVENT\r\n"]))
+
+    def test_import_calendar(self):
+        """Check that entries are mapped onto events, past and duplicate entries are skipped and all events are saved
+        with a single write."""
+        user = User(self.user_id)
+        writes = []
+        save = DatabaseController._save_event_data_user
+        DatabaseController._save_event_data_user = lambda *args: writes.append(args) or save(*args)
+        try:
+            result = CalendarImporter.import_calendar(user, CALENDAR.splitlines(keepends=True))
+        finally:
+            DatabaseController._save_event_data_user = save
+
+        self.assertEqual(result, (4, 0, 2))
+        self.assertEqual(len(writes), 1)
+        events = {event.calendar_uid: event for event in User(self.user_id).events}
+        self.assertEqual(len(events), 4)
+
+        # Single events are moved into the time zone of the user, the later entry with the same UID wins
+        dentist = events["dentist@example.com"]
+        self.assertEqual(dentist.event_type, EventType.SINGLE)
+        self.assertEqual((dentist.date, dentist.event_time, dentist.timezone), ("2021-03-05", "15:00", "Europe/Berlin"))
+        self.assertEqual(dentist.name, "Dentist, Dr. Smith")
+        self.assertEqual(dentist.content, "Bring the\nx-ray")
+        self.assertFalse(dentist.ping_times["01:00"])
+
+        # Recurring events start at their next occurrence that is not excluded
+        yoga = events["yoga@example.com"]
+        self.assertEqual(yoga.event_type, EventType.REGULARLY)
+        self.assertEqual((yoga.recurrence.frequency, yoga.recurrence.weekdays), (WEEKLY, [1, 3]))
+        self.assertEqual((yoga.date, yoga.event_time), ("2021-03-04", "18:30"))
+
+        rent = events["rent@example.com"]
+        self.assertEqual((rent.recurrence.frequency, rent.recurrence.month_week), (MONTHLY, -1))
+        self.assertEqual(rent.recurrence.until, date(2021, 4, 30))
+        self.assertEqual((rent.date, rent.event_time), ("2021-03-26", "00:00"))
+
+        conference = events["yearly@example.com"]
+        self.assertEqual((conference.recurrence.interval, conference.recurrence.month_week), (12, 2))
+        self.assertEqual(conference.date, "2021-03-14")
+
+    def test_import_again(self):
+        """Check that importing a calendar again updates the events that were imported before."""
+        lines = CALENDAR.splitlines(keepends=True)
+        CalendarImporter.import_calendar(User(self.user_id), lines)
+        event_ids = {event.uuid for event in User(self.user_id).events}
+
+        result = CalendarImporter.import_calendar(User(self.user_id), lines)
+        self.assertEqual(result, (0, 4, 2))
+        self.assertEqual({event.uuid for event in User(self.user_id).events}, event_ids)
+
+    def test_alarm(self):
+        """Check that alarms before the start enable the matching ping times."""
+        entry = next(read_events(["BEGIN:VCALENDAR", "BEGIN:VEVENT", "UID:alarm", "DTSTART:20210310T100000",
+                                  "BEGIN:VALARM", "TRIGGER:-PT1H", "END:VALARM", "BEGIN:VALARM", "TRIGGER:-P1D",
+                                  "END:VALARM", "BEGIN:VALARM", "TRIGGER:-PT15M", "END:VALARM", "END:VEVENT",
+                                  "END:VCALENDAR"]))
+        event = CalendarImporter.event_from_entry(entry, None)
+        self.assertEqual({ping_time for ping_time, enabled in event.ping_times.items() if enabled},
+                         {"01:00", "24:00"})
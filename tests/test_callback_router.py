@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""Contains tests of the callback router."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import glob
+import os
+import unittest
+from unittest import mock
+
+from control.callback_router import CallbackData, CallbackRouter
+from control.database_controller import DatabaseController
+from control.event_handler import EventHandler
+from models.user import User
+from utils.localization_manager import DEFAULT_LANGUAGE, receive_translation
+from utils.path_utils import PROJECT_ROOT
+
+TEST_CONFIG = os.path.join(PROJECT_ROOT, "tests", "test_files", "configuration.json")
+TEST_USER_DATA = os.path.join(PROJECT_ROOT, "tests", "test_files", ".data", "user_data")
+
+
+class TestCallbackRouter(unittest.TestCase):
+    """Tests functionality of the callback router."""
+
+    def setUp(self):
+        """Set up test."""
+        self.router = CallbackRouter()
+        self.handled = []
+        self.router.add_route("event", self._handler("event"))
+        self.router.add_route("event_change", self._handler("event_change"),
+                              guard=lambda update, context, callback: False)
+        self.router.add_route("event_delete", self._handler("event_delete"))
+
+    def _handler(self, name):
+        """Creates a handler that records the parsed callback data."""
+        def handler(update, context, callback):
+            self.handled.append((name, callback))
+        return handler
+
+    @staticmethod
+    def _remove_user_data():
+        """Removes the files of the users created by a test."""
+        for user_data_file in glob.glob("{}/*.json".format(TEST_USER_DATA)):
+            os.remove(user_data_file)
+
+    @staticmethod
+    def _update(data):
+        """Creates an update containing a callback query with the given data."""
+        update = mock.MagicMock()
+        update.callback_query.data = data
+        return update
+
+    def test_parse(self):
+        """Check that the different callback data formats are parsed into their parts."""
+        self.assertEqual(CallbackData.parse("event_change_abc123_hours_h7"),
+                         CallbackData("event", "change", "abc123", "hours_h7"))
+        self.assertEqual(CallbackData.parse("event_delete_abc123"), CallbackData("event", "delete", "abc123", None))
+        self.assertEqual(CallbackData.parse("config_select_daily_ping_yes"),
+                         CallbackData("config", "select", None, "daily_ping_yes"))
+        self.assertEqual(CallbackData.parse("event_creation_ping_times_01:00"),
+                         CallbackData("event", "creation", None, "ping_times_01:00"))
+        self.assertEqual(CallbackData.parse("d3"), CallbackData("event", "creation", None, "d3"))
+        self.assertEqual(CallbackData.parse("config_select_daily_ping_yes").arguments, ["daily", "ping", "yes"])
+
+    def test_parse_malformed(self):
+        """Check that malformed callback data is rejected."""
+        for data in ["", "garbage", "event_", "event_change", "event_change_a-b", "x" * 65]:
+            self.assertIsNone(CallbackData.parse(data), data)
+
+    def test_dispatch_longest_prefix(self):
+        """Check that the route with the longest matching prefix handles the callback."""
+        self.router.dispatch_query(self._update("event_delete_abc123_yes"), None)
+        self.router.dispatch_query(self._update("event_alteration_change"), None)
+
+        self.assertEqual([name for name, _ in self.handled], ["event_delete", "event"])
+        self.assertEqual(self.handled[0][1].argument, "yes")
+        self.assertEqual(self.router.stats()["routes"]["event_delete"]["calls"], 1)
+
+    def test_dispatch_rejected(self):
+        """Check that stale and malformed callbacks are answered without calling a handler."""
+        stale_update = self._update("event_change_abc123_name")
+        self.router.dispatch_query(stale_update, None)
+        malformed_update = self._update("garbage")
+        self.router.dispatch_query(malformed_update, None)
+        self.router.dispatch_query(self._update("config_start_language"), None)
+
+        self.assertEqual(self.handled, [])
+        stale_update.callback_query.answer.assert_called_once()
+        malformed_update.callback_query.answer.assert_called_once()
+        stats = self.router.stats()
+        self.assertEqual(stats["routes"]["event_change"]["rejected"], 1)
+        self.assertEqual(stats["malformed"], 1)
+        self.assertEqual(stats["unrouted"], 1)
+
+    def test_dispatch_deleted_event(self):
+        """Check that the buttons of a deleted event are answered with a notice instead of calling the handler."""
+        DatabaseController(config_file=TEST_CONFIG, userdata_path=TEST_USER_DATA)
+        self.addCleanup(self._remove_user_data)
+        context = mock.MagicMock()
+        context.request_context.sender = User(12345)
+        DatabaseController.load_user_config(12345)
+
+        router = CallbackRouter()
+        router.add_route("event_silence", self._handler("event_silence"), EventHandler.event_callback_guard)
+        router.add_route("event_change", self._handler("event_change"), EventHandler.alteration_callback_guard)
+        for data in ("event_silence_abc123", "event_change_abc123"):
+            update = self._update(data)
+            router.dispatch_query(update, context)
+            update.callback_query.answer.assert_called_once_with(
+                text=receive_translation("event_not_found", DEFAULT_LANGUAGE))
+
+        self.assertEqual(self.handled, [])
+        self.assertEqual(router.stats()["routes"]["event_silence"]["rejected"], 1)
@@ -8,12 +8,17 @@
 # ----------------------------------------------
 import glob
 import os
+import shutil
+import threading
 import unittest
 import uuid
+from datetime import datetime, timedelta
 
 from control.database_controller import DatabaseController
 from models.day import DayEnum
 from models.event import EventType, Event
+from utils import clock
+from utils.clock import SimulatedClock
 from utils.localization_manager import DEFAULT_LANGUAGE
 from utils.path_utils import PROJECT_ROOT
 
@@ -36,6 +41,7 @@ class TestDatabase(unittest.TestCase):
         user_data_files = glob.glob("{}/*.json".format(TEST_USER_DATA))
         for user_data_file in user_data_files:
             os.remove(user_data_file)
+        shutil.rmtree(os.path.join(TEST_USER_DATA, "archive"), ignore_errors=True)
 
     def test_load_config(self):
         """Check that configuration values are loaded correctly."""
@@ -168,3 +174,112 @@ class TestDatabase(unittest.TestCase):
         if event_uuid:
             test_event.uuid = event_uuid
         return test_event
+
+    def test_inactive_users(self):
+        """Check that inactive users are skipped, archived after a while and restored when they are reactivated."""
+        DatabaseController(config_file=TEST_CONFIG, userdata_path=TEST_USER_DATA)
+        simulated_clock = SimulatedClock(datetime(2020, 10, 19))
+        previous_clock = clock.use_clock(simulated_clock)
+        try:
+            for user_id in (1, 2):
+                DatabaseController.load_user_config(user_id)
+            event = Event("Training", DayEnum.MONDAY, "Gym", EventType.REGULARLY, "10:00")
+            DatabaseController.save_event_data_user(2, event)
+
+            DatabaseController.mark_user_inactive(2, "blocked")
+            self.assertEqual(DatabaseController.load_active_user_ids(), ["1"])
+            self.assertEqual(DatabaseController.load_digest_users(0), ["1"])
+            self.assertTrue(DatabaseController.is_user_inactive(2))
+            self.assertEqual(DatabaseController.archive_inactive_users(86400), [])
+
+            simulated_clock.advance(timedelta(days=2).total_seconds())
+            self.assertEqual(DatabaseController.archive_inactive_users(86400), ["2"])
+            self.assertEqual(DatabaseController.load_all_user_ids(), ["1"])
+            self.assertTrue(DatabaseController.is_user_inactive(2))
+
+            self.assertFalse(DatabaseController.reactivate_user(1))
+            self.assertTrue(DatabaseController.reactivate_user(2))
+            self.assertFalse(DatabaseController.is_user_inactive(2))
+            self.assertNotIn("inactive", DatabaseController.load_user_config(2))
+            self.assertEqual(DatabaseController.read_event_of_user(2, event.uuid)["title"], "Training")
+            self.assertEqual(DatabaseController.load_digest_users(0), ["1", "2"])
+        finally:
+            clock.use_clock(previous_clock)
+
+    def test_cold_index_under_user_locks(self):
+        """Check that workers holding the locks of their users can build the index at the same time."""
+        user_ids = (1, 2)
+        for user_id in user_ids:
+            DatabaseController.load_user_config(user_id)
+        DatabaseController(config_file=TEST_CONFIG, userdata_path=TEST_USER_DATA)
+        locked = threading.Barrier(len(user_ids))
+        results = {}
+
+        def handle_update(user_id):
+            with DatabaseController.user_lock(user_id):
+                # Both locks are held before the index is built
+                locked.wait(5)
+                results[user_id] = (DatabaseController.is_user_inactive(user_id),
+                                    DatabaseController.load_user_dated_events(user_id))
+
+        threads = [threading.Thread(target=handle_update, args=(user_id,), daemon=True) for user_id in user_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(results, {1: (False, []), 2: (False, [])})
+
+    def test_event_modified(self):
+        """Check that the time of the last modification of an event only changes if the event is changed."""
+        simulated_clock = SimulatedClock(datetime(2020, 10, 19))
+        previous_clock = clock.use_clock(simulated_clock)
+        try:
+            user_id = 12345
+            DatabaseController.load_user_config(user_id)
+            event = Event("Training", DayEnum.MONDAY, "Gym", EventType.REGULARLY, "10:00")
+            DatabaseController.save_event_data_user(user_id, event)
+            created = int(datetime(2020, 10, 19).timestamp())
+            self.assertEqual(event.modified, created)
+
+            simulated_clock.advance(60)
+            event = DatabaseController.load_user_events(user_id)[0]
+            DatabaseController.save_events_of_user(user_id, [event])
+            self.assertEqual(DatabaseController.read_event_of_user(user_id, event.uuid)["modified"], created)
+
+            event.content = "Pool"
+            DatabaseController.save_events_of_user(user_id, [event])
+            self.assertEqual(DatabaseController.load_user_events(user_id)[0].modified, created + 60)
+        finally:
+            clock.use_clock(previous_clock)
+
+    def test_dated_event_index(self):
+        """Check that the events with a date are indexed by their next ping over all users and per user."""
+        DatabaseController(config_file=TEST_CONFIG, userdata_path=TEST_USER_DATA)
+        first = Event("Dentist", DayEnum.WEDNESDAY, "Checkup", EventType.SINGLE, "8:15", date="2020-10-28")
+        second = Event("Party", DayEnum.MONDAY, "Cake", EventType.SINGLE, "20:00", date="2020-10-19")
+        regular = Event("Training", DayEnum.MONDAY, "Gym", EventType.REGULARLY, "10:00")
+        for user_id in (1, 2):
+            DatabaseController.load_user_config(user_id)
+        DatabaseController.save_events_of_user(1, [first, regular])
+        DatabaseController.save_event_data_user(2, second)
+
+        # Built from the files on first use
+        DatabaseController(config_file=TEST_CONFIG, userdata_path=TEST_USER_DATA)
+        self.assertEqual(DatabaseController.load_due_dated_events(datetime(2020, 10, 19, 20)),
+                         {"2": [second.uuid]})
+        self.assertEqual(DatabaseController.load_due_dated_events(datetime(2020, 10, 30)),
+                         {"2": [second.uuid], "1": [first.uuid]})
+        self.assertEqual(DatabaseController.load_user_dated_events(1),
+                         [(datetime(2020, 10, 28, 8, 15).timestamp(), first.uuid)])
+        self.assertEqual(DatabaseController.load_user_events(1)[0].date, "2020-10-28")
+
+        # Moving the event updates the index
+        first.date = "2020-10-18"
+        DatabaseController.save_event_data_user(1, first)
+        self.assertEqual(DatabaseController.load_due_dated_events(datetime(2020, 10, 19)), {"1": [first.uuid]})
+
+        self.assertEqual(DatabaseController.clean_up_past_events(datetime(2020, 10, 20)), 2)
+        self.assertEqual(DatabaseController.load_due_dated_events(datetime(2020, 10, 30)), {})
+        self.assertEqual([event.uuid for event in DatabaseController.load_user_events(1)], [regular.uuid])
+        self.assertEqual(DatabaseController.load_user_events(2), [])
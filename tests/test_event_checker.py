@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+
+"""Contains tests of the event checker."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from benchmarks.fake_bot import FakeBot
+from control.bot_control import BotControl
+from control.database_controller import DatabaseController
+from control.event_checker import CYCLE_SECONDS, EventChecker
+from models.day import DayEnum
+from models.event import Event, EventType
+from models.recurrence import DAILY, Recurrence
+from utils import clock
+from utils.clock import SimulatedClock
+from utils.localization_manager import DEFAULT_LANGUAGE, receive_translation
+from utils.path_utils import PROJECT_ROOT
+from utils.profiler import Profiler
+from utils.time_zones import to_timestamp
+
+TEST_CONFIG = os.path.join(PROJECT_ROOT, "tests", "test_files", "configuration.json")
+TEST_USER_DATA = os.path.join(PROJECT_ROOT, "tests", "test_files", ".data", "user_data")
+
+# A monday
+START = datetime(2020, 10, 19)
+
+
+class TestEventChecker(unittest.TestCase):
+    """Tests the event checker on a simulated clock."""
+
+    def setUp(self):
+        """Set up test."""
+        DatabaseController(config_file=TEST_CONFIG, userdata_path=TEST_USER_DATA)
+        self.previous_clock = clock.use_clock(SimulatedClock(START))
+        self.previous_bot = BotControl.bot
+        self.bot = FakeBot()
+        BotControl.bot = self.bot
+        self.user_id = 12345
+        DatabaseController.load_user_config(self.user_id)
+
+    def tearDown(self):
+        """Tear down test."""
+        clock.use_clock(self.previous_clock)
+        BotControl.bot = self.previous_bot
+        for user_data_file in glob.glob("{}/*.json".format(TEST_USER_DATA)):
+            os.remove(user_data_file)
+
+    def test_regular_event_week(self):
+        """Check that a regular event is pinged before and at its start and is refreshed on the next day."""
+        event = Event("Training", DayEnum.MONDAY, "Gym", EventType.REGULARLY, "10:00", {"00:30": True})
+        DatabaseController.save_event_data_user(self.user_id, event)
+
+        EventChecker().check_events(until=START + timedelta(days=1, hours=12))
+
+        ping_times = [message.time - START for message in self.bot.messages]
+        self.assertEqual(len(ping_times), 2)
+        self.assertTrue(timedelta(hours=9, minutes=30) <= ping_times[0] < timedelta(hours=9, minutes=40))
+        self.assertTrue(timedelta(hours=10) <= ping_times[1] < timedelta(hours=10, minutes=10))
+
+        stored_event = DatabaseController.read_event_of_user(self.user_id, event.uuid)
+        self.assertFalse(stored_event["start_ping_done"])
+        self.assertTrue(stored_event["ping_times"]["00:30"])
+        # Moved onto a weekly rule by the refresh
+        self.assertEqual(stored_event["recurrence"]["weekdays"], [DayEnum.MONDAY.value])
+        self.assertEqual(stored_event["date"], "2020-10-26")
+
+    def test_recurring_event(self):
+        """Check that a recurring event is pinged on every occurrence except the exceptions and moves on."""
+        recurrence = Recurrence(DAILY, 2, start=START.date(), exceptions={"2020-10-21"})
+        event = Event("Training", DayEnum.MONDAY, "Gym", EventType.REGULARLY, "10:00", {"00:30": True},
+                      date="2020-10-19", recurrence=recurrence)
+        DatabaseController.save_event_data_user(self.user_id, event)
+
+        EventChecker().check_events(until=START + timedelta(days=5))
+
+        header = "*{}*".format(receive_translation("event_reminder", DEFAULT_LANGUAGE))
+        ping_times = [message.time for message in self.bot.messages if message.text.startswith(header)]
+        self.assertEqual([(ping_time.day, ping_time.hour, ping_time.minute) for ping_time in ping_times],
+                         [(19, 9, 30), (19, 10, 0), (23, 9, 30), (23, 10, 0)])
+        stored_event = DatabaseController.read_event_of_user(self.user_id, event.uuid)
+        self.assertEqual(stored_event["date"], "2020-10-25")
+        self.assertTrue(stored_event["ping_times"]["00:30"])
+
+    def test_single_event_deleted(self):
+        """Check that a single event is deleted after its start ping."""
+        event = Event("Dentist", DayEnum.MONDAY, "Checkup", EventType.SINGLE, "08:15")
+        DatabaseController.save_event_data_user(self.user_id, event)
+
+        EventChecker().check_events(until=START + timedelta(hours=9))
+
+        self.assertEqual(len(self.bot.messages), 1)
+        self.assertIsNone(DatabaseController.read_event_of_user(self.user_id, event.uuid))
+
+    def test_dated_event(self):
+        """Check that a single event with a date is only pinged on its date and deleted afterwards."""
+        event = Event("Dentist", DayEnum.WEDNESDAY, "Checkup", EventType.SINGLE, "08:15", {"01:00": True},
+                      date="2020-10-28")
+        DatabaseController.save_event_data_user(self.user_id, event)
+
+        EventChecker().check_events(until=START + timedelta(days=10))
+
+        # Only part of the daily ping of its date, not of the wednesday before
+        digest, *pings = self.bot.messages
+        self.assertEqual(digest.time, datetime(2020, 10, 28))
+        ping_times = [message.time - START for message in pings]
+        self.assertEqual(len(ping_times), 2)
+        self.assertTrue(timedelta(days=9, hours=7, minutes=15) <= ping_times[0] < timedelta(days=9, hours=7,
+                                                                                            minutes=25))
+        self.assertTrue(timedelta(days=9, hours=8, minutes=15) <= ping_times[1] < timedelta(days=9, hours=8,
+                                                                                            minutes=25))
+        self.assertIsNone(DatabaseController.read_event_of_user(self.user_id, event.uuid))
+        self.assertEqual(DatabaseController.load_user_dated_events(self.user_id), [])
+
+    def test_past_dated_events_deleted(self):
+        """Check that dated events of inactive users are deleted in bulk once they are past."""
+        for event_time in ("08:00", "09:00"):
+            DatabaseController.save_event_data_user(self.user_id, Event("Dentist", DayEnum.MONDAY, "Checkup",
+                                                                        EventType.SINGLE, event_time,
+                                                                        date="2020-10-19"))
+        DatabaseController.mark_user_inactive(self.user_id, "blocked")
+
+        EventChecker().check_events(until=START + timedelta(hours=12))
+        self.assertEqual(len(DatabaseController.load_user_events(self.user_id)), 2)
+        EventChecker().check_events(until=START + timedelta(days=1, hours=10))
+        self.assertEqual(DatabaseController.load_user_events(self.user_id), [])
+        self.assertEqual(self.bot.messages, [])
+
+    def test_timezone(self):
+        """Check that the events and the daily ping of a user in another time zone follow the wall clock there."""
+        event = Event("Training", DayEnum.MONDAY, "Gym", EventType.REGULARLY, "10:00", {"00:30": True})
+        DatabaseController.save_event_data_user(self.user_id, event)
+        user_config = DatabaseController.load_user_config(self.user_id)
+        user_config["digest_time"] = "08:00"
+        DatabaseController._save_user_data(self.user_id, user_config)
+        DatabaseController.save_user_timezone(self.user_id, "America/New_York")
+
+        EventChecker().check_events(until=START + timedelta(days=1, hours=12))
+
+        def server_time(wall_time):
+            return datetime.fromtimestamp(to_timestamp(wall_time, "America/New_York"))
+
+        digest, *pings = self.bot.messages
+        self.assertEqual(digest.time, server_time(datetime(2020, 10, 19, 8)))
+        self.assertIn("Training", digest.text)
+        self.assertEqual(len(pings), 2)
+        self.assertTrue(server_time(datetime(2020, 10, 19, 9, 30)) <= pings[0].time
+                        < server_time(datetime(2020, 10, 19, 9, 40)))
+        self.assertTrue(server_time(datetime(2020, 10, 19, 10)) <= pings[1].time
+                        < server_time(datetime(2020, 10, 19, 10, 10)))
+
+        stored_event = DatabaseController.read_event_of_user(self.user_id, event.uuid)
+        self.assertEqual(stored_event["timezone"], "America/New_York")
+        self.assertEqual(stored_event["date"], "2020-10-26")
+
+    def save_tuesday_events(self, amount):
+        """Saves regular events on tuesday in reverse order of their start."""
+        for number in reversed(range(amount)):
+            event = Event("Event{}".format(number), DayEnum.TUESDAY, "Content", EventType.REGULARLY,
+                          "{:02d}:00".format(10 + number))
+            DatabaseController.save_event_data_user(self.user_id, event)
+
+    def test_daily_digest(self):
+        """Check that the daily ping sends a single paginated message with all events of the day."""
+        self.save_tuesday_events(7)
+
+        EventChecker().check_events(until=START + timedelta(days=1, minutes=10))
+
+        self.assertEqual(len(self.bot.messages), 1)
+        message = self.bot.messages[0]
+        self.assertTrue(message.text.index("Event0") < message.text.index("Event4"))
+        self.assertNotIn("Event5", message.text)
+        keyboard = message.reply_markup.inline_keyboard
+        self.assertEqual(len(keyboard), 6)
+        self.assertTrue(keyboard[0][0].callback_data.startswith("event_change_"))
+        self.assertEqual([button.callback_data for button in keyboard[-1]], ["digest_page_1_0", "digest_page_1_1"])
+
+        events = EventChecker.daily_digest_events(DatabaseController.load_user_events(self.user_id), 1)
+        self.assertIn("Event6", EventChecker.build_digest_message("EN", events, page=1))
+        last_page = Event.event_keyboard_digest(events, "EN", 1, page=1).inline_keyboard
+        self.assertEqual(len(last_page), 3)
+        self.assertEqual([button.callback_data for button in last_page[-1]], ["digest_page_1_0", "digest_page_1_1"])
+
+    def test_daily_ping_per_event(self):
+        """Check that the daily ping sends one message per event if the digest is disabled."""
+        self.save_tuesday_events(3)
+        checker = EventChecker()
+        checker.daily_digest = False
+
+        checker.check_events(until=START + timedelta(days=1, minutes=10))
+
+        self.assertEqual(len(self.bot.messages), 3)
+
+    def test_digest_time_buckets(self):
+        """Check that the daily ping is sent at the digest time of every user and not to users who disabled it."""
+        self.save_tuesday_events(1)
+        other_user_id = 23456
+        DatabaseController.load_user_config(other_user_id)
+        DatabaseController.save_event_data_user(other_user_id, Event("Other", DayEnum.TUESDAY, "Content",
+                                                                     EventType.REGULARLY, "18:00"))
+        checker = EventChecker()
+        DatabaseController.load_digest_users(0)
+
+        # Changes after the index was built move the users into their new buckets
+        config = DatabaseController.load_user_config(self.user_id)
+        config["digest_time"] = "07:32"
+        DatabaseController._save_user_data(self.user_id, config)
+        other_config = DatabaseController.load_user_config(other_user_id)
+        other_config["daily_ping"] = False
+        DatabaseController._save_user_data(other_user_id, other_config)
+        self.assertEqual(DatabaseController.load_digest_users(0), [])
+        self.assertEqual(DatabaseController.load_digest_users(7 * 60 + 32), [str(self.user_id)])
+
+        checker.check_events(until=START + timedelta(days=1, hours=8))
+
+        # Checked every five minutes
+        self.assertEqual([(message.chat_id, message.time.strftime("%a %H:%M")) for message in self.bot.messages],
+                         [(str(self.user_id), "Tue 07:35")])
+
+    def test_early_reminder_ahead(self):
+        """Check that early reminders are sent ahead by their offset and classified by their priority."""
+        event = Event("Flight", DayEnum.TUESDAY, "Airport", EventType.REGULARLY, "10:00",
+                      {"24:00": True, "00:30": True})
+        DatabaseController.save_event_data_user(self.user_id, event)
+        offset = EventChecker.early_offset(event, "24:00", 600)
+        self.assertTrue(0 <= offset <= 600)
+        self.assertEqual(offset, EventChecker.early_offset(event, "24:00", 600))
+
+        due_time = START + timedelta(hours=10)
+        clock.use_clock(SimulatedClock(due_time - timedelta(seconds=offset + 1)))
+        self.assertFalse(EventChecker.check_ping_needed(self.user_id, event, today=False, early_lead=600)[0])
+        clock.use_clock(SimulatedClock(due_time - timedelta(seconds=offset - 1)))
+        self.assertTrue(EventChecker.check_ping_needed(self.user_id, event, today=False, early_lead=600)[0])
+        self.assertEqual(event.ping_class, "early")
+        self.assertEqual(event.due_time, due_time)
+
+        clock.use_clock(SimulatedClock(due_time + timedelta(days=1)))
+        self.assertTrue(EventChecker.check_ping_needed(self.user_id, event)[0])
+        self.assertEqual(event.ping_class, "start")
+
+    def test_coalesced_pings(self):
+        """Check that the pings due for a user in one pass are merged into one message with actions per event."""
+        training = Event("Training", DayEnum.MONDAY, "Gym", EventType.REGULARLY, "10:00")
+        dentist = Event("Dentist", DayEnum.MONDAY, "Checkup", EventType.SINGLE, "10:00")
+        DatabaseController.save_event_data_user(self.user_id, training)
+        DatabaseController.save_event_data_user(self.user_id, dentist)
+
+        EventChecker().check_events(until=START + timedelta(hours=10, minutes=10))
+
+        self.assertEqual(len(self.bot.messages), 1)
+        message = self.bot.messages[0]
+        self.assertIn("Training", message.text)
+        self.assertIn("Dentist", message.text)
+        # The single event was deleted with its start ping
+        self.assertEqual([row[0].callback_data for row in message.reply_markup.inline_keyboard],
+                         ["event_change_{}".format(training.uuid)])
+
+    def test_coalesced_dated_pings(self):
+        """Check that the pings of events with and without a date due in the same pass are sent as one message."""
+        training = Event("Training", DayEnum.MONDAY, "Gym", EventType.REGULARLY, "10:00")
+        dentist = Event("Dentist", DayEnum.MONDAY, "Checkup", EventType.SINGLE, "10:00", date="2020-10-19")
+        DatabaseController.save_event_data_user(self.user_id, training)
+        DatabaseController.save_event_data_user(self.user_id, dentist)
+        self.assertEqual([event.date for event in DatabaseController.load_user_events(self.user_id)],
+                         [None, "2020-10-19"])
+
+        with mock.patch.object(self.bot, "send_message", wraps=self.bot.send_message) as send_message:
+            EventChecker().check_events(until=START + timedelta(hours=10, minutes=10))
+
+        send_message.assert_called_once()
+        self.assertIn("Training", self.bot.messages[0].text)
+        self.assertIn("Dentist", self.bot.messages[0].text)
+
+    def test_pings_per_event(self):
+        """Check that every ping is sent as its own message if coalescing is disabled."""
+        for name in ("Training", "Dentist"):
+            DatabaseController.save_event_data_user(self.user_id, Event(name, DayEnum.MONDAY, "Content",
+                                                                        EventType.REGULARLY, "10:00"))
+        checker = EventChecker()
+        checker.coalesce_pings = False
+
+        checker.check_events(until=START + timedelta(hours=10, minutes=10))
+
+        self.assertEqual(len(self.bot.messages), 2)
+
+    def test_delivery_phase(self):
+        """Check that the delivery of the pings is timed as its own phase of the cycle."""
+        DatabaseController.save_event_data_user(self.user_id, Event("Training", DayEnum.MONDAY, "Gym",
+                                                                    EventType.REGULARLY, "10:00"))
+        delivery, ping = CYCLE_SECONDS.labels("delivery"), CYCLE_SECONDS.labels("ping")
+        deliveries, pings = delivery.count, ping.count
+
+        EventChecker().check_events(until=START + timedelta(hours=10, minutes=10))
+
+        self.assertEqual(len(self.bot.messages), 1)
+        # Once per cycle like the ping phase
+        self.assertEqual(delivery.count - deliveries, ping.count - pings)
+        self.assertGreater(delivery.count - deliveries, 0)
+
+    def test_profiled_delivery(self):
+        """Check that a profiled cycle contains the sending of its pings."""
+        DatabaseController.save_event_data_user(self.user_id, Event("Training", DayEnum.MONDAY, "Gym",
+                                                                    EventType.REGULARLY, "10:00"))
+        # Starts with the cycle that sends the start ping
+        clock.use_clock(SimulatedClock(START + timedelta(hours=10)))
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        profiler = Profiler(path=directory)
+        session = profiler.request(cycles=1)
+
+        with mock.patch("control.event_checker.profiler", profiler):
+            EventChecker().check_events(until=START + timedelta(hours=10, minutes=1))
+
+        self.assertEqual(len(self.bot.messages), 1)
+        self.assertTrue(session.finished.wait(10))
+        self.assertIn("checker_delivery.pstats", os.listdir(session.directory))
+
+    def test_blocked_user_inactive(self):
+        """Check that a user who blocked the bot is marked as inactive and no longer pinged."""
+        for event_time in ("10:00", "11:00"):
+            DatabaseController.save_event_data_user(self.user_id, Event("Training", DayEnum.MONDAY, "Gym",
+                                                                        EventType.REGULARLY, event_time))
+        self.bot.blocked.add(str(self.user_id))
+
+        EventChecker().check_events(until=START + timedelta(hours=10, minutes=10))
+        self.assertTrue(DatabaseController.is_user_inactive(self.user_id))
+        self.assertEqual(DatabaseController.load_user_config(self.user_id)["inactive"]["reason"], "blocked")
+        self.assertEqual(DatabaseController.load_active_user_ids(), [])
+
+        # Not even tried any more, so unblocking does not lead to pings until the user writes again
+        self.bot.blocked.clear()
+        EventChecker().check_events(until=START + timedelta(hours=11, minutes=10))
+        self.assertEqual(self.bot.messages, [])
+
+        DatabaseController.reactivate_user(self.user_id)
+        EventChecker().check_events(until=START + timedelta(days=1, minutes=10))
+        self.assertEqual(len(self.bot.messages), 1)
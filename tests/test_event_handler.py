@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""Contains tests of the event handler."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import glob
+import os
+import unittest
+from datetime import datetime
+
+from benchmarks.fake_bot import FakeBot
+from control.bot_control import BotControl
+from control.database_controller import DatabaseController
+from control.event_handler import EventHandler
+from models.day import DayEnum
+from models.event import EventType
+from models.user import User
+from state_machines.user_event_creation_machine import ValidStates as CreationStates
+from utils import clock
+from utils.clock import SimulatedClock
+from utils.localization_manager import DEFAULT_LANGUAGE, receive_translation
+from utils.path_utils import PROJECT_ROOT
+
+TEST_CONFIG = os.path.join(PROJECT_ROOT, "tests", "test_files", "configuration.json")
+TEST_USER_DATA = os.path.join(PROJECT_ROOT, "tests", "test_files", ".data", "user_data")
+
+# A monday
+START = datetime(2020, 10, 19, 12)
+
+
+class TestEventHandler(unittest.TestCase):
+    """Tests the dialogs of the events."""
+
+    def setUp(self):
+        """Set up test."""
+        DatabaseController(config_file=TEST_CONFIG, userdata_path=TEST_USER_DATA)
+        self.previous_clock = clock.use_clock(SimulatedClock(START))
+        self.previous_bot = BotControl.bot
+        BotControl.bot = FakeBot()
+        self.user = User(12345)
+        DatabaseController.load_user_config(self.user.user_id)
+
+    def tearDown(self):
+        """Tear down test."""
+        clock.use_clock(self.previous_clock)
+        BotControl.bot = self.previous_bot
+        EventHandler.events_in_creation.pop(self.user.user_id, None)
+        for user_data_file in glob.glob("{}/*.json".format(TEST_USER_DATA)):
+            os.remove(user_data_file)
+
+    def _create_event(self, event_time, date=None):
+        """Completes the creation of a single event on monday and returns the next state of the creation."""
+        EventHandler.events_in_creation[self.user.user_id] = {
+            "title": "Dentist", "content": "Checkup", "event_type": EventType.SINGLE.value,
+            "day": DayEnum.MONDAY.value, "event_time": event_time, "ping_times": {"00:30": True}, "date": date}
+        return EventHandler._creation_done(self.user, None, None, None)
+
+    def test_creation_started_today(self):
+        """Check that a single event for today at a time that passed already is not saved but its day is requested
+        again."""
+        self.assertEqual(self._create_event("11:00", date="2020-10-19"), CreationStates.DAY)
+        self.assertEqual(self.user.events, [])
+        self.assertEqual(DatabaseController.load_user_events(self.user.user_id), [])
+        self.assertNotIn("date", EventHandler.events_in_creation[self.user.user_id])
+        self.assertEqual(BotControl.bot.messages[-1].text,
+                         receive_translation("event_creation_started", DEFAULT_LANGUAGE))
+
+    def test_creation_later_today(self):
+        """Check that single events that did not start yet keep their pings."""
+        self.assertEqual(self._create_event("13:00", date="2020-10-19"), CreationStates.INITIAL)
+        event = self.user.events[-1]
+        self.assertFalse(event.start_ping_done)
+        self.assertTrue(event.ping_times["00:30"])
+
+        # The day alone moves an event that passed today to the next week
+        self._create_event("11:00")
+        event = self.user.events[-1]
+        self.assertEqual(event.date, "2020-10-26")
+        self.assertFalse(event.start_ping_done)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+"""Contains tests of the fake Bot API used by the load test."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import unittest
+
+from telegram import Bot
+from telegram.error import RetryAfter
+
+from benchmarks.fake_bot_api import FakeBotApi
+
+TOKEN = "123456:test"
+
+
+class TestFakeBotApi(unittest.TestCase):
+    """Tests the fake Bot API with the bot of python-telegram-bot."""
+
+    def setUp(self):
+        """Set up test."""
+        self.api = FakeBotApi(TOKEN)
+        self.api.start()
+        self.bot = Bot(TOKEN, base_url=self.api.base_url)
+
+    def tearDown(self):
+        """Tear down test."""
+        self.api.stop()
+
+    def test_send_and_edit_message(self):
+        """Check that sent and edited messages are recorded."""
+        message = self.bot.send_message(42, "first")
+        self.bot.edit_message_text("second", chat_id=42, message_id=message.message_id)
+
+        self.assertEqual(message.chat_id, 42)
+        self.assertEqual([(sent.method, sent.chat_id, sent.text) for sent in self.api.messages],
+                         [("sendMessage", 42, "first"), ("editMessageText", 42, "second")])
+
+    def test_get_updates(self):
+        """Check that pushed updates are delivered until they are confirmed by the offset."""
+        update_id = self.api.push_update({"message": {"message_id": 1, "date": 0, "text": "hi",
+                                                      "chat": {"id": 42, "type": "private"}}})
+
+        updates = self.bot.get_updates(timeout=0)
+        self.assertEqual([update.update_id for update in updates], [update_id])
+        self.assertEqual(updates[0].message.text, "hi")
+        self.assertEqual(self.bot.get_updates(offset=update_id + 1, timeout=0), [])
+
+    def test_retry_after(self):
+        """Check that the bot receives RetryAfter for throttled messages."""
+        self.api.retry_after_rate = 1.0
+
+        with self.assertRaises(RetryAfter):
+            self.bot.send_message(42, "throttled")
+        self.assertEqual(self.api.messages, [])
+        self.assertEqual(self.api.stats()["sendMessage_retry_after"], 1)
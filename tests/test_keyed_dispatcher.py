@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+"""Contains tests of the keyed dispatcher."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import threading
+import time
+import unittest
+
+from control.keyed_dispatcher import KeyedExecutor
+
+
+class TestKeyedExecutor(unittest.TestCase):
+    """Tests functionality of the keyed executor."""
+
+    def setUp(self):
+        """Set up test."""
+        self.executor = KeyedExecutor(4, name="test")
+
+    def tearDown(self):
+        """Tear down test."""
+        self.executor.shutdown()
+
+    def test_order_per_key(self):
+        """Check that the tasks of a key run in submission order even if earlier ones are slower."""
+        results = {"a": [], "b": []}
+
+        def task(key, index):
+            time.sleep(0.001 * (10 - index))
+            results[key].append(index)
+
+        for index in range(10):
+            self.executor.submit("a", task, "a", index)
+            self.executor.submit("b", task, "b", index)
+        self.executor.join()
+
+        self.assertEqual(results["a"], list(range(10)))
+        self.assertEqual(results["b"], list(range(10)))
+        self.assertEqual(self.executor.pending_count, 0)
+
+    def test_parallel_keys(self):
+        """Check that a blocked key does not block the tasks of other keys."""
+        release = threading.Event()
+        done = threading.Event()
+
+        self.executor.submit("slow", release.wait, 5)
+        self.executor.submit("fast", done.set)
+
+        self.assertTrue(done.wait(5))
+        release.set()
+
+    def test_failing_task(self):
+        """Check that a failing task does not stop the following tasks of its key."""
+        results = []
+
+        def fail():
+            raise ValueError()
+
+        self.executor.submit("a", fail)
+        self.executor.submit("a", results.append, 1)
+        self.executor.join()
+
+        self.assertEqual(results, [1])
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""Contains tests of the logging setup."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.logging_utils import SamplingFilter, fields, lazy, setup_logging, stop_logging
+
+
+class TestLoggingUtils(unittest.TestCase):
+    """Tests the structured, sampled and asynchronous logging."""
+
+    def setUp(self):
+        """Set up test."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "bot.log")
+        self.previous_handlers = logging.getLogger().handlers[:]
+        self.previous_level = logging.getLogger().level
+
+    def tearDown(self):
+        """Tear down test."""
+        stop_logging()
+        root = logging.getLogger()
+        root.handlers = self.previous_handlers
+        root.setLevel(self.previous_level)
+        for name in ("test.sampled", "test.plain"):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+        shutil.rmtree(self.directory)
+
+    def read_records(self):
+        """Stops the logging thread and returns the written records."""
+        stop_logging()
+        with open(self.path, encoding="utf-8") as log_file:
+            return [json.loads(line) for line in log_file]
+
+    def test_sampling_filter(self):
+        """Check that every n-th record per message is kept and warnings are never dropped."""
+        sampling_filter = SamplingFilter({"test.sampled": 10})
+        make = logging.getLogger("test.sampled.child").makeRecord
+
+        kept = [sampling_filter.filter(make("test.sampled.child", logging.INFO, "", 0, "frequent %s", (i,), None))
+                for i in range(25)]
+        self.assertEqual(sum(kept), 3)
+        self.assertTrue(sampling_filter.filter(make("test.sampled.child", logging.INFO, "", 0, "rare", (), None)))
+        self.assertTrue(all(sampling_filter.filter(make("test.sampled", logging.WARNING, "", 0, "bad", (), None))
+                            for _ in range(5)))
+        self.assertTrue(sampling_filter.filter(make("test.plain", logging.INFO, "", 0, "frequent", (), None)))
+
+    def test_json_records(self):
+        """Check that records are written as JSON with their fields, sampled and with lazy values."""
+        calls = []
+
+        def expensive():
+            calls.append(1)
+            return "computed"
+
+        setup_logging({"format": "json", "path": self.path, "levels": {"test": "INFO"},
+                       "sampling": {"test.sampled": 2}})
+        logging.getLogger("test.plain").info("Sent %s pings", 3, extra=fields(kind="reminder", pings=3))
+        logging.getLogger("test.plain").debug("Hidden %s", lazy(expensive))
+        logging.getLogger("test.plain").info("Shown %s", lazy(expensive))
+        for number in range(4):
+            logging.getLogger("test.sampled").info("Sampled %s", number)
+
+        records = self.read_records()
+        self.assertEqual([record["message"] for record in records],
+                         ["Sent 3 pings", "Shown computed", "Sampled 0", "Sampled 2"])
+        self.assertEqual(records[0]["kind"], "reminder")
+        self.assertEqual(records[0]["pings"], 3)
+        self.assertEqual(records[0]["logger"], "test.plain")
+        self.assertEqual(records[2]["sample_rate"], 2)
+        self.assertEqual(len(calls), 1)
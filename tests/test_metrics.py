@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""Contains tests of the metrics."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import unittest
+import urllib.request
+
+from utils.metrics import MetricsRegistry, MetricsServer
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests functionality of the metrics."""
+
+    def setUp(self):
+        """Set up test."""
+        self.registry = MetricsRegistry()
+
+    def test_exposition(self):
+        """Check that counters, gauges and histograms are rendered in the text format."""
+        counter = self.registry.counter("pings", "Sent pings.", ("kind",))
+        counter.labels("daily").inc()
+        counter.labels("daily").inc(2)
+        self.registry.gauge("sessions", "Live sessions.").set_function(lambda: 4)
+        histogram = self.registry.histogram("send_seconds", "Send duration.", buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        lines = self.registry.expose().splitlines()
+
+        self.assertIn("# TYPE remindeasy_pings counter", lines)
+        self.assertIn('remindeasy_pings_total{kind="daily"} 3', lines)
+        self.assertIn("remindeasy_sessions 4", lines)
+        self.assertIn('remindeasy_send_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('remindeasy_send_seconds_bucket{le="1"} 2', lines)
+        self.assertIn('remindeasy_send_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("remindeasy_send_seconds_sum 5.55", lines)
+        self.assertIn("remindeasy_send_seconds_count 3", lines)
+
+    def test_quantile(self):
+        """Check that quantiles are interpolated inside the bucket they fall into."""
+        histogram = self.registry.histogram("lag_seconds", "Lag.", buckets=(10, 20, 40))
+        self.assertEqual(histogram.quantile(0.5), 0.0)
+        for value in (5, 15, 15, 30):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.quantile(0.25), 10.0)
+        self.assertEqual(histogram.quantile(0.5), 15.0)
+        self.assertEqual(histogram.quantile(1), 40.0)
+
+    def test_registry(self):
+        """Check that metrics are created once and the label count is validated."""
+        counter = self.registry.counter("pings", "Sent pings.", ("kind",))
+
+        self.assertIs(self.registry.counter("pings", "Sent pings.", ("kind",)), counter)
+        self.assertRaises(ValueError, self.registry.gauge, "pings", "Sent pings.")
+        self.assertRaises(ValueError, counter.labels, "daily", "extra")
+
+    def test_server(self):
+        """Check that the server exposes the metrics."""
+        self.registry.counter("pings", "Sent pings.").inc()
+        server = MetricsServer(port=0, metrics_registry=self.registry)
+        server.start()
+        try:
+            with urllib.request.urlopen("http://127.0.0.1:{}/metrics".format(server.port)) as response:
+                body = response.read().decode()
+        finally:
+            server.stop()
+
+        self.assertIn("remindeasy_pings_total 1", body.splitlines())
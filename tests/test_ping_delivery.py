@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""Contains tests of the delivery of pings."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import unittest
+from datetime import datetime, timedelta
+
+from control.ping_delivery import PingDelivery
+from utils import clock
+from utils.clock import SimulatedClock
+
+START = datetime(2020, 10, 19, 10, 0)
+
+
+class TestPingDelivery(unittest.TestCase):
+    """Tests the smoothing of the pings of a pass."""
+
+    def setUp(self):
+        """Set up test."""
+        self.previous_clock = clock.use_clock(SimulatedClock(START))
+        self.sent = []
+
+    def tearDown(self):
+        """Tear down test."""
+        clock.use_clock(self.previous_clock)
+
+    def send(self, name):
+        """Records the time the ping was sent at."""
+        self.sent.append((name, (clock.now() - START).total_seconds()))
+
+    def test_spread_by_priority(self):
+        """Check that the pings are spread over the window by priority and no ping is later than its class allows."""
+        delivery = PingDelivery(window=60, rate=0.1, lateness={"reminder": 25})
+        delivery.schedule("early", START + timedelta(hours=12), self.send, "early")
+        delivery.schedule("reminder", START - timedelta(seconds=10), self.send, "reminder_1")
+        delivery.schedule("reminder", START - timedelta(seconds=10), self.send, "reminder_2")
+        delivery.schedule("reminder", START - timedelta(seconds=5), self.send, "reminder_3")
+        delivery.schedule("start", START - timedelta(seconds=30), self.send, "start")
+        delivery.schedule("reminder", START - timedelta(minutes=5), self.send, "late_reminder")
+
+        self.assertEqual(delivery.deliver(), 50)
+        self.assertEqual(self.sent, [("start", 0), ("late_reminder", 0), ("reminder_1", 15), ("reminder_2", 15),
+                                     ("reminder_3", 20), ("early", 50)])
+        self.assertEqual(delivery.pending, [])
+
+    def test_without_window(self):
+        """Check that all pings are sent at once in priority order without a window."""
+        delivery = PingDelivery()
+        delivery.schedule("reminder", START, self.send, "reminder")
+        delivery.schedule("start", START, self.send, "start")
+
+        self.assertEqual(delivery.deliver(), 0)
+        self.assertEqual(self.sent, [("start", 0), ("reminder", 0)])
+
+    def test_rate(self):
+        """Check that small spikes are sent with the rate and large ones are compressed into the window."""
+        delivery = PingDelivery(window=10, rate=2)
+        for number in range(3):
+            delivery.schedule("reminder", START, self.send, number)
+        self.assertEqual(delivery.deliver(), 1)
+
+        for number in range(100):
+            delivery.schedule("reminder", START, self.send, number)
+        self.assertAlmostEqual(delivery.deliver(), 9.9)
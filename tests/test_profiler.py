@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+"""Contains tests of the profiler."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import os
+import pstats
+import shutil
+import tempfile
+import time
+import unittest
+
+from utils.profiler import Profiler
+
+
+def busy_handler(seconds):
+    """Keeps the thread busy so the sampler sees it."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return seconds
+
+
+class TestProfiler(unittest.TestCase):
+    """Tests the profiling sessions."""
+
+    def setUp(self):
+        """Set up test."""
+        self.directory = tempfile.mkdtemp()
+        self.profiler = Profiler(path=self.directory, sample_interval=0.001)
+
+    def tearDown(self):
+        """Tear down test."""
+        shutil.rmtree(self.directory)
+
+    def test_unrequested_calls(self):
+        """Check that calls are passed through without a session."""
+        self.assertEqual(self.profiler.profile("update", "handler:/start", busy_handler, 0), 0)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_session(self):
+        """Check that the requested calls are profiled and written once all of them finished."""
+        session = self.profiler.request(updates=2, cycles=1)
+        self.assertIsNotNone(session)
+        self.assertIsNone(self.profiler.request(updates=1))
+
+        self.profiler.profile("update", "handler:/start", busy_handler, 0.05)
+        self.profiler.profile("update", lambda: "handler:/start", busy_handler, 0.05)
+        # Not counted because the requested updates were profiled already
+        self.profiler.profile("update", "handler:/help", busy_handler, 0)
+        self.profiler.profile("cycle", "checker:ping", busy_handler, 0.01, counts=False)
+        self.assertFalse(session.finished.is_set())
+        self.profiler.profile("cycle", "checker:refresh", busy_handler, 0.01)
+
+        self.assertIsNone(self.profiler.session)
+        self.assertTrue(session.finished.wait(10))
+        self.assertEqual(sorted(os.listdir(session.directory)),
+                         ["all.pstats", "checker_ping.pstats", "checker_refresh.pstats", "handler_start.pstats",
+                          "memory.txt", "stacks.collapsed"])
+
+        stats = pstats.Stats(os.path.join(session.directory, "handler_start.pstats"))
+        calls = [call_count for (_, _, name), (_, call_count, _, _, _) in stats.stats.items()
+                 if name == "busy_handler"]
+        self.assertEqual(calls, [2])
+
+        with open(os.path.join(session.directory, "stacks.collapsed")) as stacks_file:
+            stacks = stacks_file.read().splitlines()
+        self.assertTrue(any(stack.startswith("handler:/start;test_profiler.py:busy_handler ") for stack in stacks))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""Contains tests of the recurrence rules."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import unittest
+from datetime import date, datetime, timedelta
+
+from models.day import DayEnum
+from models.event import Event, EventType
+from models.recurrence import DAILY, MONTHLY, WEEKLY, Recurrence
+
+
+def occurrences(recurrence, after, amount):
+    """Returns the next occurrences of the rule as ISO dates."""
+    dates = []
+    while len(dates) < amount:
+        after = recurrence.next_occurrence(after)
+        if after is None:
+            break
+        dates.append(after.isoformat())
+        after += timedelta(days=1)
+    return dates
+
+
+class TestRecurrence(unittest.TestCase):
+    """Tests the computation of the occurrences of recurrence rules."""
+
+    def test_daily(self):
+        """Check that a daily rule happens every n days until its end."""
+        recurrence = Recurrence(DAILY, 3, start=date(2020, 10, 19), until=date(2020, 10, 28))
+        self.assertEqual(occurrences(recurrence, date(2020, 10, 1), 5), ["2020-10-19", "2020-10-22", "2020-10-25",
+                                                                         "2020-10-28"])
+        self.assertTrue(recurrence.occurs_on(date(2020, 10, 25)))
+        self.assertFalse(recurrence.occurs_on(date(2020, 10, 26)))
+
+    def test_weekly(self):
+        """Check that a weekly rule happens on all of its weekdays every n weeks except on the exception dates."""
+        recurrence = Recurrence(WEEKLY, 2, [DayEnum.THURSDAY.value, DayEnum.MONDAY.value], start=date(2020, 10, 19),
+                                exceptions={"2020-11-02"})
+        self.assertEqual(occurrences(recurrence, date(2020, 10, 20), 4), ["2020-10-22", "2020-11-05", "2020-11-16",
+                                                                          "2020-11-19"])
+
+    def test_monthly(self):
+        """Check that monthly rules skip months without the day and find the n-th and the last weekday."""
+        by_day = Recurrence(MONTHLY, month_day=31, start=date(2020, 1, 31))
+        self.assertEqual(occurrences(by_day, date(2020, 2, 1), 3), ["2020-03-31", "2020-05-31", "2020-07-31"])
+
+        second_monday = Recurrence(MONTHLY, weekdays=[DayEnum.MONDAY.value], month_week=2, start=date(2020, 10, 1))
+        self.assertEqual(occurrences(second_monday, date(2020, 10, 1), 2), ["2020-10-12", "2020-11-09"])
+
+        last_tuesday = Recurrence(MONTHLY, 2, [DayEnum.TUESDAY.value], month_week=-1, start=date(2020, 10, 1))
+        self.assertEqual(occurrences(last_tuesday, date(2020, 10, 28), 2), ["2020-12-29", "2021-02-23"])
+
+    def test_stored_representation(self):
+        """Check that a rule is the same after storing and loading it."""
+        recurrence = Recurrence(MONTHLY, 2, [DayEnum.TUESDAY.value], month_week=-1, start=date(2020, 10, 1),
+                                until=date(2021, 10, 1), exceptions={"2020-12-29"})
+        loaded = Recurrence.from_dict(recurrence.to_dict())
+        self.assertEqual(loaded.to_dict(), recurrence.to_dict())
+        self.assertEqual(occurrences(loaded, date(2020, 10, 28), 2), ["2021-02-23", "2021-04-27"])
+
+    def test_event_advance(self):
+        """Check that a recurring event moves to the first occurrence after the given time with its ping times."""
+        event = Event("Training", DayEnum.MONDAY, "Gym", EventType.REGULARLY, "10:00", {"00:30": False},
+                      date="2020-10-19", recurrence=Recurrence(WEEKLY, weekdays=[0, 2], start=date(2020, 10, 19)))
+        event.ping_times_to_refresh = {"00:30": True}
+        event.start_ping_done = True
+
+        self.assertTrue(event.advance(datetime(2020, 10, 21, 10)))
+        self.assertEqual(event.date, "2020-10-26")
+        self.assertEqual(event.day, DayEnum.MONDAY)
+        self.assertTrue(event.ping_times["00:30"])
+        self.assertFalse(event.start_ping_done)
+        self.assertEqual(event.next_fire, datetime(2020, 10, 26, 9, 30).timestamp())
+
+        event.recurrence.until = date(2020, 10, 27)
+        self.assertFalse(event.advance(datetime(2020, 10, 26, 10)))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""Contains tests of the session store."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import os
+import unittest
+from unittest import mock
+
+from utils import session_store
+from utils.path_utils import PROJECT_ROOT
+from utils.session_store import SessionStore
+
+TEST_SESSION_PATH = os.path.join(PROJECT_ROOT, "tests", "test_files", ".data", "sessions")
+
+
+class FakeClock:
+    """Clock whose time only moves when it is advanced."""
+
+    def __init__(self):
+        """Constructor."""
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSessionStore(unittest.TestCase):
+    """Tests functionality of the session store."""
+
+    def setUp(self):
+        """Set up test."""
+        self.clock = FakeClock()
+        self.store = SessionStore("test_sessions", ttl=60, max_size=3, clock=self.clock)
+
+    def tearDown(self):
+        """Tear down test."""
+        SessionStore.stores.pop("test_sessions", None)
+        test_file = os.path.join(TEST_SESSION_PATH, "test_sessions.json")
+        if os.path.isfile(test_file):
+            os.remove(test_file)
+
+    def test_get_and_set(self):
+        """Check that entries are stored and that missing entries return the default."""
+        self.store[1] = 5
+        self.assertEqual(self.store[1], 5)
+        self.assertIn(1, self.store)
+        self.assertEqual(self.store.get(2, 0), 0)
+        self.assertRaises(KeyError, lambda: self.store[2])
+
+    def test_expiry(self):
+        """Check that untouched entries expire and that access refreshes the expiry."""
+        self.store[1] = {}
+        self.store[2] = {}
+
+        self.clock.now += 50
+        self.assertEqual(self.store[1], {})
+
+        self.clock.now += 20
+        self.assertNotIn(2, self.store)
+        self.assertIn(1, self.store)
+        self.assertEqual(self.store.stats(), {"live": 1, "expired": 1, "evicted": 0})
+
+    def test_lru_eviction(self):
+        """Check that the least recently used entry is evicted when the maximum size is reached."""
+        for user_id in range(0, 3):
+            self.store[user_id] = user_id
+        self.store.get(0)
+        self.store[3] = 3
+
+        self.assertEqual(sorted(self.store.keys()), [0, 2, 3])
+        self.assertEqual(self.store.stats()["evicted"], 1)
+
+    def test_pop(self):
+        """Check that popping removes the entry and supports a default."""
+        self.store[1] = 1
+        self.assertEqual(self.store.pop(1), 1)
+        self.assertIsNone(self.store.pop(1, None))
+        self.assertRaises(KeyError, self.store.pop, 1)
+
+    def test_persistence(self):
+        """Check that live entries survive a save and load while expired ones are dropped."""
+        self.store.persistent = True
+        self.store[12345] = {"title": "TestEvent"}
+        self.store[54321] = 1
+
+        with mock.patch.object(session_store, "SESSION_PATH", TEST_SESSION_PATH):
+            self.store.save()
+
+            self.clock.now += 30
+            restored = SessionStore("test_sessions", ttl=60, persistent=True, clock=self.clock)
+            restored.load()
+
+        self.assertEqual(restored[12345], {"title": "TestEvent"})
+        self.assertEqual(restored[54321], 1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""Contains tests of the state machine engine."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import unittest
+from enum import Enum
+
+from state_machines.state_machine import StateMachine
+from utils.session_store import SessionStore
+
+
+class DialogStates(Enum):
+    """States of the test machine."""
+    DONE = -1
+    INITIAL = 0
+    STARTED = 1
+    PROMPT = 2
+    WAITING = 3
+
+
+class TestStateMachine(unittest.TestCase):
+    """Tests functionality of the state machine engine."""
+
+    def setUp(self):
+        """Set up test."""
+        self.store = SessionStore("test_machine_states")
+        self.machine = StateMachine("test_machine", DialogStates, self.store, DialogStates.INITIAL)
+        self.calls = []
+
+        self.machine.add_transition(DialogStates.INITIAL, "start", self._handler("start", DialogStates.STARTED))
+        self.machine.add_transition(DialogStates.STARTED, "next", self._handler("next", DialogStates.PROMPT))
+        self.machine.add_entry_action(DialogStates.PROMPT, self._handler("prompt", DialogStates.WAITING))
+        self.machine.add_transition(DialogStates.WAITING, "finish", self._handler("finish", DialogStates.DONE))
+        self.machine.add_entry_action(DialogStates.DONE, self._handler("done", DialogStates.INITIAL))
+        self.machine.compile()
+
+    def tearDown(self):
+        """Tear down test."""
+        SessionStore.stores.pop("test_machine_states", None)
+
+    def _handler(self, name, next_state):
+        """Creates a handler that records its call and returns the given state."""
+        def handler(argument):
+            self.calls.append(name)
+            return next_state
+        return handler
+
+    def test_dispatch(self):
+        """Check that transitions are performed and that entry actions are chained."""
+        self.assertTrue(self.machine.dispatch(1, "start", None))
+        self.assertEqual(self.machine.receive_state(1), DialogStates.STARTED.value)
+
+        self.assertTrue(self.machine.dispatch(1, "next", None))
+        self.assertEqual(self.machine.receive_state(1), DialogStates.WAITING.value)
+        self.assertEqual(self.calls, ["start", "next", "prompt"])
+
+    def test_unknown_trigger(self):
+        """Check that triggers without a transition inside the current state are rejected."""
+        self.assertFalse(self.machine.accepts(1, "next"))
+        self.assertFalse(self.machine.dispatch(1, "next", None))
+        self.assertEqual(self.calls, [])
+
+    def test_session_ends_on_initial_state(self):
+        """Check that the session of a user is removed when the initial state is reached again."""
+        self.machine.dispatch(1, "start", None)
+        self.machine.dispatch(1, "next", None)
+        self.machine.dispatch(1, "finish", None)
+
+        self.assertNotIn(1, self.store)
+        self.assertEqual(self.calls[-2:], ["finish", "done"])
+
+    def test_invalid_state(self):
+        """Check that undeclared states are rejected."""
+        self.assertRaises(RuntimeError, self.machine.set_state, 1, 42)
+
+    def test_timing_hook(self):
+        """Check that timing hooks receive every performed transition."""
+        transitions = []
+        self.machine.add_timing_hook(lambda *args: transitions.append(args[:4]))
+        self.machine.dispatch(1, "start", None)
+
+        self.assertEqual(transitions,
+                         [("test_machine", DialogStates.INITIAL.value, "start", DialogStates.STARTED.value)])
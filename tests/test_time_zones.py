@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+"""Contains tests of the time zone utils."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import unittest
+from datetime import datetime, timezone
+
+from utils.time_zones import find_timezone, to_timestamp, to_wall_time
+
+
+class TestTimeZones(unittest.TestCase):
+    """Tests the conversion between the wall times of the users and UTC timestamps."""
+
+    def test_find_timezone(self):
+        """Check that time zones are found regardless of their case."""
+        self.assertEqual(find_timezone(" europe/berlin "), "Europe/Berlin")
+        self.assertIsNone(find_timezone("Europe/Atlantis"))
+
+    def test_conversion(self):
+        """Check that wall times are converted with the offset that is valid on their date."""
+        winter = to_timestamp(datetime(2020, 1, 15, 10), "Europe/Berlin")
+        summer = to_timestamp(datetime(2020, 7, 15, 10), "Europe/Berlin")
+        self.assertEqual(datetime.fromtimestamp(winter, timezone.utc).hour, 9)
+        self.assertEqual(datetime.fromtimestamp(summer, timezone.utc).hour, 8)
+
+        server_time = datetime.fromtimestamp(summer)
+        self.assertEqual(to_wall_time(server_time, "Europe/Berlin"), datetime(2020, 7, 15, 10))
+        self.assertEqual(to_wall_time(server_time, "America/New_York"), datetime(2020, 7, 15, 4))
+        self.assertEqual(to_wall_time(server_time, None), server_time)
+        self.assertEqual(to_timestamp(server_time, None), summer)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""Contains tests of the update recorder."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import os
+import shutil
+import tempfile
+import unittest
+
+from telegram import Bot, Update
+
+from control.update_recorder import UpdateRecorder, mask_text, read_recording
+
+
+def create_update(update_id, user_id, text):
+    """Creates the data of a text message update."""
+    user = {"id": user_id, "is_bot": False, "first_name": "Alice", "username": "alice"}
+    return {"update_id": update_id,
+            "message": {"message_id": update_id, "date": 0, "text": text, "from": user,
+                        "chat": {"id": user_id, "type": "private"}}}
+
+
+class TestUpdateRecorder(unittest.TestCase):
+    """Tests the recording and anonymisation of updates."""
+
+    def setUp(self):
+        """Set up test."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "updates.jsonl.gz")
+        self.bot = Bot("123456:test")
+
+    def tearDown(self):
+        """Tear down test."""
+        shutil.rmtree(self.directory)
+
+    def test_mask_text(self):
+        """Check that letters are masked while commands, digits and the length are kept."""
+        self.assertEqual(mask_text("/new_event Dentist"), "/new_event xxxxxxx")
+        self.assertEqual(mask_text("Meet Bob at 10:30!"), "xxxx xxx xx 10:30!")
+
+    def test_record_and_read(self):
+        """Check that recorded updates are anonymised and can be parsed again."""
+        recorder = UpdateRecorder(self.path)
+        recorder.record(Update.de_json(create_update(1, 4711, "/start"), self.bot), None)
+        recorder.record(Update.de_json(create_update(2, 4711, "Secret 12"), self.bot), None)
+        recorder.record(Update.de_json(create_update(3, 815, "Other"), self.bot), None)
+        recorder.close()
+
+        records = read_recording(self.path)
+        self.assertEqual(len(records), 3)
+        updates = [Update.de_json(data, self.bot) for _, data in records]
+        self.assertEqual([update.message.text for update in updates], ["/start", "xxxxxx 12", "xxxxx"])
+
+        user_ids = [update.effective_user.id for update in updates]
+        self.assertEqual(user_ids[0], user_ids[1])
+        self.assertNotEqual(user_ids[0], user_ids[2])
+        self.assertNotIn(4711, user_ids)
+        self.assertEqual(updates[0].effective_chat.id, user_ids[0])
+        self.assertEqual(updates[0].effective_user.first_name, "user")
+        self.assertEqual(updates[0].effective_user.username, "user")
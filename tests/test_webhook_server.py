@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""Contains tests of the webhook server."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import http.client
+import json
+import unittest
+from queue import Queue
+from unittest import mock
+
+from control.webhook_server import WebhookServer
+
+UPDATE = {"update_id": 1, "message": {"message_id": 1, "date": 0, "text": "ping",
+                                      "chat": {"id": 42, "type": "private"}}}
+
+
+class TestWebhookServer(unittest.TestCase):
+    """Tests functionality of the webhook server."""
+
+    def setUp(self):
+        """Set up test."""
+        self.dispatcher = mock.MagicMock()
+        self.dispatcher.update_queue = Queue(maxsize=1)
+        self.server = WebhookServer(self.dispatcher, port=0, secret_path="secret", max_body_size=1024)
+        self.server.start()
+        self.connection = http.client.HTTPConnection("127.0.0.1", self.server.port)
+
+    def tearDown(self):
+        """Tear down test."""
+        self.connection.close()
+        self.server.stop()
+
+    def _post(self, path, body):
+        """Sends the body to the given path and returns the status of the response."""
+        self.connection.request("POST", path, body, {"Content-Type": "application/json"})
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+    def test_accept_update(self):
+        """Check that updates sent to the secret path are put into the update queue."""
+        self.assertEqual(self._post("/secret", json.dumps(UPDATE)), 200)
+
+        update = self.dispatcher.update_queue.get_nowait()
+        self.assertEqual(update.effective_chat.id, 42)
+        self.dispatcher.start.assert_called_once()
+
+    def test_reject_requests(self):
+        """Check that requests to other paths, invalid and too large bodies are rejected."""
+        self.assertEqual(self._post("/other", json.dumps(UPDATE)), 404)
+        self.assertEqual(self._post("/secret", "{invalid"), 400)
+        self.assertEqual(self._post("/secret", "x" * 2048), 413)
+
+        self.assertTrue(self.dispatcher.update_queue.empty())
+        stats = self.server.stats()
+        self.assertEqual(stats["rejected_path"], 1)
+        self.assertEqual(stats["invalid"], 2)
+
+    def test_full_queue(self):
+        """Check that updates are refused with 503 while the update queue is full."""
+        self.assertEqual(self._post("/secret", json.dumps(UPDATE)), 200)
+        self.assertEqual(self._post("/secret", json.dumps(UPDATE)), 503)
+
+        self.assertEqual(self.server.stats()["rejected_full"], 1)
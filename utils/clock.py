@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""Clock that provides the current time to the bot. It can be replaced by a simulated clock to travel in time."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class SystemClock:
+    """Clock following the time of the system."""
+
+    @staticmethod
+    def now():
+        """Returns the current local time."""
+        return datetime.now()
+
+    @staticmethod
+    def sleep(seconds):
+        """Blocks for the given amount of seconds."""
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """Clock that only moves when it is advanced. Sleeping advances it immediately, so everything driven by the clock
+    runs as fast as possible.
+    """
+
+    def __init__(self, start):
+        """Constructor.
+        Args:
+            start (datetime): Time the clock starts at.
+        """
+        self.current_time = start
+        self.lock = threading.Lock()
+
+    def now(self):
+        """Returns the simulated time."""
+        with self.lock:
+            return self.current_time
+
+    def sleep(self, seconds):
+        """Advances the clock by the given amount of seconds instead of blocking."""
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        """Moves the clock forward.
+        Args:
+            seconds (float): Amount of seconds the clock is moved.
+        """
+        with self.lock:
+            self.current_time += timedelta(seconds=seconds)
+
+
+_clock = SystemClock()
+
+
+def now():
+    """Returns the current time of the active clock."""
+    return _clock.now()
+
+
+def sleep(seconds):
+    """Sleeps the given amount of seconds on the active clock."""
+    _clock.sleep(seconds)
+
+
+def use_clock(clock):
+    """Replaces the active clock.
+    Args:
+        clock (object): Clock providing ``now`` and ``sleep``.
+    Returns:
+        object: Clock that was active before.
+    """
+    global _clock
+    previous_clock = _clock
+    _clock = clock
+    return previous_clock
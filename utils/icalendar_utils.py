@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+
+"""Utils for reading and writing the iCalendar format (RFC 5545)."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import re
+from datetime import datetime, timedelta
+
+# Weekdays as they are written in rules, Monday is 0 like in DayEnum.
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+_ESCAPED_CHARACTERS = re.compile(r"\\([\\;,nN])")
+# Octets of a line after which it is folded.
+MAX_LINE_LENGTH = 75
+
+_ESCAPED_TEXT_CHARACTERS = {"\\": "\\\\", ";": "\\;", ",": "\\,", "\n": "\\n"}
+_DURATION = re.compile(r"^([+-]?)P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+
+
+def unfold_lines(lines):
+    """Joins the lines that were folded because they were too long, the continuation starts with a blank.
+    Args:
+        lines (iterable of 'str'): Lines of the file, e.g. the opened file itself.
+    Returns:
+        generator of 'str': Logical lines without line breaks.
+    """
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_content_line(line):
+    """Splits a content line into its name, its parameters and its value.
+    Example: "DTSTART;TZID=Europe/Berlin:20201224T180000".
+    Args:
+        line (str): Unfolded content line.
+    Returns:
+        tuple: Upper case name, dict of the upper case parameter names and their values, value.
+    Raises:
+        ValueError: If the line has no value.
+    """
+    quoted = False
+    for position, character in enumerate(line):
+        if character == '"':
+            quoted = not quoted
+        elif character == ":" and not quoted:
+            break
+    else:
+        raise ValueError("Invalid content line: {}".format(line))
+
+    name, *parameters = line[:position].split(";")
+    parameter_dict = {}
+    for parameter in parameters:
+        key, _, value = parameter.partition("=")
+        parameter_dict[key.upper()] = value.strip('"')
+    return name.upper(), parameter_dict, line[position + 1:]
+
+
+def read_events(lines):
+    """Reads the events of a calendar one after another, so only a single event is held in memory at a time.
+    Properties of alarms are collected with the prefix "VALARM.", other nested components are ignored.
+    Args:
+        lines (iterable of 'str'): Lines of the file, e.g. the opened file itself.
+    Returns:
+        generator of 'dict': Properties of every event by their name, each a list of the parameters and the value.
+    Raises:
+        ValueError: If the lines are no calendar.
+    """
+    components = []
+    event = None
+    for name, parameters, value in _content_lines(lines):
+        if name == "BEGIN":
+            components.append(value.upper())
+            if components == ["VCALENDAR", "VEVENT"]:
+                event = {}
+        elif name == "END":
+            if components == ["VCALENDAR", "VEVENT"]:
+                yield event
+                event = None
+            components.pop()
+            if not components:
+                return
+        elif event is not None:
+            _add_property(event, components[2:], name, parameters, value)
+
+    if components:
+        raise ValueError("The calendar is incomplete")
+
+
+def _content_lines(lines):
+    """Unfolds and parses the content lines of a calendar, blank lines are skipped.
+    Args:
+        lines (iterable of 'str'): Lines of the file.
+    Returns:
+        generator of 'tuple': Name, parameters and value of every content line.
+    Raises:
+        ValueError: If the lines do not start with a calendar.
+    """
+    first = True
+    for line in unfold_lines(lines):
+        if not line.strip():
+            continue
+        name, parameters, value = parse_content_line(line)
+        if first and (name, value.upper()) != ("BEGIN", "VCALENDAR"):
+            raise ValueError("The file is no calendar")
+        first = False
+        yield name, parameters, value
+
+
+def _add_property(event, nested_components, name, parameters, value):
+    """Adds a property to the properties of an event.
+    Args:
+        event (dict): Properties of the event read so far.
+        nested_components (list of 'str'): Components inside the event the property belongs to, e.g. ["VALARM"].
+        name (str): Name of the property.
+        parameters (dict): Parameters of the property.
+        value (str): Value of the property.
+    """
+    if not nested_components:
+        event.setdefault(name, []).append((parameters, value))
+    elif nested_components == ["VALARM"]:
+        event.setdefault("VALARM.{}".format(name), []).append((parameters, value))
+
+
+def property_value(event, name, default=None):
+    """Returns the value of the first occurrence of a property of an event.
+    Args:
+        event (dict): Properties of the event as returned by read_events.
+        name (str): Name of the property.
+        default (object, optional): Returned if the event does not have the property.
+    Returns:
+        str: Value of the property.
+    """
+    occurrences = event.get(name)
+    return occurrences[0][1] if occurrences else default
+
+
+def unescape_text(value):
+    """Replaces the escaped characters of a text value.
+    Args:
+        value (str): Text as it is written in the file.
+    Returns:
+        str: Text with the original characters.
+    """
+    return _ESCAPED_CHARACTERS.sub(lambda match: "\n" if match.group(1) in "nN" else match.group(1), value)
+
+
+def parse_date_time(value, parameters=None):
+    """Parses a date or date with time.
+    Args:
+        value (str): Value as it is written in the file, e.g. "20201224T180000Z".
+        parameters (dict, optional): Parameters of the property, e.g. the time zone or the type of the value.
+    Returns:
+        tuple: Date and time without time zone, the name of the time zone and whether it is a date without time. The
+            time zone is "UTC" for a UTC time and None for a floating time that is the same in every time zone.
+    Raises:
+        ValueError: If the value is no valid date.
+    """
+    parameters = parameters or {}
+    value = value.strip()
+    if parameters.get("VALUE", "").upper() == "DATE" or len(value) == 8:
+        return datetime.strptime(value[:8], "%Y%m%d"), None, True
+    if value.endswith("Z"):
+        return datetime.strptime(value[:-1], "%Y%m%dT%H%M%S"), "UTC", False
+    return datetime.strptime(value, "%Y%m%dT%H%M%S"), parameters.get("TZID"), False
+
+
+def parse_duration(value):
+    """Parses a duration like "-PT30M".
+    Args:
+        value (str): Duration as it is written in the file.
+    Returns:
+        datetime.timedelta: Parsed duration, negative for a duration before a time.
+    Raises:
+        ValueError: If the value is no valid duration.
+    """
+    match = _DURATION.match(value.strip())
+    if not match:
+        raise ValueError("Invalid duration: {}".format(value))
+    weeks, days, hours, minutes, seconds = (int(part or 0) for part in match.groups()[1:])
+    duration = timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds)
+    return -duration if match.group(1) == "-" else duration
+
+
+def parse_rule(value):
+    """Splits a recurrence rule into its parts, e.g. "FREQ=WEEKLY;BYDAY=MO,WE".
+    Args:
+        value (str): Rule as it is written in the file.
+    Returns:
+        dict: Values of the parts by their upper case names.
+    """
+    rule = {}
+    for part in value.split(";"):
+        key, _, part_value = part.partition("=")
+        if key:
+            rule[key.strip().upper()] = part_value.strip().upper()
+    return rule
+
+
+def escape_text(value):
+    """Escapes the characters of a text value that have a meaning in the format.
+    Args:
+        value (str): Original text.
+    Returns:
+        str: Text as it is written in the file.
+    """
+    return "".join(_ESCAPED_TEXT_CHARACTERS.get(character, character) for character in value.replace("\r\n", "\n"))
+
+
+def fold_line(line):
+    """Folds a content line into lines of at most 75 octets, the continuations start with a blank.
+    Args:
+        line (str): Unfolded content line.
+    Returns:
+        str: Folded line without the final line break.
+    """
+    if len(line.encode()) <= MAX_LINE_LENGTH:
+        return line
+    parts = []
+    current = ""
+    limit = MAX_LINE_LENGTH
+    for character in line:
+        # Characters are never split, they may consist of several octets
+        if len((current + character).encode()) > limit:
+            parts.append(current)
+            current = ""
+            limit = MAX_LINE_LENGTH - 1
+        current += character
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+
+def format_date_time(value, utc=False):
+    """Formats a date and time.
+    Args:
+        value (datetime): Date and time without time zone.
+        utc (bool, optional): True if the time is a UTC time.
+    Returns:
+        str: Value as it is written in the file.
+    """
+    return value.strftime("%Y%m%dT%H%M%S") + ("Z" if utc else "")
@@ -9,11 +9,31 @@
 import json
 import os
 
+from utils.metrics import registry
 from utils.path_utils import DATA_PATH
 
 LOCALIZATION_PATH = os.path.join(DATA_PATH, "localization.json")
 DEFAULT_LANGUAGE = "DE"
 
+_localization_data = None
+
+CACHE_REQUESTS = registry.counter("cache_requests", "Lookups of cached data by cache and result.", ("cache", "result"))
+
+
+def _load_localization():
+    """Loads the localization file once and keeps its content for all further lookups.
+    Returns:
+        dict: Content of the localization file.
+    """
+    global _localization_data
+    if _localization_data is None:
+        CACHE_REQUESTS.labels("localization", "miss").inc()
+        with open(LOCALIZATION_PATH, "r", encoding='UTF-8') as localization_file:
+            _localization_data = json.load(localization_file)
+    else:
+        CACHE_REQUESTS.labels("localization", "hit").inc()
+    return _localization_data
+
 
 def receive_translation(keyword, language=DEFAULT_LANGUAGE):
     """Retrieve the translation of a given keyword for the chosen language.
@@ -23,14 +43,13 @@ def receive_translation(keyword, language=DEFAULT_LANGUAGE):
     Returns:
         str: Localized keyword.
     """
-    with open(LOCALIZATION_PATH, "r", encoding='UTF-8') as localization_file:
-        localization_data = json.load(localization_file)
-        if not localization_data[keyword]:
-            raise RuntimeError("Trying to access unknown keyword.")
-        # If there is no localization for the keyword return the default one.
-        if not localization_data[keyword][language]:
-            return localization_data[keyword][DEFAULT_LANGUAGE]
-        return localization_data[keyword][language]
+    localization_data = _load_localization()
+    if not localization_data[keyword]:
+        raise RuntimeError("Trying to access unknown keyword.")
+    # If there is no localization for the keyword return the default one.
+    if not localization_data[keyword][language]:
+        return localization_data[keyword][DEFAULT_LANGUAGE]
+    return localization_data[keyword][language]
 
 
 def receive_languages():
@@ -38,6 +57,4 @@ def receive_languages():
     Returns:
         dict: Contains all languages with their keywords.
     """
-    with open(LOCALIZATION_PATH, "r", encoding='UTF-8') as localization_file:
-        localization_data = json.load(localization_file)
-    return localization_data["languages"]
+    return _load_localization()["languages"]
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+"""Central logging setup with structured records, sampling and a background thread doing the I/O."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+from datetime import datetime
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DEFAULT_LEVELS = {"root": "INFO", "apscheduler": "WARNING", "telegram": "WARNING"}
+
+_listener = None
+_handler = None
+
+
+class Lazy:
+    """Value of a log record that is only computed if the record passes the levels and the sampling."""
+
+    __slots__ = ("function", "args")
+
+    def __init__(self, function, *args):
+        """Constructor.
+        Args:
+            function (callable): Computes the value.
+            args: Arguments of the function.
+        """
+        self.function = function
+        self.args = args
+
+    def __str__(self):
+        """Computes the value."""
+        return str(self.function(*self.args))
+
+    __repr__ = __str__
+
+
+def lazy(function, *args):
+    """Returns a value for a log record that is only computed if the record passes the levels and the sampling.
+    Args:
+        function (callable): Computes the value.
+        args: Arguments of the function.
+    Returns:
+        Lazy: Placeholder of the value.
+    """
+    return Lazy(function, *args)
+
+
+def fields(**values):
+    """Returns the ``extra`` argument of a logging call that attaches structured fields to the record.
+    Args:
+        values: Fields of the record, values may be Lazy.
+    Returns:
+        dict: Argument for ``extra``.
+    """
+    return {"fields": values}
+
+
+def _resolve(value):
+    """Computes Lazy values."""
+    return value.function(*value.args) if isinstance(value, Lazy) else value
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats every record as one JSON object containing its structured fields."""
+
+    def format(self, record):
+        """Formats the record.
+        Args:
+            record (logging.LogRecord): Record that is written.
+        Returns:
+            str: JSON encoded record.
+        """
+        data = {"time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                "level": record.levelname, "logger": record.name, "thread": record.threadName,
+                "message": record.getMessage()}
+        for key, value in getattr(record, "fields", {}).items():
+            data[key] = _resolve(value)
+        if getattr(record, "sample_rate", 1) > 1:
+            data["sample_rate"] = record.sample_rate
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Formats records like before with the structured fields appended as key=value pairs."""
+
+    def __init__(self):
+        """Constructor."""
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record):
+        """Formats the record.
+        Args:
+            record (logging.LogRecord): Record that is written.
+        Returns:
+            str: Formatted record.
+        """
+        message = super().format(record)
+        record_fields = getattr(record, "fields", None)
+        if record_fields:
+            message += " | " + " ".join("{}={}".format(key, _resolve(value)) for key, value in record_fields.items())
+        return message
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only every n-th record of a message of the configured loggers. Records of level WARNING and above are
+    always kept. The sample rate is attached to the kept records so counts can be scaled back.
+    """
+
+    def __init__(self, rates):
+        """Constructor.
+        Args:
+            rates (dict): Logger names and the n of their sampling, also applied to their child loggers.
+        """
+        super().__init__()
+        self.rates = {name: int(rate) for name, rate in rates.items() if int(rate) > 1}
+        self._logger_rates = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def rate(self, name):
+        """Returns the sample rate of the logger, the most specific configured parent counts.
+        Args:
+            name (str): Name of the logger.
+        Returns:
+            int: Sample rate, 1 if all records are kept.
+        """
+        rate = self._logger_rates.get(name)
+        if rate is None:
+            rate = 1
+            parts = name.split(".")
+            for length in range(len(parts), 0, -1):
+                prefix = ".".join(parts[:length])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._logger_rates[name] = rate
+        return rate
+
+    def filter(self, record):
+        """Decides whether the record is kept."""
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rate(record.name)
+        if rate == 1:
+            return True
+        # Counted per message template, so rare messages of a logger are not drowned by frequent ones
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counters.get(key, 0)
+            self._counters[key] = count + 1
+        if count % rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Hands the records to the logging thread without formatting them, so the formatting and the I/O leave the
+    calling thread. Lazy values are computed before, so they show the state at the time of the logging call. The
+    other arguments of records are formatted later, so they should not be changed afterwards.
+    """
+
+    def prepare(self, record):
+        """Computes the lazy values of the record, it is formatted by the handlers of the listener."""
+        if isinstance(record.args, tuple) and any(isinstance(argument, Lazy) for argument in record.args):
+            record.args = tuple(_resolve(argument) for argument in record.args)
+        record_fields = getattr(record, "fields", None)
+        if record_fields:
+            record.fields = {key: _resolve(value) for key, value in record_fields.items()}
+        return record
+
+
+def setup_logging(configuration=None):
+    """Configures the logging of the whole bot. Records are filtered and sampled in the calling thread and written
+    by a background thread. Calling it again replaces the previous setup.
+    Args:
+        configuration (dict, optional): Logging section of the configuration with the keys "format" ("text" or
+            "json"), "path" (file that is appended to, stderr if empty), "levels" (logger names and their levels,
+            "root" for all others) and "sampling" (logger names and the n of their sampling).
+    Returns:
+        logging.handlers.QueueListener: Listener writing the records.
+    """
+    global _listener, _handler
+    configuration = configuration or {}
+    stop_logging()
+
+    if configuration.get("path"):
+        output = logging.FileHandler(configuration["path"], encoding="utf-8")
+    else:
+        output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if configuration.get("format") == "json" else TextFormatter())
+
+    _handler = AsyncQueueHandler(queue.SimpleQueue())
+    _handler.addFilter(SamplingFilter(configuration.get("sampling", {})))
+
+    root = logging.getLogger()
+    for existing_handler in list(root.handlers):
+        root.removeHandler(existing_handler)
+    root.addHandler(_handler)
+
+    levels = dict(DEFAULT_LEVELS, **configuration.get("levels", {}))
+    for name, level in levels.items():
+        logging.getLogger(None if name == "root" else name).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(_handler.queue, output)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Writes all pending records and stops the logging thread. Later records only reach the last resort handler of
+    the logging module.
+    """
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        for output in _listener.handlers:
+            output.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
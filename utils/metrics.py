@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+
+"""Counters, gauges and histograms that are exposed in the Prometheus text format."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import abc
+import bisect
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "remindeasy_"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    """Formats a sample value as required by the text format."""
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    """Formats the label pairs of a sample."""
+    if not labels:
+        return ""
+    pairs = ('{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+             for name, value in labels)
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Timer:
+    """Context manager that observes its duration."""
+
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class CounterChild:
+    """Value of a counter for a single set of label values."""
+
+    __slots__ = ("lock", "value")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        """Increments the counter by the given amount."""
+        with self.lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        return [(name + Counter.sample_suffix, labels, self.value)]
+
+
+class GaugeChild:
+    """Value of a gauge for a single set of label values."""
+
+    __slots__ = ("lock", "value")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def set(self, value):
+        """Sets the gauge to the given value."""
+        with self.lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        """Increments the gauge by the given amount."""
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        """Decrements the gauge by the given amount."""
+        self.inc(-amount)
+
+    def samples(self, name, labels):
+        return [(name, labels, self.value)]
+
+
+class HistogramChild:
+    """Buckets of a histogram for a single set of label values."""
+
+    __slots__ = ("lock", "upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds):
+        self.lock = threading.Lock()
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * len(upper_bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Records a single observation."""
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Returns a context manager that observes the duration of its block in seconds."""
+        return _Timer(self)
+
+    def quantile(self, fraction):
+        """Estimates a quantile of the observations by interpolating linearly inside the bucket it falls into, the
+        same way Prometheus does it for histograms.
+        Args:
+            fraction (float): Quantile between 0 and 1.
+        Returns:
+            float: Estimated value of the quantile. 0 if nothing was observed.
+        """
+        with self.lock:
+            counts = list(self.counts)
+            count = self.count
+        if not count:
+            return 0.0
+
+        rank = fraction * count
+        cumulative = 0
+        lower_bound = 0.0
+        for upper_bound, bucket_count in zip(self.upper_bounds, counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                if upper_bound == math.inf:
+                    return lower_bound
+                return lower_bound + (upper_bound - lower_bound) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower_bound = upper_bound
+        return lower_bound
+
+    def samples(self, name, labels):
+        with self.lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        samples = []
+        cumulative = 0
+        for upper_bound, bucket_count in zip(self.upper_bounds, counts):
+            cumulative += bucket_count
+            samples.append((name + "_bucket", labels + (("le", _format_value(upper_bound)),), cumulative))
+        samples.append((name + "_sum", labels, total))
+        samples.append((name + "_count", labels, count))
+        return samples
+
+
+class Metric(abc.ABC):
+    """Metric family with optional labels. Without labels the methods of the single child are available directly
+    on the metric.
+    """
+
+    metric_type = None
+    sample_suffix = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        """Constructor.
+        Args:
+            name (str): Name of the metric without the common prefix.
+            documentation (str): Help text of the metric.
+            labelnames (tuple of 'str', optional): Names of the labels.
+        """
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.children = {}
+        self.function = None
+        if not self.labelnames:
+            self._child = self.labels()
+
+    @abc.abstractmethod
+    def _create_child(self):
+        """Creates the child holding the value of a combination of label values.
+        Returns:
+            object: New child of the type of the metric.
+        """
+
+    def labels(self, *values):
+        """Returns the child of the given label values.
+        Args:
+            *values: Values of the labels in the order of their names.
+        Returns:
+            object: Child holding the value of the labels.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError("{} expects the labels {}".format(self.name, self.labelnames))
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self._create_child())
+        return child
+
+    def set_function(self, function):
+        """Computes the values on every collection instead of storing them.
+        Args:
+            function (callable): Returns the value, or a dict of label value tuples and values if the metric has
+                labels.
+        """
+        self.function = function
+
+    def collect(self):
+        """Returns all samples of the metric as tuples of name, label pairs and value."""
+        if self.function:
+            values = self.function()
+            if not self.labelnames:
+                values = {(): values}
+            return [(self.name + self.sample_suffix, tuple(zip(self.labelnames, label_values)), value)
+                    for label_values, value in values.items()]
+
+        samples = []
+        for label_values, child in list(self.children.items()):
+            samples.extend(child.samples(self.name, tuple(zip(self.labelnames, label_values))))
+        return samples
+
+    def __getattr__(self, item):
+        # Only called for attributes that are not found, forwards e.g. inc or observe to the single child
+        if item.startswith("_"):
+            raise AttributeError(item)
+        return getattr(self._child, item)
+
+
+class Counter(Metric):
+    """Monotonically increasing counter."""
+
+    metric_type = "counter"
+    sample_suffix = "_total"
+
+    def _create_child(self):
+        return CounterChild()
+
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+
+    metric_type = "gauge"
+
+    def _create_child(self):
+        return GaugeChild()
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Constructor.
+        Args:
+            name (str): Name of the metric without the common prefix.
+            documentation (str): Help text of the metric.
+            labelnames (tuple of 'str', optional): Names of the labels.
+            buckets (tuple of 'float', optional): Upper bounds of the buckets.
+        """
+        self.upper_bounds = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames)
+
+    def _create_child(self):
+        return HistogramChild(self.upper_bounds)
+
+
+class MetricsRegistry:
+    """Holds all metrics of the bot. Metrics are created once on module level where they are used."""
+
+    def __init__(self):
+        """Constructor."""
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _register(self, metric_class, name, *args, **kwargs):
+        """Returns the metric with the given name and creates it if it does not exist."""
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = metric_class(name, *args, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise ValueError("Metric {} was already registered as {}".format(name, metric.metric_type))
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Returns the counter with the given name."""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        """Returns the gauge with the given name."""
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Returns the histogram with the given name."""
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def expose(self):
+        """Renders all metrics in the Prometheus text format.
+        Returns:
+            str: Exposition of all metrics.
+        """
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.collect()
+            except Exception:
+                logger.exception("Collecting %s failed", metric.name)
+                continue
+            lines.append("# HELP {} {}".format(metric.name, metric.documentation))
+            lines.append("# TYPE {} {}".format(metric.name, metric.metric_type))
+            for name, labels, value in samples:
+                lines.append("{}{} {}".format(name, _format_labels(labels), _format_value(value)))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Answers the scrapes of the metrics endpoint."""
+
+    def do_GET(self):
+        """Sends the exposition of all metrics."""
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.expose().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Logs the requests with the logger of the module instead of stderr."""
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class MetricsServer:
+    """HTTP server that exposes the metrics on ``/metrics``."""
+
+    def __init__(self, listen="127.0.0.1", port=9464, metrics_registry=registry):
+        """Constructor.
+        Args:
+            listen (str, optional): Address the server listens on.
+            port (int, optional): Port the server listens on. 0 selects a free port.
+            metrics_registry (MetricsRegistry, optional): Registry that is exposed.
+        """
+        self.httpd = ThreadingHTTPServer((listen, port), MetricsRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.registry = metrics_registry
+        self.thread = None
+
+    @property
+    def port(self):
+        """Returns the port the server is bound to."""
+        return self.httpd.server_address[1]
+
+    def start(self):
+        """Starts serving in a background thread."""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics", daemon=True)
+        self.thread.start()
+        logger.info("Metrics exposed on %s:%s", *self.httpd.server_address[:2])
+
+    def stop(self):
+        """Stops the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
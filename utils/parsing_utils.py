@@ -6,8 +6,11 @@
 # Copyright: Daniel Bebber, 2020
 # Author: Daniel Bebber <daniel.bebber@gmx.de>
 # ----------------------------------------------
+from datetime import datetime
 
 RESERVED_CHARACTERS = {"!": "", "_": " ", "*": ""}
+# Formats of the dates the user may enter
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y")
 
 
 def replace_reserved_characters(input_string):
@@ -20,3 +23,18 @@ def replace_reserved_characters(input_string):
     for char in RESERVED_CHARACTERS:
         input_string = input_string.replace(char, RESERVED_CHARACTERS[char])
     return input_string
+
+
+def parse_date(input_string):
+    """Parses a date the user entered, either as ISO date (2020-12-24) or in the German notation (24.12.2020).
+    Args:
+        input_string (str): Date entered by the user.
+    Returns:
+        datetime.date: Parsed date or None if the input is no valid date.
+    """
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(input_string.strip(), date_format).date()
+        except ValueError:
+            continue
+    return None
@@ -12,3 +12,6 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CONFIG_PATH = os.path.join(PROJECT_ROOT, "configuration.json")
 DATA_PATH = os.path.join(PROJECT_ROOT, ".data")
 USERDATA_PATH = os.path.join(DATA_PATH, "user_data")
+SESSION_PATH = os.path.join(DATA_PATH, "sessions")
+RECORDING_PATH = os.path.join(DATA_PATH, "recordings", "updates.jsonl.gz")
+PROFILE_PATH = os.path.join(DATA_PATH, "profiles")
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+
+"""Profiler that is switched on at runtime for the next updates and checker cycles."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import cProfile
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from utils.path_utils import PROFILE_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+TRACEMALLOC_DEPTH = 1
+MEMORY_TOP = 50
+
+
+class ProfilingSession:
+    """Results of profiling the requested amount of updates and checker cycles."""
+
+    def __init__(self, directory, updates, cycles, memory):
+        """Constructor.
+        Args:
+            directory (str): Directory the results are written to.
+            updates (int): Amount of updates that are profiled.
+            cycles (int): Amount of checker cycles that are profiled.
+            memory (bool): Indicates whether the allocations are traced.
+        """
+        self.directory = directory
+        self.remaining = {"update": updates, "cycle": cycles}
+        self.stats = {}
+        self.samples = Counter()
+        self.active_threads = {}
+        self.running = 0
+        self.finished = threading.Event()
+
+        self.started_tracemalloc = memory and not tracemalloc.is_tracing()
+        if self.started_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_DEPTH)
+        self.snapshot = tracemalloc.take_snapshot() if memory else None
+
+    @property
+    def complete(self):
+        """Returns True if all requested calls were profiled."""
+        return self.running == 0 and not any(self.remaining.values())
+
+
+class Profiler:
+    """Profiles the next updates and checker cycles once it is requested, e.g. by a signal or an admin command.
+
+    Every profiled call runs under its own ``cProfile`` profile, the results are merged by the tag of the call, e.g.
+    the name of the handler. While calls are profiled a sampler thread records the stacks of their threads, they are
+    written as collapsed stacks for flame graphs. Optionally the allocations between the start and the end of the
+    session are compared with ``tracemalloc``, which slows down all threads while the session runs. Calls that are
+    not profiled only check a single attribute.
+    """
+
+    def __init__(self, path=PROFILE_PATH, memory=True, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+        """Constructor.
+        Args:
+            path (str, optional): Directory the sessions are written to, every session gets its own subdirectory.
+            memory (bool, optional): Indicates whether the allocations are traced.
+            sample_interval (float, optional): Seconds between two samples of the stacks.
+        """
+        self.path = path
+        self.memory = memory
+        self.sample_interval = sample_interval
+        self.session = None
+        self.lock = threading.Lock()
+
+    def configure(self, path=None, memory=True, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+        """Applies the profiling configuration.
+        Args:
+            path (str, optional): Directory the sessions are written to. The default one if empty.
+            memory (bool, optional): Indicates whether the allocations are traced.
+            sample_interval (float, optional): Seconds between two samples of the stacks.
+        """
+        self.path = path or PROFILE_PATH
+        self.memory = memory
+        self.sample_interval = sample_interval
+
+    def request(self, updates=0, cycles=0):
+        """Starts profiling the next updates and checker cycles.
+        Args:
+            updates (int, optional): Amount of updates that are profiled.
+            cycles (int, optional): Amount of checker cycles that are profiled.
+        Returns:
+            ProfilingSession: The started session. None if a session is already running or nothing was requested.
+        """
+        if updates <= 0 and cycles <= 0:
+            return None
+        with self.lock:
+            if self.session is not None:
+                return None
+            directory = os.path.join(self.path, time.strftime("%Y%m%d-%H%M%S"))
+            self.session = ProfilingSession(directory, max(updates, 0), max(cycles, 0), self.memory)
+            session = self.session
+
+        threading.Thread(target=self._sample, args=(session,), name="profiler", daemon=True).start()
+        logger.info("Profiling the next %s updates and %s checker cycles into %s", updates, cycles, directory)
+        return session
+
+    def profile(self, kind, tag, function, *args, counts=True):
+        """Calls the function and profiles it if a session still wants calls of its kind.
+        Args:
+            kind (str): "update" or "cycle".
+            tag (str or callable): Name the results are merged by. A callable is only called while profiling.
+            function (callable): Function that is called.
+            args: Arguments of the function.
+            counts (bool, optional): False for calls that are only a part of a profiled unit, e.g. the phases of a
+                checker cycle before its last one.
+        Returns:
+            object: Result of the function.
+        """
+        session = self.session
+        if session is None or not session.remaining.get(kind):
+            return function(*args)
+
+        with self.lock:
+            if self.session is not session or not session.remaining[kind]:
+                session = None
+            else:
+                if counts:
+                    session.remaining[kind] -= 1
+                session.running += 1
+        if session is None:
+            return function(*args)
+
+        tag = tag() if callable(tag) else tag
+        thread_id = threading.get_ident()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Only one profile can be active at once on newer interpreters, the call is still sampled
+            profile = None
+        with self.lock:
+            session.active_threads[thread_id] = tag
+        try:
+            return function(*args)
+        finally:
+            if profile is not None:
+                profile.disable()
+            with self.lock:
+                del session.active_threads[thread_id]
+                if profile is not None:
+                    if tag in session.stats:
+                        session.stats[tag].add(profile)
+                    else:
+                        session.stats[tag] = pstats.Stats(profile)
+                session.running -= 1
+                complete = session.complete and self.session is session
+                if complete:
+                    self.session = None
+            if complete:
+                self._end(session)
+
+    def _sample(self, session):
+        """Records the stacks of the threads inside profiled calls until the session is finished.
+        Args:
+            session (ProfilingSession): Session the samples belong to.
+        """
+        profile_code = Profiler.profile.__code__
+        while not session.finished.wait(self.sample_interval):
+            with self.lock:
+                active_threads = dict(session.active_threads)
+            if not active_threads:
+                continue
+            frames = sys._current_frames()
+            stacks = []
+            for thread_id, tag in active_threads.items():
+                frame = frames.get(thread_id)
+                stack = []
+                # Only the frames above the profiled call belong to it
+                while frame is not None and frame.f_code is not profile_code:
+                    stack.append("{}:{}".format(os.path.basename(frame.f_code.co_filename), frame.f_code.co_name))
+                    frame = frame.f_back
+                if stack:
+                    stacks.append(";".join([tag] + stack[::-1]))
+            with self.lock:
+                session.samples.update(stacks)
+
+    def _end(self, session):
+        """Stops tracing the session and writes its results in the background, the caller may be an update worker.
+        Args:
+            session (ProfilingSession): Finished session.
+        """
+        snapshot = None
+        if session.snapshot is not None:
+            snapshot = tracemalloc.take_snapshot()
+            if session.started_tracemalloc:
+                tracemalloc.stop()
+        threading.Thread(target=self._write, args=(session, snapshot), name="profiler_write").start()
+
+    @staticmethod
+    def _write(session, snapshot):
+        """Writes the results of the session.
+        Args:
+            session (ProfilingSession): Finished session.
+            snapshot (tracemalloc.Snapshot): Allocations at the end of the session. None if they were not traced.
+        """
+        os.makedirs(session.directory, exist_ok=True)
+
+        stats_paths = []
+        for tag, stats in session.stats.items():
+            stats_path = os.path.join(session.directory, "{}.pstats".format(re.sub(r"[^\w.-]+", "_", tag)))
+            stats.dump_stats(stats_path)
+            stats_paths.append(stats_path)
+        if stats_paths:
+            pstats.Stats(*stats_paths).dump_stats(os.path.join(session.directory, "all.pstats"))
+
+        with open(os.path.join(session.directory, "stacks.collapsed"), "w") as stacks_file:
+            for stack, count in sorted(session.samples.items()):
+                stacks_file.write("{} {}\n".format(stack, count))
+
+        if snapshot is not None:
+            statistics = snapshot.compare_to(session.snapshot, "lineno")
+            with open(os.path.join(session.directory, "memory.txt"), "w") as memory_file:
+                for statistic in statistics[:MEMORY_TOP]:
+                    memory_file.write("{}\n".format(statistic))
+
+        logger.info("Profile of %s written to %s", ", ".join(sorted(session.stats)), session.directory)
+        session.finished.set()
+
+
+profiler = Profiler()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+
+"""Store for dialog sessions with expiry, size limit and optional persistence."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import registry
+from utils.path_utils import SESSION_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_SIZE = 10000
+
+
+class SessionStore:
+    """Dict like store for the sessions of users inside a dialog.
+
+    Every entry expires after ``ttl`` seconds without access. If the store holds more than ``max_size`` entries the
+    least recently used ones are evicted. Because every access moves the entry to the end, the entries are always
+    ordered by their expiry so expired entries can be dropped from the front without scanning the whole store.
+    All operations are guarded by a lock, so the store can be shared by the update workers.
+    """
+
+    stores = {}
+
+    def __init__(self, name, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE, persistent=False, clock=time.time):
+        """Constructor.
+        Args:
+            name (str): Unique name of the store. Used as file name when the store is persisted.
+            ttl (int, optional): Seconds after which an untouched entry expires.
+            max_size (int, optional): Maximum amount of entries inside the store.
+            persistent (bool, optional): Indicates whether the store is saved to and loaded from disk.
+            clock (callable, optional): Returns the current time in seconds.
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.persistent = persistent
+        self.clock = clock
+
+        self.expired_count = 0
+        self.evicted_count = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+        SessionStore.stores[name] = self
+
+    @property
+    def file_path(self):
+        """Returns the path of the file the store is persisted to."""
+        return os.path.join(SESSION_PATH, "{}.json".format(self.name))
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def __getitem__(self, key):
+        entry = self._lookup(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry[1]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self.purge_expired()
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evicted_count += 1
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._entries[key]
+
+    def __len__(self):
+        with self._lock:
+            self.purge_expired()
+            return len(self._entries)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def get(self, key, default=None):
+        """Returns the value of the given key or the default if there is no live entry.
+        Args:
+            key (object): Key of the entry.
+            default (object, optional): Value that is returned if there is no entry.
+        Returns:
+            object: Value of the entry.
+        """
+        entry = self._lookup(key)
+        if entry is None:
+            return default
+        return entry[1]
+
+    def pop(self, key, *default):
+        """Removes the entry of the given key and returns its value.
+        Args:
+            key (object): Key of the entry.
+            default (object, optional): Value that is returned if there is no entry.
+        Returns:
+            object: Value of the removed entry.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            del self._entries[key]
+            return entry[1]
+
+    def keys(self):
+        """Returns the keys of all live entries."""
+        with self._lock:
+            self.purge_expired()
+            return list(self._entries.keys())
+
+    def clear(self):
+        """Removes all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def purge_expired(self):
+        """Removes all expired entries from the front of the store."""
+        with self._lock:
+            now = self.clock()
+            while self._entries:
+                key, (expires_at, _) = next(iter(self._entries.items()))
+                if expires_at > now:
+                    break
+                self._entries.popitem(last=False)
+                self.expired_count += 1
+
+    def stats(self):
+        """Returns the counters of the store.
+        Returns:
+            dict: Contains the amount of live sessions and the total amount of expired and evicted sessions.
+        """
+        return {"live": len(self), "expired": self.expired_count, "evicted": self.evicted_count}
+
+    def save(self):
+        """Saves all live entries to disk if the store is persistent."""
+        if not self.persistent:
+            return
+        with self._lock:
+            self.purge_expired()
+            entries = [[key, expires_at, value] for key, (expires_at, value) in self._entries.items()]
+        os.makedirs(SESSION_PATH, exist_ok=True)
+        temporary_path = "{}.tmp".format(self.file_path)
+        with open(temporary_path, "w") as session_file:
+            json.dump(entries, session_file)
+        os.replace(temporary_path, self.file_path)
+
+    def load(self):
+        """Loads the entries that were saved to disk if the store is persistent. Entries that expired while the bot
+        was offline are dropped.
+        """
+        if not self.persistent or not os.path.isfile(self.file_path):
+            return
+        with open(self.file_path, "r") as session_file:
+            entries = json.load(session_file)
+
+        now = self.clock()
+        with self._lock:
+            for key, expires_at, value in entries:
+                if expires_at > now:
+                    self._entries[key] = (expires_at, value)
+        logger.info("Loaded %s sessions into %s", len(self._entries), self.name)
+
+    def _lookup(self, key):
+        """Returns the live entry of the given key and refreshes its expiry.
+        Args:
+            key (object): Key of the entry.
+        Returns:
+            tuple: Expiry and value of the entry or None if there is no live entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                self.expired_count += 1
+                return None
+            entry = (self.clock() + self.ttl, entry[1])
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            return entry
+
+    @classmethod
+    def configure_all(cls, configuration):
+        """Applies the session store configuration to all stores and loads their persisted entries.
+        Args:
+            configuration (dict): Configuration values of the session stores.
+        """
+        for store in cls.stores.values():
+            store.ttl = configuration.get("ttl", store.ttl)
+            store.max_size = configuration.get("max_size", store.max_size)
+            store.persistent = configuration.get("persistent", store.persistent)
+            store.load()
+
+    @classmethod
+    def save_all(cls):
+        """Saves all persistent stores."""
+        for store in cls.stores.values():
+            store.save()
+
+
+def _live_sessions():
+    """Returns the amount of live sessions of every store."""
+    return {(name,): len(store) for name, store in list(SessionStore.stores.items())}
+
+
+def _dropped_sessions():
+    """Returns the amount of expired and evicted sessions of every store."""
+    dropped = {}
+    for name, store in list(SessionStore.stores.items()):
+        dropped[(name, "expired")] = store.expired_count
+        dropped[(name, "evicted")] = store.evicted_count
+    return dropped
+
+
+registry.gauge("dialog_sessions", "Live sessions of the dialogs.", ("store",)).set_function(_live_sessions)
+registry.counter("dialog_sessions_dropped", "Sessions that expired or were evicted.",
+                 ("store", "reason")).set_function(_dropped_sessions)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""Contains utils for the time zones of the users."""
+
+# ----------------------------------------------
+# Copyright: Daniel Bebber, 2020
+# Author: Daniel Bebber <daniel.bebber@gmx.de>
+# ----------------------------------------------
+from datetime import datetime
+
+import pytz
+
+# Time zone names by their lower case spelling, so the user does not have to care about the case.
+_TIMEZONES = {name.lower(): name for name in pytz.all_timezones}
+
+
+def find_timezone(name):
+    """Looks up the time zone with the given name.
+    Args:
+        name (str): Name of the time zone the user entered, e.g. "europe/berlin".
+    Returns:
+        str: Name of the time zone as in the tz database or None if there is no such zone.
+    """
+    return _TIMEZONES.get(name.strip().lower())
+
+
+def to_timestamp(wall_time, timezone):
+    """Converts a time of the clock on the wall inside the given time zone into a UTC timestamp.
+    Args:
+        wall_time (datetime): Time without time zone.
+        timezone (str): Name of the time zone. None for the time zone of the server.
+    Returns:
+        float: Seconds since the epoch.
+    """
+    if timezone is None:
+        return wall_time.timestamp()
+    return pytz.timezone(timezone).localize(wall_time).timestamp()
+
+
+def to_wall_time(server_time, timezone):
+    """Converts a time of the server into the time of the clock on the wall inside the given time zone.
+    Args:
+        server_time (datetime): Time of the server without time zone, e.g. of the clock.
+        timezone (str): Name of the time zone. None for the time zone of the server.
+    Returns:
+        datetime: Time without time zone.
+    """
+    if timezone is None:
+        return server_time
+    return datetime.fromtimestamp(server_time.timestamp(), pytz.timezone(timezone)).replace(tzinfo=None)